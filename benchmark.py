@@ -0,0 +1,739 @@
+#! /usr/bin/python
+
+import argparse
+import copy
+import datetime
+import glob
+import json
+import os
+import platform
+import random
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import ca
+import ca_autosave
+import ca_gcs_import
+import ca_gui
+import ca_gurps_ruleset
+import ca_json
+import ca_ruleset
+import ca_timers
+import ca_validation
+
+# Run in a fresh Python (so nothing's already imported) to time how long the
+# program takes to get going.  Prints the startup profile as JSON.
+STARTUP_SCRIPT = '''
+import json
+import sys
+
+import ca_startup
+ca_startup.profile.start()
+
+import ca
+import ca_gurps_ruleset
+
+with ca_startup.profile.timing('ruleset'):
+    ruleset = ca_gurps_ruleset.GurpsRuleset(None)
+with ca_startup.profile.timing('ruleset spells and abilities'):
+    len(ca_gurps_ruleset.GurpsRuleset.spells)
+    len(ca_gurps_ruleset.GurpsRuleset.abilities)
+
+ca_startup.profile.stop()
+json.dump(ca_startup.profile.to_dict(), sys.stdout)
+'''
+
+
+class GameFileGenerator(object):
+    '''
+    Makes up a Game File of whatever size we want to time.  The same settings
+    (including the seed) always make exactly the same Game File so that the
+    times from one version of the program can be compared with those from
+    another.
+
+    Each creature has |items| things, one of which is a container.  That
+    container has |items| things, one of which is a container, and so on,
+    |depth| containers down.
+    '''
+    # Words for made-up notes and item names.  Search scenarios look for
+    # these.
+    words = ['amber', 'brass', 'cedar', 'dagger', 'ember', 'falcon', 'garnet',
+             'harbor', 'ivory', 'jasper', 'kestrel', 'lantern', 'marble',
+             'nettle', 'onyx', 'pewter', 'quartz', 'raven', 'saber', 'thistle']
+
+    skills = ['Acrobatics', 'Axe/Mace', 'Beam Weapons (Pistol)', 'Brawling',
+              'Broadsword', 'Climbing', 'First Aid', 'Guns (Pistol)',
+              'Knife', 'Stealth']
+
+    def __init__(self,
+                 ruleset,       # Ruleset object
+                 pcs=6,         # int: number of PCs
+                 npcs=40,       # int: number of NPCs
+                 fights=20,     # int: number of fights
+                 monsters=12,   # int: number of monsters in each fight
+                 items=8,       # int: number of things in each container
+                                #   (and each creature)
+                 depth=2,       # int: how deeply containers are nested
+                 timers=2,      # int: number of timers on each PC and NPC
+                 history=2000,  # int: number of actions in the fight history
+                 seed=0         # int: seed for the random number generator
+                 ):
+        self.__ruleset = ruleset
+        self.__settings = {'pcs': pcs,
+                           'npcs': npcs,
+                           'fights': fights,
+                           'monsters': monsters,
+                           'items': items,
+                           'depth': depth,
+                           'timers': timers,
+                           'history': history,
+                           'seed': seed}
+        self.__random = None  # random.Random, new for each Game File
+
+    def get_settings(self):
+        '''
+        Returns a dict with the settings used to make the Game File (so that
+        they can go out with the results).
+        '''
+        return dict(self.__settings)
+
+    def make_game_file(self):
+        '''
+        Makes the Game File.
+
+        Returns: a dict that's ready to be written as a Game File.
+        '''
+        settings = self.__settings
+        self.__random = random.Random(settings['seed'])
+
+        game_file = ca.World.get_empty_world(self.__ruleset.get_sample_items())
+        for index in range(settings['pcs']):
+            name = 'PC %d' % (index + 1)
+            game_file['PCs'][name] = self.__make_creature(name,
+                                                          settings['timers'])
+        for index in range(settings['npcs']):
+            name = 'NPC %d' % (index + 1)
+            game_file['NPCs'][name] = self.__make_creature(name,
+                                                           settings['timers'])
+        for fight_index in range(settings['fights']):
+            monsters = {}
+            for index in range(settings['monsters']):
+                name = 'Monster %d' % (index + 1)
+                monsters[name] = self.__make_creature(name, 0)
+            game_file['fights']['Fight %d' % (fight_index + 1)] = {
+                    'monsters': monsters}
+
+        game_file['current-fight']['history'] = self.__make_history(
+                list(game_file['PCs'].keys()))
+        return game_file
+
+    #
+    # Private methods
+    #
+
+    def __make_creature(self,
+                        name,   # string: creature's name
+                        timers  # int: number of timers on the creature
+                        ):
+        '''
+        Makes a creature with random attributes, skills, equipment, and
+        timers.
+
+        Returns: the creature's dict.
+        '''
+        creature = self.__ruleset.make_empty_creature()
+        for attribute in ['st', 'dx', 'iq', 'ht']:
+            creature['permanent'][attribute] = self.__random.randint(8, 14)
+        creature['permanent']['hp'] = creature['permanent']['st']
+        creature['permanent']['fp'] = creature['permanent']['ht']
+        creature['current'] = copy.deepcopy(creature['permanent'])
+
+        if 'skills' in creature:
+            for skill in self.__random.sample(GameFileGenerator.skills, 3):
+                creature['skills'][skill] = self.__random.randint(9, 16)
+
+        creature['notes'] = [self.__make_phrase(6)]
+        creature['stuff'] = self.__make_stuff(self.__settings['depth'])
+        for index in range(timers):
+            timer = ca_timers.Timer(None)
+            timer.from_pieces({'parent-name': name,
+                               'rounds': self.__random.randint(1, 20),
+                               'string': self.__make_phrase(3)})
+            creature['timers'].append(timer.rawdata)
+        return creature
+
+    def __make_history(self,
+                       pc_names     # list of string: names of the PCs
+                       ):
+        '''
+        Makes a fight's history with round markers and actions by the PCs.
+
+        Returns: a list of action dicts.
+        '''
+        history = []
+        round_number = 0
+        while len(history) < self.__settings['history']:
+            if len(history) % (len(pc_names) + 1) == 0:
+                round_number += 1
+                history.append({'comment': '--- Round %d ---' % round_number})
+                continue
+            name = self.__random.choice(pc_names)
+            action = self.__random.choice(['defend', 'concentrate',
+                                           'nothing'])
+            history.append({'action-name': action,
+                            'fighter': {'name': name, 'group': 'PCs'},
+                            'comment': '(%s) %s' % (name, action)})
+        return history
+
+    def __make_phrase(self,
+                      count     # int: number of words in the phrase
+                      ):
+        '''
+        Returns a string of |count| random words.
+        '''
+        return ' '.join(self.__random.choice(GameFileGenerator.words)
+                        for index in range(count))
+
+    def __make_stuff(self,
+                     depth  # int: number of containers nested below this one
+                     ):
+        '''
+        Makes the contents of a creature or container.
+
+        Returns: a list of items.
+        '''
+        stuff = []
+        for index in range(self.__settings['items']):
+            item = self.__ruleset.make_empty_item()
+            if index == 0 and depth > 0:
+                item['name'] = '%s Bag' % self.__make_phrase(1).title()
+                item['type']['container'] = 1
+                item['stuff'] = self.__make_stuff(depth - 1)
+            else:
+                item['name'] = self.__make_phrase(2).title()
+                item['type']['misc'] = 1
+                item['count'] = self.__random.randint(1, 5)
+                item['notes'] = self.__make_phrase(4)
+            stuff.append(item)
+        return stuff
+
+
+class Benchmark(object):
+    '''
+    Times the parts of the program that we want to keep fast.  Each
+    scenario is run |repeat| times and the results are kept in a form that
+    can be written as JSON (so that they can be compared from one version of
+    the program to the next).
+
+    Except for 'startup' and 'import', the scenarios run (without a
+    terminal) against a Game File made by a GameFileGenerator.  Anything that isn't part of what
+    a scenario is timing (like making a fresh World for each run) is done
+    before the clock starts.
+    '''
+    def __init__(self,
+                 repeat,            # int: number of times to run each
+                                    #   scenario
+                 game_file=None,    # dict: settings for the
+                                    #   GameFileGenerator (None for the
+                                    #   defaults)
+                 rounds=100         # int: number of rounds in the 'rounds'
+                                    #   scenario
+                 ):
+        self.__repeat = repeat
+        self.__rounds = rounds
+        self.__directory = os.path.dirname(os.path.abspath(__file__))
+        self.__window_manager = ca_gui.ScriptedWindowManager(
+                keep_transcript=False)
+        self.__ruleset = ca_gurps_ruleset.GurpsRuleset(self.__window_manager)
+        self.__generator = GameFileGenerator(
+                self.__ruleset, **({} if game_file is None else game_file))
+
+        self.__game_file_text = None    # JSON of the generated Game File
+        self.__game_filename = None     # where that's been written
+        self.__work_directory = None    # tempfile.TemporaryDirectory
+
+        self.__scenarios = {'autosave': self.__autosave,
+                            'consistency': self.__consistency,
+                            'fight': self.__fight,
+                            'import': self.__import_creatures,
+                            'load': self.__load,
+                            'query': self.__query,
+                            'rounds': self.__rounds_of_actions,
+                            'save': self.__save,
+                            'search': self.__search,
+                            'snapshot': self.__snapshot,
+                            'startup': self.__startup,
+                            'validation': self.__validation}
+
+    def get_ruleset(self):
+        '''
+        Returns the Ruleset used by the scenarios.
+        '''
+        return self.__ruleset
+
+    def get_scenario_names(self):
+        '''
+        Returns a sorted list of the names of the scenarios.
+        '''
+        return sorted(self.__scenarios.keys())
+
+    def run(self,
+            names=None  # list of scenario names (None means all of them)
+            ):
+        '''
+        Runs the scenarios.
+
+        Returns a dict with the results (see |__summarize|).
+        '''
+        if names is None or len(names) == 0:
+            names = self.get_scenario_names()
+
+        results = {'date': datetime.datetime.now().isoformat(),
+                   'python': platform.python_version(),
+                   'platform': platform.platform(),
+                   'repeat': self.__repeat,
+                   'rounds': self.__rounds,
+                   'game-file': self.__generator.get_settings(),
+                   'scenarios': {}}
+
+        # Keep the debug files (which World makes) out of the way.
+        old_debug_directory = ca.World.debug_directory
+        self.__work_directory = tempfile.TemporaryDirectory()
+        ca.World.debug_directory = os.path.join(self.__work_directory.name,
+                                                'debug')
+        try:
+            self.__make_game_file()
+            results['game-file']['bytes'] = len(self.__game_file_text)
+            for name in names:
+                results['scenarios'][name] = self.__scenarios[name]()
+        finally:
+            ca.World.debug_directory = old_debug_directory
+            self.__work_directory.cleanup()
+            self.__work_directory = None
+
+        results['errors'] = len(self.__window_manager.errors)
+        return results
+
+    #
+    # Private methods
+    #
+
+    def __autosave(self):
+        '''
+        Autosaves the World.  Only the snapshot is taken on the UI thread so
+        that's what's timed; the time the worker thread takes to write the
+        file is kept separately.
+
+        Returns: the summary of the snapshot times (see |__summarize|) with
+            the summary of the save times.
+        '''
+        filename = os.path.join(self.__work_directory.name, 'autosave.json')
+        world = self.__new_world()
+        service = ca_autosave.AutosaveService(filename, 0)
+        save_seconds = []
+
+        def scenario(count):
+            # Change something so that there's something to save.
+            world.rawdata['current-fight']['round'] = count
+            service.save_now(world.rawdata)
+
+        def cleanup(count):
+            service.wait()
+            save_seconds.append(service.get_stats()['save_seconds'])
+
+        result = self.__time_runs(lambda: len(save_seconds),
+                                  scenario,
+                                  cleanup)
+        service.shutdown()
+        result['save'] = Benchmark.__summarize(save_seconds)
+        return result
+
+    def __consistency(self):
+        '''
+        Checks the PCs for consistency the way the program does when it
+        starts (and when the consistency cache is empty).
+
+        Returns: the summary of the times (see |__summarize|).
+        '''
+        def setup():
+            world = self.__new_world()
+            world.rawdata.pop('consistency-cache', None)
+            return world
+
+        def scenario(world):
+            for name in world.get_creature_details_list('PCs'):
+                creature = world.get_creature_details(name, 'PCs')
+                value = world.check_creature_consistent(name, 'PCs',
+                                                        creature)
+                if value == ca_ruleset.Ruleset.STOP_CHECKING:
+                    break
+
+        return self.__time_runs(setup, scenario)
+
+    def __fight(self):
+        '''
+        Builds the FightHandler for a fight with the PCs and the first group
+        of monsters.
+
+        Returns: the summary of the times (see |__summarize|).
+        '''
+        def scenario(world):
+            ca.FightHandler(self.__window_manager,
+                            world,
+                            Benchmark.__first_fight(world),
+                            None,
+                            save_snapshot=False)
+
+        return self.__time_runs(self.__new_world, scenario)
+
+    @staticmethod
+    def __first_fight(world     # World object
+                      ):
+        '''
+        Returns the name of the first fight in the Game File (or None).
+        '''
+        fights = sorted(world.get_fights())
+        return fights[0] if len(fights) > 0 else None
+
+    def __import_creatures(self):
+        '''
+        Imports each of the GURPS Character Sheet (GCS) files that the tests
+        use (the ones in unittest_import) as a new creature.
+
+        Returns: the summary of the times (see |__summarize|) with the
+            number of files imported on each run.
+        '''
+        filenames = sorted(glob.glob(os.path.join(self.__directory,
+                                                  'unittest_import',
+                                                  '*.gcs')))
+
+        def setup():
+            self.__window_manager.clear_responses()
+            for ignore in filenames:    # Each import asks
+                self.__window_manager.set_menu_response(
+                        'Add Which Equipment',
+                        {'op': ca_gcs_import.ToNative.EQUIP_ADD_ALL})
+
+        def scenario(ignore):
+            for filename in filenames:
+                self.__ruleset.import_creature_from_file(filename)
+
+        result = self.__time_runs(setup, scenario)
+        self.__window_manager.clear_responses()
+        result['files'] = len(filenames)
+        return result
+
+    def __load(self):
+        '''
+        Reads the Game File and builds the World from it.
+
+        Returns: the summary of the times (see |__summarize|).
+        '''
+        def scenario(ignore):
+            world_data = ca_json.GmJson(self.__game_filename)
+            world_data.open_read_close()
+            ca.World(self.__game_filename,
+                     world_data,
+                     self.__ruleset,
+                     ca.Program(self.__game_filename),
+                     self.__window_manager,
+                     save_snapshot=False)
+
+        return self.__time_runs(lambda: None, scenario)
+
+    def __make_game_file(self):
+        '''
+        Makes the Game File (the same one for every scenario) and writes it
+        to the work directory.
+
+        Returns nothing.
+        '''
+        self.__game_filename = os.path.join(self.__work_directory.name,
+                                            'benchmark.json')
+        ca_json.GmJson(self.__game_filename).open_write_close(
+                self.__generator.make_game_file())
+        with open(self.__game_filename, 'r') as f:
+            self.__game_file_text = f.read()
+
+    def __new_world(self):
+        '''
+        Builds a fresh World from the generated Game File without reading
+        the file.
+
+        Returns: the World object.
+        '''
+        world_data = ca_json.GmJson(self.__game_filename)
+        world_data.read_data = json.loads(self.__game_file_text)
+        return ca.World(self.__game_filename,
+                        world_data,
+                        self.__ruleset,
+                        ca.Program(self.__game_filename),
+                        self.__window_manager,
+                        save_snapshot=False)
+
+    def __query(self):
+        '''
+        Changes a few PCs and then asks the World who's hurt, who's carrying
+        a particular bag, and who has timers (see World.find_creatures).
+        The index is built before the clock starts, like it would be after
+        the first question in a session.
+
+        Returns: the summary of the times (see |__summarize|) with the
+            number of matches.
+        '''
+        bag = '%s Bag' % GameFileGenerator.words[0].title()
+        matches = [0]
+
+        def setup():
+            world = self.__new_world()
+            world.find_creatures()
+            return world
+
+        def scenario(world):
+            for name in list(world.get_creature_details_list('PCs'))[:3]:
+                fighter = world.get_creature(name, 'PCs')
+                fighter.rawdata['current']['hp'] -= 1
+                fighter.mark_changed()
+            found = world.find_creatures(states=['injured'],
+                                         attributes=[('hp', '<', 20)])
+            found += world.find_creatures(item=bag)
+            found += world.find_creatures(groups=['NPCs'], has_timers=True)
+            matches[0] = len(found)
+
+        result = self.__time_runs(setup, scenario)
+        result['matches'] = matches[0]
+        return result
+
+    def __rounds_of_actions(self):
+        '''
+        Fights |self.__rounds| rounds in which every fighter defends and
+        then passes the initiative to the next fighter (just like the GM
+        pressing 'd' and then space).
+
+        Returns: the summary of the times (see |__summarize|) with the
+            number of actions in each run.
+        '''
+        def setup():
+            world = self.__new_world()
+            return ca.FightHandler(self.__window_manager,
+                                   world,
+                                   Benchmark.__first_fight(world),
+                                   None,
+                                   save_snapshot=False)
+
+        def scenario(fight_handler):
+            ruleset = fight_handler.world.ruleset
+            next_fighter = fight_handler._choices[ord(' ')]['func']
+            turns = self.__rounds * len(fight_handler.get_fighters())
+            for turn in range(turns):
+                ruleset.do_action(fight_handler.get_current_fighter(),
+                                  {'action-name': 'defend'},
+                                  fight_handler)
+                next_fighter()
+            actions[0] = turns * 3  # defend, end-turn, start-turn
+
+        actions = [0]
+        result = self.__time_runs(setup, scenario)
+        result['actions'] = actions[0]
+        return result
+
+    def __save(self):
+        '''
+        Writes the World's data back out (like when the program exits).
+
+        Returns: the summary of the times (see |__summarize|).
+        '''
+        filename = os.path.join(self.__work_directory.name, 'saved.json')
+
+        def scenario(world):
+            ca_json.GmJson(filename).open_write_close(world.rawdata)
+
+        return self.__time_runs(self.__new_world, scenario)
+
+    def __search(self):
+        '''
+        Searches every PC, NPC, and monster for a word (like the main
+        screen's search).
+
+        Returns: the summary of the times (see |__summarize|) with the
+            number of matches.
+        '''
+        look_for_re = re.compile(GameFileGenerator.words[0])
+        matches = [0]
+
+        def scenario(world):
+            results = []
+            groups = ['PCs', 'NPCs'] + list(world.get_fights())
+            for group in groups:
+                for name in world.get_creature_details_list(group):
+                    creature = world.get_creature_details(name, group)
+                    results.extend(world.ruleset.search_one_creature(
+                            name, group, creature, look_for_re))
+            matches[0] = len(results)
+
+        result = self.__time_runs(self.__new_world, scenario)
+        result['matches'] = matches[0]
+        return result
+
+    def __snapshot(self):
+        '''
+        Writes a debug snapshot of the Game File.
+
+        Returns: the summary of the times (see |__summarize|).
+        '''
+        def scenario(world):
+            world.do_debug_snapshot('benchmark')
+
+        return self.__time_runs(self.__new_world, scenario)
+
+    def __startup(self):
+        '''
+        Imports the program and builds the ruleset in a fresh Python.
+
+        Returns: the summary of the times (see |__summarize|) with the
+            median time for each top-level import and initialization step.
+        '''
+        totals = []
+        steps = {}  # 'import ca' (e.g.): [seconds, ...]
+        for count in range(self.__repeat):
+            output = subprocess.run([sys.executable, '-c', STARTUP_SCRIPT],
+                                    cwd=self.__directory,
+                                    check=True,
+                                    stdout=subprocess.PIPE).stdout
+            profile = json.loads(output)
+            totals.append(profile['total_seconds'])
+            for entry in profile['entries']:
+                if entry['depth'] != 0 or entry['seconds'] is None:
+                    continue
+                key = '%s %s' % (entry['kind'], entry['name'])
+                steps.setdefault(key, []).append(entry['seconds'])
+
+        result = Benchmark.__summarize(totals)
+        result['steps'] = {key: statistics.median(seconds)
+                           for key, seconds in steps.items()}
+        return result
+
+    @staticmethod
+    def __summarize(seconds     # list of float: one time per run
+                    ):
+        '''
+        Returns a dict with the number of runs and the minimum, median, and
+        maximum times, in seconds.
+        '''
+        return {'runs': len(seconds),
+                'min': min(seconds),
+                'median': statistics.median(seconds),
+                'max': max(seconds)}
+
+    def __time_runs(self,
+                    setup,          # function: returns what |scenario| needs
+                    scenario,       # function: takes what |setup| returned
+                    cleanup=None    # function: takes what |setup| returned
+                    ):
+        '''
+        Runs |setup| (untimed), |scenario| (timed), and |cleanup| (untimed)
+        |self.__repeat| times.
+
+        Returns: the summary of the times (see |__summarize|).
+        '''
+        seconds = []
+        for count in range(self.__repeat):
+            state = setup()
+            start = time.perf_counter()
+            scenario(state)
+            seconds.append(time.perf_counter() - start)
+            if cleanup is not None:
+                cleanup(state)
+        return Benchmark.__summarize(seconds)
+
+    def __validation(self):
+        '''
+        Checks every creature in the Game File in the background (like the
+        program does when it starts) and waits for the checks to finish.
+
+        Returns: the summary of the times (see |__summarize|).
+        '''
+        def scenario(world):
+            service = ca_validation.ValidationService(self.__ruleset)
+            service.check_world(world)
+            while not service.is_done():
+                time.sleep(0.001)
+            service.shutdown()
+
+        return self.__time_runs(self.__new_world, scenario)
+
+
+# Main
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+            description='Time parts of the program.  Results are JSON.')
+    parser.add_argument('scenarios',
+                        nargs='*',
+                        help='scenarios to run (default: all of them)')
+    parser.add_argument('-n', '--repeat',
+                        help='number of times to run each scenario',
+                        type=int,
+                        default=5)
+    parser.add_argument('-o', '--output',
+                        help='write the results to this file (default: ' +
+                             'standard output)')
+    parser.add_argument('-l', '--list',
+                        help='list the scenarios and exit',
+                        action='store_true',
+                        default=False)
+    parser.add_argument('-g', '--generate',
+                        help='write the generated Game File to this file ' +
+                             'and exit')
+    parser.add_argument('--rounds',
+                        help='number of rounds in the "rounds" scenario',
+                        type=int,
+                        default=100)
+
+    game_file = parser.add_argument_group('generated Game File')
+    for setting, default, description in [
+            ('pcs', 6, 'number of PCs'),
+            ('npcs', 40, 'number of NPCs'),
+            ('fights', 20, 'number of fights'),
+            ('monsters', 12, 'number of monsters in each fight'),
+            ('items', 8, 'number of things in each creature and container'),
+            ('depth', 2, 'how deeply containers are nested'),
+            ('timers', 2, 'number of timers on each PC and NPC'),
+            ('history', 2000, 'number of actions in the fight history'),
+            ('seed', 0, 'seed for the random number generator')]:
+        game_file.add_argument('--%s' % setting,
+                               help='%s (default: %d)' % (description,
+                                                          default),
+                               type=int,
+                               default=default)
+    ARGS = parser.parse_args()
+
+    GAME_FILE = {setting: getattr(ARGS, setting)
+                 for setting in ['pcs', 'npcs', 'fights', 'monsters', 'items',
+                                 'depth', 'timers', 'history', 'seed']}
+    benchmark = Benchmark(ARGS.repeat, GAME_FILE, ARGS.rounds)
+    if ARGS.list:
+        for name in benchmark.get_scenario_names():
+            print(name)
+        sys.exit(0)
+
+    if ARGS.generate is not None:
+        generator = GameFileGenerator(benchmark.get_ruleset(), **GAME_FILE)
+        ca_json.GmJson(ARGS.generate).open_write_close(
+                generator.make_game_file())
+        sys.exit(0)
+
+    for name in ARGS.scenarios:
+        if name not in benchmark.get_scenario_names():
+            parser.error('no scenario named "%s"' % name)
+
+    RESULTS = benchmark.run(ARGS.scenarios)
+    if ARGS.output is None:
+        json.dump(RESULTS, sys.stdout, indent=2)
+        print('')
+    else:
+        with open(ARGS.output, 'w') as f:
+            json.dump(RESULTS, f, indent=2)
@@ -1,27 +1,42 @@
 #! /usr/bin/python
 
+import sys
+
+import ca_startup
+if __name__ == '__main__' and '--profile_startup' in sys.argv:
+    # This has to start before everything else is imported.
+    ca_startup.profile.start()
+
 import argparse
 import copy
 import curses
 import datetime
 import glob
+import gzip
 import json
 import os
 import pprint
 import random
 import re
 import shutil
-import sys
 import traceback
 
+import ca_autosave
 import ca_debug
 import ca_equipment
 import ca_fighter
+import ca_history
 import ca_json
 import ca_gui
+import ca_npc
+import ca_player_view
+import ca_query
 import ca_ruleset
 import ca_gurps_ruleset
 import ca_timers
+import ca_undo
+import ca_validation
+import diff_json
 
 # in priority order:
 
@@ -82,6 +97,20 @@ class CaGmWindowManager(ca_gui.GmWindowManager):
     def __init__(self):
         super(CaGmWindowManager, self).__init__()
 
+    def display_startup_profile(self):
+        '''
+        Stops the startup profile (see ca_startup) and, if it was running,
+        shows it to the user.
+
+        Returns nothing.
+        '''
+        if not ca_startup.profile.is_running():
+            return
+        ca_startup.profile.stop()
+        lines = [[{'text': line, 'mode': curses.A_NORMAL}]
+                 for line in ca_startup.profile.get_report_lines()]
+        self.display_window('Startup Profile', lines)
+
     def get_build_fight_gm_window(self,
                                   command_ribbon_choices  # dict: ord('T'):
                                                           #   {'name': xxx,
@@ -554,6 +583,20 @@ class FightGmWindow(ca_gui.GmWindow):
         self.__summary_window = None
         self.fighter_win_width = 0
 
+        # The summary pane only draws the fighters that fit.  It follows the
+        # current (or selected) fighter but it can also be scrolled on its
+        # own.
+        self.__summary_top = 0      # index of the first fighter shown
+        self.__summary_focus = None # index the pane last followed
+        self.__summary_args = None  # (fighters, current, selected) last shown
+        self.__summary_cache = {}   # id(fighter): (key, short description)
+        self.__summary_drawn = {}   # line: (text, mode) on the screen, now
+
+        # The fighter panes are only redrawn when the fighters in them (or
+        # the fight) have changed.
+        self.__character_key = None # what's in the character pane, now
+        self.__opponent_key = None  # what's in the opponent pane, now
+
     def close(self):
         ''' Closes the window and disposes of its resources.  '''
         # Kill my subwindows, first
@@ -622,30 +665,67 @@ class FightGmWindow(ca_gui.GmWindow):
                       fighters,
                       current_index,    # int: Index of fighter that has the
                                         #   initiative
-                      selected_index=None   # index to view if it's not the
+                      selected_index=None,  # index to view if it's not the
                                             #  current index
+                      changed=None  # set of id() of the ThingsInFight that
+                                    #   changed since the last call or None
+                                    #   to redraw everything
                       ):
         '''
         Displays the current state of the current fighter and his opponent,
-        if he has one.
-        '''
-
-        self.__show_fighter_notes(current_fighter,
-                                  opponent,
-                                  is_attacker=True,
-                                  window=self.__character_window)
-
-        if opponent is None:
-            self.__opponent_window.clear()
-            self.__opponent_window.refresh()
-        else:
-            self.__show_fighter_notes(opponent,
-                                      current_fighter,
-                                      is_attacker=False,
-                                      window=self.__opponent_window)
+        if he has one.  If |changed| is provided, the fighter panes are only
+        redrawn if their fighters changed and only the summary lines that
+        are different from what's on the screen are redrawn.
+        '''
+        if changed is None:
+            self.__character_key = None
+            self.__opponent_key = None
+            self.__summary_cache = {}
+            self.__summary_drawn = {}
+
+        # The medium description of each fighter depends on the other one so
+        # a change to either redraws both panes.
+        fighters_changed = (changed is None or
+                            id(current_fighter) in changed or
+                            (opponent is not None and id(opponent) in changed))
+
+        character_key = (id(current_fighter), id(opponent), current_index)
+        if fighters_changed or character_key != self.__character_key:
+            self.__character_key = character_key
+            self.__show_fighter_notes(current_fighter,
+                                      opponent,
+                                      is_attacker=True,
+                                      window=self.__character_window)
+
+        opponent_key = (id(opponent), id(current_fighter), current_index)
+        if fighters_changed or opponent_key != self.__opponent_key:
+            self.__opponent_key = opponent_key
+            if opponent is None:
+                self.__opponent_window.clear()
+                self.__opponent_window.refresh()
+            else:
+                self.__show_fighter_notes(opponent,
+                                          current_fighter,
+                                          is_attacker=False,
+                                          window=self.__opponent_window)
         self.__show_summary_window(fighters, current_index, selected_index)
         self.refresh()
 
+    def scroll_summary(self,
+                       adj  # int: number of lines to scroll (negative is up)
+                       ):
+        '''
+        Scrolls the summary pane without changing which fighter is current
+        or selected.
+
+        Returns nothing.
+        '''
+        if self.__summary_args is None:
+            return
+        self.__summary_top += adj
+        self.__show_summary_window(*self.__summary_args)
+        self.__summary_window.refresh()
+
     def start_fight(self):
         '''
         Builds the windows for the fight.  This is separate from the
@@ -668,6 +748,13 @@ class FightGmWindow(ca_gui.GmWindow):
 
         top_line = self.__FIGHTER_LINE  # Start after the main fighter info
 
+        self.__summary_top = 0
+        self.__summary_focus = None
+        self.__summary_cache = {}
+        self.__summary_drawn = {}
+        self.__character_key = None
+        self.__opponent_key = None
+
         # TODO (eventually): make these ca_gui.GmScrollableWindow windows
         self.__character_window = self._window_manager.new_native_window(
                 height,
@@ -699,6 +786,23 @@ class FightGmWindow(ca_gui.GmWindow):
     # Private Methods
     #
 
+    def __get_description_short(self,
+                                fighter  # Fighter object
+                                ):
+        '''
+        Returns the fighter's short description from the cache if nothing in
+        it has changed since it was built.
+        '''
+        key = fighter.get_description_short_key(self.__fight_handler)
+        if key is not None:
+            cached = self.__summary_cache.get(id(fighter))
+            if cached is not None and cached[0] == key:
+                return cached[1]
+        description = fighter.get_description_short(self.__fight_handler)
+        if key is not None:
+            self.__summary_cache[id(fighter)] = (key, description)
+        return description
+
     def __show_fighter_notes(self,
                              fighter,           # Fighter object
                              opponent,          # Fighter object
@@ -749,23 +853,75 @@ class FightGmWindow(ca_gui.GmWindow):
                               selected_index=None):
         '''
         Shows a short summary of each of the fighters in initiative order.
+        Only the fighters that fit in the pane are drawn, each fighter's
+        description is only rebuilt when something in it changes, and only
+        the lines that differ from what's already on the screen are redrawn.
 
         Returns nothing.
         '''
-        self.__summary_window.clear()
-        for line, fighter in enumerate(fighters):
+        self.__summary_args = (fighters, current_index, selected_index)
+        lines, cols = self.__summary_window.getmaxyx()
+
+        # Follow the current (or selected) fighter when it moves off of the
+        # pane, otherwise leave the pane where it was scrolled.
+        focus = current_index if selected_index is None else selected_index
+        if focus != self.__summary_focus:
+            self.__summary_focus = focus
+            if focus < self.__summary_top:
+                self.__summary_top = focus
+            elif focus >= self.__summary_top + lines:
+                self.__summary_top = focus - lines + 1
+        self.__summary_top = max(0, min(self.__summary_top,
+                                        len(fighters) - lines))
+
+        if len(self.__summary_drawn) == 0:
+            self.__summary_window.clear()
+
+        last_index = min(len(fighters), self.__summary_top + lines)
+        for line, index in enumerate(range(self.__summary_top, last_index)):
+            fighter = fighters[index]
             mode = self._window_manager.get_mode_from_fighter_state(
                                                         fighter.get_state())
             fighter_string = '%s%s' % (
-                            ('> ' if line == current_index else '  '),
-                            fighter.get_description_short(
-                                self.__fight_handler))
+                            ('> ' if index == current_index else '  '),
+                            self.__get_description_short(fighter))
 
-            if selected_index is not None and selected_index == line:
+            if selected_index is not None and selected_index == index:
                 mode = mode | curses.A_REVERSE
             elif fighter.group == 'PCs':
                 mode = mode | curses.A_BOLD
-            self.__summary_window.addstr(line, 0, fighter_string, mode)
+            self.__show_summary_line(line, fighter_string, mode, cols)
+
+        # Blank any lines left over from a longer list.
+        for line in range(last_index - self.__summary_top, lines):
+            if line not in self.__summary_drawn:
+                break
+            self.__show_summary_line(line, '', curses.A_NORMAL, cols)
+            del self.__summary_drawn[line]
+
+    def __show_summary_line(self,
+                            line,   # int: line in the summary pane
+                            text,   # string to show
+                            mode,   # curses mode for the line
+                            cols    # int: width of the summary pane
+                            ):
+        '''
+        Draws a line of the summary pane if it's not already on the screen.
+        The line is padded (in normal mode) so that it covers whatever was
+        there before.
+
+        Returns nothing.
+        '''
+        text = text[:cols-1]
+        if self.__summary_drawn.get(line) == (text, mode):
+            return
+        self.__summary_drawn[line] = (text, mode)
+        self.__summary_window.addstr(line, 0, text, mode)
+        if len(text) < cols-1:
+            self.__summary_window.addstr(line,
+                                         len(text),
+                                         ' ' * (cols - 1 - len(text)),
+                                         curses.A_NORMAL)
 
 
 class World(object):
@@ -774,6 +930,8 @@ class World(object):
     the entire world.
     '''
     debug_directory = 'debug'
+    default_autosave_seconds = 120  # when the 'autosave-seconds' option
+                                    #   isn't set
 
     def __init__(self,
                  source_filename,     # Name of file w/ the Game File
@@ -794,7 +952,26 @@ class World(object):
         self.ruleset = ruleset
         self.__window_manager = window_manager
         self.__delete_old_debug_files()
+        self.__prune_consistency_cache()
         self.__fighters = {}
+        self.__timer_clock = ca_timers.TimerClock()  # counts the rounds for
+                                                     #   all of the Fighters'
+                                                     #   timers
+        self.__autosave = None  # ca_autosave.AutosaveService object
+        self.__autosave_settings = None # (seconds, window_manager) to start
+                                        #   autosave again (see
+                                        #   |do_save_on_exit|)
+        self.__player_view = None   # ca_player_view.PlayerViewServer object
+        self.__creature_index = ca_query.CreatureIndex(
+                self.__get_creature_groups,
+                self.get_creature_details)
+
+        # The fight's history is kept as a ca_history.History object (which
+        # ca_json knows how to write back out).
+        if 'current-fight' in self.rawdata:
+            current_fight = self.rawdata['current-fight']
+            current_fight['history'] = ca_history.History(
+                    current_fight.get('history'))
 
         # |playing_back| is True only while we're actively playing back a
         # debug file.  There are two ways the code handles this variable.
@@ -843,9 +1020,69 @@ class World(object):
         ''' Adds an action to the saved history list.  '''
         self.rawdata['current-fight']['history'].append(action)
 
+    def autosave(self):
+        '''
+        Writes a copy of the Game File in the background if autosave is
+        running (see |start_autosave|), the Game File is to be saved on exit,
+        and it's time for a save.  Call this after each command.
+
+        Returns nothing.
+        '''
+        if self.__autosave is not None and self.is_saved_on_exit():
+            self.update_timer_rounds()
+            self.__autosave.tick(self.rawdata)
+
+    def check_creature_consistent(self,
+                                  name,     # string: creature's name
+                                  group,    # string: 'PCs', 'NPCs', or a
+                                            #   monster group
+                                  creature, # dict from Game File
+                                  check_weapons_and_armor=True,  # bool
+                                  fight_handler=None
+                                  ):
+        '''
+        Runs the ruleset's consistency check on a creature unless the
+        creature hasn't changed since it last passed the check.  The hash of
+        each creature that passed (see Ruleset.get_consistency_hash) is kept
+        in the Game File so this persists from one session to the next.
+
+        The hash is taken before the check so, if the check fixes the
+        creature, the creature is checked once more the next time.
+
+        Returns: the result of Ruleset.check_creature_consistent.
+        '''
+        if 'consistency-cache' not in self.rawdata:
+            self.rawdata['consistency-cache'] = {}
+        cache = self.rawdata['consistency-cache']  # group: {name: hash}
+        group_cache = cache.get(group, {})
+
+        creature_hash = self.ruleset.get_consistency_hash(creature)
+        if group_cache.get(name) == creature_hash:
+            return ca_ruleset.Ruleset.KEEP_CHECKING_CONSISTENCY
+
+        self.ruleset.consistency_problems = 0
+        result = self.ruleset.check_creature_consistent(name,
+                                                        creature,
+                                                        check_weapons_and_armor,
+                                                        fight_handler)
+
+        # Only remember complete checks that found nothing wrong.
+        playing_back = (False if fight_handler is None else
+                        fight_handler.world.playing_back)
+        if (result == ca_ruleset.Ruleset.KEEP_CHECKING_CONSISTENCY and
+                self.ruleset.consistency_problems == 0 and
+                check_weapons_and_armor and not playing_back):
+            cache.setdefault(group, group_cache)[name] = creature_hash
+        elif name in group_cache:
+            del group_cache[name]
+            if len(group_cache) == 0:
+                del cache[group]
+
+        return result
+
     def clear_history(self):
         ''' Removes all the saved history data.  '''
-        self.rawdata['current-fight']['history'] = []
+        self.rawdata['current-fight']['history'] = ca_history.History()
 
     def do_debug_snapshot(self,
                           tag,  # String with which to tag the debug filename
@@ -872,8 +1109,9 @@ class World(object):
             else:
                 keep_going = False
 
+        self.update_timer_rounds()
         with open(debug_filename, 'w') as f:
-            json.dump(self.rawdata, f, indent=2)
+            json.dump(self.rawdata, f, indent=2, cls=ca_json.BytesEncoder)
 
         self.program.add_snapshot(tag, debug_filename)
 
@@ -889,6 +1127,8 @@ class World(object):
         self.__gm_json.write_data = self.__gm_json.read_data
         self.ruleset.do_save_on_exit()
         ScreenHandler.maintain_game_file = False
+        if self.__autosave is None and self.__autosave_settings is not None:
+            self.start_autosave(*self.__autosave_settings)
 
     def dont_save_on_exit(self):
         '''
@@ -901,6 +1141,45 @@ class World(object):
         self.ruleset.dont_save_on_exit()
         ScreenHandler.maintain_game_file = True
 
+        # Nothing's going to be saved so this session's autosave would just
+        # be offered for recovery the next time the Game File is opened.
+        if self.__autosave is not None:
+            self.stop_autosave()
+            ca_autosave.AutosaveService.discard(self.source_filename)
+
+    def find_creatures(self,
+                       groups=None,     # list of strings: 'PCs', 'NPCs', or
+                                        #   fight names
+                       states=None,     # list of strings: 'alive', 'injured',
+                                        #   'unconscious', 'dead', ...
+                       attributes=None, # list of (attribute, comparison,
+                                        #   value), e.g., ('hp', '<', 0)
+                       item=None,       # string: name of an item carried
+                       spell=None,      # string: name of a spell known
+                       has_timers=None  # bool: has (or doesn't have) timers
+                       ):
+        '''
+        Finds the creatures that match all of the things asked for (see
+        ca_query.CreatureIndex.find).  This uses an index so it doesn't look
+        through every creature in the World.
+
+        Returns a list of (group, name) of the matching creatures.
+        '''
+        return self.__creature_index.find(groups=groups,
+                                          states=states,
+                                          attributes=attributes,
+                                          item=item,
+                                          spell=spell,
+                                          has_timers=has_timers)
+
+    def get_autosave_stats(self):
+        '''
+        Returns the autosave statistics (see
+        ca_autosave.AutosaveService.get_stats) or None if autosave isn't
+        running.
+        '''
+        return None if self.__autosave is None else self.__autosave.get_stats()
+
     def get_creature(self,
                      name,  # String: name of creature to get
                      group  # String: 'PCs', 'NPCs', or monster group
@@ -917,13 +1196,15 @@ class World(object):
             self.__fighters[group] = {}
 
         if name not in self.__fighters[group]:
-            self.__fighters[group][name] = ca_fighter.Fighter(
-                                            name,
-                                            group,
-                                            self.get_creature_details(name,
-                                                                      group),
-                                            self.ruleset,
-                                            self.__window_manager)
+            fighter = ca_fighter.Fighter(name,
+                                         group,
+                                         self.get_creature_details(name,
+                                                                   group),
+                                         self.ruleset,
+                                         self.__window_manager)
+            fighter.add_change_listener(self.__note_creature_change)
+            fighter.timers.set_clock(self.__timer_clock)
+            self.__fighters[group][name] = fighter
 
         return self.__fighters[group][name]
 
@@ -1023,6 +1304,13 @@ class World(object):
         '''
         return self.rawdata['fights']
 
+    def get_player_view(self):
+        '''
+        Returns the ca_player_view.PlayerViewServer that shows the fight to
+        the players or None if there isn't one (see |start_player_view|).
+        '''
+        return self.__player_view
+
     def get_random_name(self):
         '''
         Navigates through the different categories of Names (e.g., racial,
@@ -1130,6 +1418,8 @@ class World(object):
 
             # Remove fight from regular monster list
             del self.rawdata['fights'][group_name]
+            if 'consistency-cache' in self.rawdata:
+                self.rawdata['consistency-cache'].pop(group_name, None)
             del self.__fighters[group_name]
 
     def restore_fight(self,
@@ -1152,6 +1442,80 @@ class World(object):
         # Remove fight from dead-monsters
         del(self.rawdata['dead-monsters'][group_index])
 
+    def start_autosave(self,
+                       seconds,             # number: seconds between saves
+                                            #   (None for the default, 0 to
+                                            #   not autosave)
+                       window_manager=None  # GmWindowManager for errors
+                       ):
+        '''
+        Starts saving a copy of the Game File (see ca_autosave) in the
+        background every |seconds| seconds (see |autosave|).  If the Game
+        File isn't to be saved on exit, this waits for |do_save_on_exit|.
+
+        Returns nothing.
+        '''
+        self.stop_autosave()
+        if seconds is None:
+            seconds = World.default_autosave_seconds
+        if seconds <= 0:
+            return
+        self.__autosave_settings = (seconds, window_manager)
+        if not self.is_saved_on_exit():
+            return  # Started by |do_save_on_exit|
+        self.__autosave = ca_autosave.AutosaveService(self.source_filename,
+                                                      seconds,
+                                                      window_manager)
+
+    def start_player_view(self,
+                          address,             # int (or string of digits):
+                                               #   TCP port on localhost,
+                                               #   string: Unix socket name,
+                                               #   or None to not show the
+                                               #   players anything
+                          window_manager=None  # GmWindowManager for errors
+                          ):
+        '''
+        Starts the server that shows the fights to the players (see
+        ca_player_view).
+
+        Returns nothing.
+        '''
+        self.stop_player_view()
+        if address is None:
+            return
+        if isinstance(address, str) and address.isdigit():
+            address = int(address)  # A port (from the command line, say)
+        try:
+            self.__player_view = ca_player_view.PlayerViewServer(address)
+        except OSError as e:
+            if window_manager is not None:
+                window_manager.error(['Could not start the player view at ' +
+                                      '"%s":' % address,
+                                      str(e)])
+
+    def stop_autosave(self):
+        '''
+        Stops saving the Game File in the background and waits for any save
+        that's running to finish.  This has to be done before the autosave
+        file is discarded on exit.
+
+        Returns nothing.
+        '''
+        if self.__autosave is not None:
+            self.__autosave.shutdown()
+            self.__autosave = None
+
+    def stop_player_view(self):
+        '''
+        Disconnects the players' views and stops the server.
+
+        Returns nothing.
+        '''
+        if self.__player_view is not None:
+            self.__player_view.shutdown()
+            self.__player_view = None
+
     def toggle_saved_on_exit(self):
         '''
         Toggles whether the local copy of the Game File data is written back
@@ -1164,6 +1528,15 @@ class World(object):
         else:
             self.do_save_on_exit()
 
+    def update_timer_rounds(self):
+        '''
+        Brings the 'rounds' of all of the Fighters' timers up to date (see
+        ca_timers.TimerClock).  Call this before the Game File is written.
+
+        Returns nothing.
+        '''
+        self.__timer_clock.update_all()
+
     #
     # Private and Protected
     #
@@ -1199,6 +1572,52 @@ class World(object):
                 if mod_date < two_days_ago:  # '<' means 'earlier than'
                     os.remove(path)
 
+    def __get_creature_groups(self):
+        '''
+        Returns {group name: {creature name: entry in the Game File, ...},
+        ...} for the PCs, the NPCs, and the monsters in each fight (in that
+        order).
+        '''
+        groups = {}
+        for group_name in ('PCs', 'NPCs'):
+            if group_name in self.rawdata:
+                groups[group_name] = self.rawdata[group_name]
+        for fight_name, fight in self.rawdata.get('fights', {}).items():
+            groups[fight_name] = fight['monsters']
+        return groups
+
+    def __note_creature_change(self,
+                               creature     # ThingsInFight that changed
+                               ):
+        '''
+        Change listener for the Fighters in the World.  Has the creature
+        indexed again (see |find_creatures|).
+
+        Returns nothing.
+        '''
+        self.__creature_index.mark_changed(creature.rawdata)
+
+    def __prune_consistency_cache(self):
+        '''
+        Forgets the consistency check hashes (see |check_creature_consistent|)
+        of creatures that are no longer in the Game File.
+
+        Returns nothing.
+        '''
+        if 'consistency-cache' not in self.rawdata:
+            return
+        cache = self.rawdata['consistency-cache']
+        for group in list(cache.keys()):
+            creatures = self.get_creature_details_list(group)
+            if creatures is None or not isinstance(cache[group], dict):
+                del cache[group]
+                continue
+            for name in list(cache[group].keys()):
+                if name not in creatures:
+                    del cache[group][name]
+            if len(cache[group]) == 0:
+                del cache[group]
+
 
 class ScreenHandler(object):
     '''
@@ -1267,6 +1686,13 @@ class ScreenHandler(object):
         '''
         self.world.clear_history()
 
+    def get_undo_stack(self):
+        '''
+        Returns the ca_undo.UndoStack that records the actions done through
+        this handler or None if they can't be undone.
+        '''
+        return None
+
     def handle_user_input_until_done(self):
         '''
         Draws the screen and does event loop (gets single-character input,
@@ -1289,6 +1715,7 @@ class ScreenHandler(object):
                 self._window_manager.error(
                     ['Invalid command: "%s" ' %
                         ScreenHandler.string_from_character_input(string)])
+            self.world.autosave()
         return True
 
     #
@@ -1656,6 +2083,12 @@ class PersonnelHandler(ScreenHandler):
             ord('a'): {'name': 'add creature',
                        'func': self.__add_creature,
                        'help': 'Add a creature to the current group.'},
+            ord('A'): {'name': 'add many creatures',
+                       'func': self.__add_creatures,
+                       'help': 'Add a bunch of creatures, all made from ' +
+                               'the same template, to the current group.  ' +
+                               'They are named by adding a number to a ' +
+                               'name you provide.'},
             ord('c'): {'name': 'change creature',
                        'func': self.__change_creature,
                        'help': 'Modify the currently selected creature by ' +
@@ -2244,6 +2677,7 @@ class PersonnelHandler(ScreenHandler):
 
         changes = self.world.ruleset.update_creature_from_file(fighter.rawdata,
                                                                filename)
+        fighter.mark_changed()
         changes_with_modes = [
                 [{'text': x, 'mode': curses.A_NORMAL}] for x in changes ]
 
@@ -2313,6 +2747,85 @@ class PersonnelHandler(ScreenHandler):
 
         return True  # Keep going
 
+    def __add_creatures(self):
+        '''
+        Command ribbon method.
+
+        Creates a bunch of creatures, all at once, from one template.  Each
+        is named with a base name and a number.
+
+        Returns: False to exit the current ScreenHandler, True to stay.
+        '''
+        # A little error checking
+
+        self.__viewing_index = None
+        if self.__group_name is None:
+            self._window_manager.error(
+                ['You must select a new or existing group to which to',
+                 'add these creatures.'])
+            return True  # Keep going
+
+        if self.__template_group is None:
+            self.__change_template_group()
+        if self.__template_group is None:
+            return True  # The user decided against a template
+
+        # Which template, how many, and what to call them
+
+        templates = self.world.rawdata['templates'][self.__template_group]
+        template_menu = [(name, name) for name in
+                         sorted(templates.keys(), key=lambda x: x.upper())]
+        template_name, ignore = self._window_manager.menu('Which Template',
+                                                          template_menu)
+        if template_name is None:
+            return True
+
+        lines, cols = self._window.getmaxyx()
+        count = self._window_manager.input_box_number(1,      # height
+                                                      cols-4, # width
+                                                      'How Many')
+        if count is None or count <= 0:
+            return True
+
+        base_name = self._window_manager.input_box(
+                1,      # height
+                cols-4, # width
+                'Name (a number will be added)')
+        if isinstance(base_name, bytes):
+            base_name = base_name.decode('utf-8')
+        if base_name is None or len(base_name) == 0:
+            base_name = template_name
+
+        # Make them
+
+        factory = ca_npc.CreatureFactory(self.world.ruleset,
+                                         templates[template_name],
+                                         self._window_manager)
+        sampler = (None if self.__group_name == 'PCs' else
+                   ca_npc.PersonalitySampler.get())
+
+        number = 0
+        creature_name = None
+        for new_creature in factory.make_creatures(int(count)):
+            number += 1
+            while ('%s %d' % (base_name, number)) in self.__critters['data']:
+                number += 1
+            creature_name = '%s %d' % (base_name, number)
+            if sampler is not None:
+                new_creature['notes'].extend(sampler.get_notes())
+
+            self.__critters['data'][creature_name] = new_creature
+            self.__critters['obj'].append(self.world.get_creature(
+                                                        creature_name,
+                                                        self.__group_name))
+
+        self.__viewing_index = len(self.__critters['obj']) - 1
+        # PersonnelGmWindow
+        self._window.show_creatures(self.__critters['obj'],
+                                    creature_name,
+                                    self.__viewing_index)
+        return True  # Keep going
+
     def __add_equipment_from_store(
             self,
             throw_away   # Required/used by the caller because
@@ -2418,6 +2931,7 @@ class PersonnelHandler(ScreenHandler):
                                                 ['You must specify a skill'])
 
                 fighter.rawdata['spells'].append(my_copy)
+                fighter.mark_changed()
                 self._draw_screen()
 
             keep_asking, ignore = self._window_manager.menu('Add More Spells',
@@ -2585,8 +3099,9 @@ class PersonnelHandler(ScreenHandler):
         self._window_manager.menu('Do what', sub_menu)
 
         # Do a consistency check once you're done equipping
-        self.world.ruleset.check_creature_consistent(fighter.name,
-                                                     fighter.rawdata)
+        self.world.check_creature_consistent(fighter.name,
+                                             fighter.group,
+                                             fighter.rawdata)
 
         self._window.touchwin()
         self._window.refresh()
@@ -3257,8 +3772,9 @@ class PersonnelHandler(ScreenHandler):
         self._window_manager.menu('Do what', sub_menu)
 
         # Do a consistency check once you're done equipping
-        self.world.ruleset.check_creature_consistent(fighter.name,
-                                                     fighter.rawdata)
+        self.world.check_creature_consistent(fighter.name,
+                                             fighter.group,
+                                             fighter.rawdata)
 
         self._window.touchwin()
         self._window.refresh()
@@ -3469,58 +3985,12 @@ class PersonnelHandler(ScreenHandler):
         },
         '''
 
-        with ca_json.GmJson('gm-npc-random-detail.json') as npc_detail:
-            if (npc_detail.read_data is None or
-                    'traits' not in npc_detail.read_data):
-                return
-            for name, traits in npc_detail.read_data['traits'].items():
-                if name == 'oneline':
-                    # These are collections of things that go on a single line
-                    for line_name, line_pieces in traits.items():
-                        pieces = []
-                        for piece_list in line_pieces:
-                            piece = random.choice(piece_list)
-                            if piece is not None:
-                                pieces.append(piece)
-                        if len(pieces) == 0:
-                            pieces.append('normal')
-                        trait = ', '.join(pieces)
-                        new_creature['notes'].append('%s: %s' % (line_name,
-                                                                 trait))
-                else:
-                    trait = random.choice(traits)
-                    if isinstance(trait, dict):
-                        trait_array = [trait['text']]
-                        for key in trait:
-                            if key in npc_detail.read_data['support']:
-                                trait_array.append('%s: %s' %
-                                    (key,
-                                     random.choice(
-                                        npc_detail.read_data['support'][key])))
-                        trait = ', '.join(trait_array)
-
-                    new_creature['notes'].append('%s: %s' % (name, trait))
-
-    def __get_value_from_template(self,
-                                  template_value,
-                                  template
-                                  ):
-        '''
-        Expands a template item based on the template item's type.
-
-        Returns the expanded value.
-        '''
-        if template_value['type'] == 'value':
-            return template_value['value']
-
-        # TODO (eventually, maybe):
-        #   {'type': 'ask-string', 'value': x}
-        #   {'type': 'ask-numeric', 'value': x}
-        #   {'type': 'ask-logical', 'value': x}
-        #   {'type': 'dice', 'value': 'ndm+x'}
-        #   {'type': 'derived', 'value': comlicated stuff -- eventually}
-
-        return None
+        # The trait tables are read from the file once (see
+        # ca_npc.PersonalitySampler).
+        sampler = ca_npc.PersonalitySampler.get()
+        if sampler is None:
+            return
+        new_creature['notes'].extend(sampler.get_notes())
 
     def __give_equipment(self,
                          throw_away   # Required/used by the caller because
@@ -3705,6 +4175,7 @@ class PersonnelHandler(ScreenHandler):
                 return True
 
             fighter.rawdata['ignored-equipment'].append(item['name'].lower())
+            fighter.mark_changed()
 
             keep_asking, ignore = self._window_manager.menu(
                     'Ignore More Equipment', keep_asking_menu)
@@ -3768,20 +4239,12 @@ class PersonnelHandler(ScreenHandler):
         from_creature_name = from_creature_info['name']
 
         if from_creature_info['from'] == PersonnelHandler.FROM_TEMPLATE:
-            to_creature = self.world.ruleset.make_empty_creature()
             from_creature = (self.world.rawdata['templates'][
                              self.__template_group][from_creature_name])
-            for key, value in from_creature.items():
-                if key == 'permanent':
-                    for ikey, ivalue in value.items():
-                        to_creature['permanent'][ikey] = (
-                            self.__get_value_from_template(ivalue,
-                                                           from_creature))
-                        to_creature['current'][ikey] = to_creature[
-                                                        'permanent'][ikey]
-                else:
-                    to_creature[key] = self.__get_value_from_template(
-                                                    value, from_creature)
+            factory = ca_npc.CreatureFactory(self.world.ruleset,
+                                             from_creature,
+                                             self._window_manager)
+            to_creature = factory.make_creatures(1)[0]
         elif from_creature_info['from'] == PersonnelHandler.FROM_CREATURE:
             from_creature_name = from_creature_name
             to_creature = copy.deepcopy(critter_dict[from_creature_name])
@@ -3965,6 +4428,7 @@ class PersonnelHandler(ScreenHandler):
                     '^G to exit')
 
         notes_recipient.rawdata[notes_type] = [x for x in notes.split('\n')]
+        notes_recipient.mark_changed()
 
         # Display our new state
 
@@ -4039,6 +4503,7 @@ class PersonnelHandler(ScreenHandler):
             fighter.rawdata['preferred-armor-index'].remove(armor_index)
         else:
             fighter.rawdata['preferred-armor-index'].append(armor_index)
+        fighter.mark_changed()
 
         self._draw_screen()
         return True  # Anything but 'None' for a menu handler
@@ -4085,6 +4550,7 @@ class PersonnelHandler(ScreenHandler):
             fighter.rawdata['preferred-weapon-index'].remove(weapon_index)
         else:
             fighter.rawdata['preferred-weapon-index'].append(weapon_index)
+        fighter.mark_changed()
 
         self._draw_screen()
         return True  # Anything but 'None' for a menu handler
@@ -4099,8 +4565,8 @@ class PersonnelHandler(ScreenHandler):
         '''
         if self.__critters is not None:
             for name, creature in self.__critters['data'].items():
-                value = self.world.ruleset.check_creature_consistent(name,
-                                                                     creature)
+                value = self.world.check_creature_consistent(
+                        name, self.__group_name, creature)
                 if value == ca_ruleset.Ruleset.STOP_CHECKING:
                     break
 
@@ -4213,6 +4679,7 @@ class PersonnelHandler(ScreenHandler):
             for index, spell in enumerate(fighter.rawdata['spells']):
                 if spell['name'] == bad_spell_name:
                     del fighter.rawdata['spells'][index]
+                    fighter.mark_changed()
                     self._draw_screen()
                     break
 
@@ -4315,6 +4782,7 @@ class PersonnelHandler(ScreenHandler):
                 return None
 
             del fighter.rawdata[param][bad_ability_name]
+            fighter.mark_changed()
             self._draw_screen()
 
             if len(fighter.rawdata[param]) == 0:
@@ -4411,6 +4879,13 @@ class FightHandler(ScreenHandler):
     '''
 
     timing_file = 'timing.csv'
+    player_view_states = {  # what the players see of each Fighter state
+        ca_fighter.Fighter.ALIVE: 'alive',
+        ca_fighter.Fighter.INJURED: 'injured',
+        ca_fighter.Fighter.UNCONSCIOUS: 'unconscious',
+        ca_fighter.Fighter.DEAD: 'dead',
+    }
+    SUMMARY_PAGE = 10   # lines to scroll the summary pane at a time
 
     def __init__(self,
                  window_manager,        # GmWindowManager object for menus and
@@ -4430,6 +4905,9 @@ class FightHandler(ScreenHandler):
                                                     self._window_manager)
 
         self.__saved_history = None
+        self.__changed_fighters = set()  # id() of ThingsInFight changed since
+                                         #   the screen was last drawn
+        self.__undo_stack = None  # ca_undo.UndoStack, once there's a fight
 
         # If we're playing back history from a bug report and this fight has
         # spanned multiple sessions, start the replay history from the
@@ -4453,6 +4931,16 @@ class FightHandler(ScreenHandler):
                               'func': self.__view_next},
             curses.KEY_HOME: {'name': 'current character',
                               'func': self.__view_init},
+            curses.KEY_NPAGE: {'name': 'scroll summary down',
+                               'func': self.__summary_page_down,
+                               'help': 'Scroll DOWN the list of fighters ' +
+                                       '(on the right) without changing ' +
+                                       'the selected fighter.'},
+            curses.KEY_PPAGE: {'name': 'scroll summary up',
+                               'func': self.__summary_page_up,
+                               'help': 'Scroll UP the list of fighters ' +
+                                       '(on the right) without changing ' +
+                                       'the selected fighter.'},
 
             ord(' '): {'name': 'next fighter',
                        'func': self.__next_fighter,
@@ -4566,6 +5054,16 @@ class FightHandler(ScreenHandler):
                                'fight.  If one or more monsters are no ' +
                                'longer conscious, you will be given the ' +
                                'opportunity to loot the bodies.'},
+            ord('u'): {'name': 'undo',
+                       'func': self.__undo,
+                       'help': 'Undo the last action.  Actions can be ' +
+                               'undone, one by one, back to the beginning ' +
+                               'of the fight (or the last 100 actions).'},
+            ord('U'): {'name': 'Undo the undo (redo)',
+                       'func': self.__redo,
+                       'help': 'Redo the last action that was undone.  ' +
+                               'Once there\'s a new action, the undone ' +
+                               'actions can\'t be redone.'},
             ord('t'): {'name': 'timer',
                        'func': self.__timer,
                        'help': 'Start a timer for the selected fighter. ' +
@@ -4642,6 +5140,16 @@ class FightHandler(ScreenHandler):
         init = self.__build_fighter_list(monster_group, fight_order)
         self.__build_saved_fight(init)  # From self.__fighters
 
+        # Listen for changes to the fighters so that the screen only redraws
+        # the parts that changed.
+        for fighter in self.__fighters:
+            fighter.add_change_listener(self.__note_change)
+
+        self.__undo_stack = ca_undo.UndoStack(
+                self.__get_undo_roots,
+                ignore_keys=['history'],
+                after_apply=self.__rebuild_after_undo)
+
         # Make sure the monsters are self-consistent.
 
         if monster_group is not None:
@@ -4651,8 +5159,8 @@ class FightHandler(ScreenHandler):
                 rawdata = self.world.get_creature_details(name,
                                                           monster_group)
                 if rawdata is not None:
-                    value = self.world.ruleset.check_creature_consistent(name,
-                                                                         rawdata)
+                    value = self.world.check_creature_consistent(
+                            name, monster_group, rawdata)
                     if value == ca_ruleset.Ruleset.STOP_CHECKING:
                         break
 
@@ -4765,6 +5273,12 @@ class FightHandler(ScreenHandler):
     def get_round(self):
         return self._saved_fight['round']
 
+    def get_undo_stack(self):
+        '''
+        Returns the ca_undo.UndoStack for this fight.
+        '''
+        return self.__undo_stack
+
     def handle_user_input_until_done(self):
         '''
         Draws the screen and does event loop (gets input, responds to input)
@@ -4772,6 +5286,7 @@ class FightHandler(ScreenHandler):
         Returns: nothing
         '''
         self._draw_screen()
+        self.__publish_player_view()
 
         keep_going = True
         while keep_going:
@@ -4805,11 +5320,11 @@ class FightHandler(ScreenHandler):
                     show_fighter = (current_fighter if viewed_fighter is None
                                     else viewed_fighter)
                     show_opponent = self.get_opponent_for(show_fighter)
-                    self._window.show_fighters(show_fighter,
-                                               show_opponent,
-                                               self.__fighters,
-                                               self._saved_fight['index'],
-                                               self.__viewing_index)
+                    self.__show_fighters(show_fighter,
+                                         show_opponent,
+                                         self.__fighters,
+                                         self._saved_fight['index'],
+                                         self.__viewing_index)
             elif string < 256:
                 self._window_manager.error(
                                     ['Invalid command: "%c" ' % chr(string)])
@@ -4828,11 +5343,23 @@ class FightHandler(ScreenHandler):
                     current_fighter = self.__fighters[self.__viewing_index]
                 opponent = self.get_opponent_for(current_fighter)
 
-                self._window.show_fighters(current_fighter,
-                                           opponent,
-                                           self.__fighters,
-                                           self._saved_fight['index'],
-                                           self.__viewing_index)
+                self.__show_fighters(current_fighter,
+                                     opponent,
+                                     self.__fighters,
+                                     self._saved_fight['index'],
+                                     self.__viewing_index)
+
+            self.__publish_player_view()
+            self.world.autosave()
+
+        for fighter in self.__fighters:
+            fighter.remove_change_listener(self.__note_change)
+
+        player_view = self.world.get_player_view()
+        if player_view is not None:
+            player_view.publish({'round': None,
+                                 'current': None,
+                                 'fighters': []})
 
         # When done, move current fight to 'dead-monsters'
         if (not self._saved_fight['saved'] and
@@ -5023,11 +5550,11 @@ class FightHandler(ScreenHandler):
                          },
                         self)
 
-        self._window.show_fighters(current_fighter,
-                                   opponent,
-                                   self.__fighters,
-                                   self._saved_fight['index'],
-                                   self.__viewing_index)
+        self.__show_fighters(current_fighter,
+                             opponent,
+                             self.__fighters,
+                             self._saved_fight['index'],
+                             self.__viewing_index)
         return True  # Keep going
 
     def promote_to_NPC(self):                       # Public to support testing
@@ -5146,6 +5673,7 @@ class FightHandler(ScreenHandler):
         self._saved_fight['held-init'].append(
                 ('%s:%s' % (group, name),
                  {'name': name, 'group': group}))
+        self.__mark_fighter_changed(name, group)
 
         lines = []
         mode = curses.A_NORMAL
@@ -5183,6 +5711,7 @@ class FightHandler(ScreenHandler):
         # Remove the index entry from the menu
 
         self._saved_fight['held-init'].pop(menu_index)
+        self.__mark_fighter_changed(name, group)
 
         if in_place:
             return
@@ -5335,40 +5864,43 @@ class FightHandler(ScreenHandler):
             # There's no previously established fight order (which would be
             # the case if we're jumping into a fight that was saved) to
             # maintain, just generate the initiative for all of the fighters.
-            for fighter in self.__fighters:
-                init_tuple = self.world.ruleset.initiative(
-                              fighter,
-                              self.__fighters)
-
-                init[(fighter.name, fighter.group)] = init_tuple
+            init = self.world.ruleset.initiatives(self.__fighters)
         else:
-            # We're assuming that every fighter in fight_order is in
+            fighters_by_name = {(fighter.name, fighter.group): fighter
+                                for fighter in self.__fighters}
+
+            # Generate an initiative if it's not already there.  This deals
+            # with legacy fights that don't contain initiative.  We're
+            # assuming that every fighter in fight_order is in
             # self.__fighters but not necessarily the other way around.
+            legacy = [fighter for fighter in fight_order
+                      if fighter['name'] != ca_fighter.Venue.name and
+                      'init' not in fighter and
+                      (fighter['name'], fighter['group']) in fighters_by_name]
+            if len(legacy) > 0:
+                legacy_init = self.world.ruleset.initiatives(
+                        [fighters_by_name[(fighter['name'], fighter['group'])]
+                         for fighter in legacy],
+                        self.__fighters)
+                for fighter in legacy:
+                    fighter['init'] = legacy_init[(fighter['name'],
+                                                   fighter['group'])]
+
+            # Now, build |init| from the fight order
             for fighter in fight_order:
                 if fighter['name'] == ca_fighter.Venue.name:
                     continue
-
-                # Generate an initiative if it's not already there.  This
-                # deals with legacy fights that don't contain initiative.
-                if 'init' not in fighter:
-                    for f in self.__fighters:
-                        if (f.name == fighter['name'] and
-                                f.group == fighter['group']):
-                            fighter['init'] = self.world.ruleset.initiative(f)
-                            break
-
-                # Now, build |init| from the fight order
-                init[(fighter['name'], fighter['group'])] = fighter['init']
+                if 'init' in fighter:
+                    init[(fighter['name'], fighter['group'])] = fighter['init']
 
             # Finally, add initiative for any fighters that aren't represented
             # in the fight order.  This deals with fighters that were added
             # after the fight started.
-
-            for fighter in self.__fighters:
-                if (fighter.name, fighter.group) not in init:
-                    init[(fighter.name,
-                          fighter.group)] = self.world.ruleset.initiative(
-                                  fighter)
+            added = [fighter for fighter in self.__fighters
+                     if (fighter.name, fighter.group) not in init]
+            if len(added) > 0:
+                init.update(self.world.ruleset.initiatives(added,
+                                                           self.__fighters))
 
         # Now, sort based on the initiative we just built
 
@@ -5542,11 +6074,11 @@ class FightHandler(ScreenHandler):
 
         self.world.ruleset.do_action(hp_recipient, action, self)
 
-        self._window.show_fighters(current_fighter,
-                                   opponent,
-                                   self.__fighters,
-                                   self._saved_fight['index'],
-                                   self.__viewing_index)
+        self.__show_fighters(current_fighter,
+                             opponent,
+                             self.__fighters,
+                             self._saved_fight['index'],
+                             self.__viewing_index)
         return True  # Keep going
 
     def __dead(self):
@@ -5587,11 +6119,11 @@ class FightHandler(ScreenHandler):
                 self)
 
         opponent = self.get_opponent_for(current_fighter)
-        self._window.show_fighters(current_fighter,
-                                   opponent,
-                                   self.__fighters,
-                                   self._saved_fight['index'],
-                                   self.__viewing_index)
+        self.__show_fighters(current_fighter,
+                             opponent,
+                             self.__fighters,
+                             self._saved_fight['index'],
+                             self.__viewing_index)
         return True  # Keep going
 
     def __defend(self):
@@ -5608,11 +6140,11 @@ class FightHandler(ScreenHandler):
         opponent = self.get_opponent_for(current_fighter)
         if self.__viewing_index != self._saved_fight['index']:
             self.__viewing_index = None
-            self._window.show_fighters(current_fighter,
-                                       opponent,
-                                       self.__fighters,
-                                       self._saved_fight['index'],
-                                       self.__viewing_index)
+            self.__show_fighters(current_fighter,
+                                 opponent,
+                                 self.__fighters,
+                                 self._saved_fight['index'],
+                                 self.__viewing_index)
 
         # Figure out who is defending
         if opponent is None:
@@ -5635,11 +6167,11 @@ class FightHandler(ScreenHandler):
             },
             self)
 
-        self._window.show_fighters(current_fighter,
-                                   opponent,
-                                   self.__fighters,
-                                   self._saved_fight['index'],
-                                   self.__viewing_index)
+        self.__show_fighters(current_fighter,
+                             opponent,
+                             self.__fighters,
+                             self._saved_fight['index'],
+                             self.__viewing_index)
         return True  # Keep going
 
     def _draw_screen(self):
@@ -5662,6 +6194,7 @@ class FightHandler(ScreenHandler):
                                   next_PC_name,
                                   self.world.source_filename,
                                   ScreenHandler.maintain_game_file)
+        self.__changed_fighters = set()  # Redrawing everything, anyway
         self._window.show_fighters(current_fighter,
                                    opponent,
                                    self.__fighters,
@@ -5689,6 +6222,7 @@ class FightHandler(ScreenHandler):
                                            self,
                                            fighter)
         attribute_widget.doit()
+        self._draw_screen()
         return True  # keep fighting
 
     def __fight_notes(self):
@@ -5712,6 +6246,20 @@ class FightHandler(ScreenHandler):
         self.__notes('notes')
         return True  # keep fighting
 
+    def __get_undo_roots(self):
+        '''
+        Returns the data that the undo stack watches: {key: dict, ...} where
+        the keys are 'fight' (for the fight, itself) or (group, name) for
+        each of the fighters.  The timers' rounds are brought up to date
+        first so that the rounds an action takes off are part of the
+        action rather than looking like a change made between actions.
+        '''
+        self.world.update_timer_rounds()
+        roots = {'fight': self._saved_fight}
+        for fighter in self.__fighters:
+            roots[(fighter.group, fighter.name)] = fighter.rawdata
+        return roots
+
     def __give_equipment(self):
         '''
         Command ribbon method.
@@ -5798,14 +6346,11 @@ class FightHandler(ScreenHandler):
         label = self._window_manager.input_box(height, width, title)
 
         label_recipient.rawdata['label'] = label
+        label_recipient.mark_changed()
 
-        # Redraw the fighters
-        opponent = self.get_opponent_for(current_fighter)
-        self._window.show_fighters(current_fighter,
-                                   opponent,
-                                   self.__fighters,
-                                   self._saved_fight['index'],
-                                   self.__viewing_index)
+        # The rawdata was written here rather than through an action so
+        # redraw everything rather than trusting what's been marked.
+        self._draw_screen()
         return True
 
     def __loot_bodies(self,
@@ -5824,11 +6369,11 @@ class FightHandler(ScreenHandler):
             current_fighter = self.get_current_fighter()
             opponent = self.get_opponent_for(current_fighter)
             self.__viewing_index = None
-            self._window.show_fighters(current_fighter,
-                                       opponent,
-                                       self.__fighters,
-                                       self._saved_fight['index'],
-                                       self.__viewing_index)
+            self.__show_fighters(current_fighter,
+                                 opponent,
+                                 self.__fighters,
+                                 self._saved_fight['index'],
+                                 self.__viewing_index)
 
         self.__bodies_looted = True
         found_dead_bad_guy = False
@@ -5942,11 +6487,11 @@ class FightHandler(ScreenHandler):
         opponent = self.get_opponent_for(current_fighter)
         #if self.__viewing_index != self._saved_fight['index']:
         #    self.__viewing_index = None
-        #    self._window.show_fighters(current_fighter,
-        #                               opponent,
-        #                               self.__fighters,
-        #                               self._saved_fight['index'],
-        #                               self.__viewing_index)
+        #    self.__show_fighters(current_fighter,
+        #                         opponent,
+        #                         self.__fighters,
+        #                         self._saved_fight['index'],
+        #                         self.__viewing_index)
 
         action_menu = self.world.ruleset.get_action_menu(current_fighter,
                                                          opponent)
@@ -5964,13 +6509,27 @@ class FightHandler(ScreenHandler):
                                          self)
 
         opponent = self.get_opponent_for(current_fighter)
-        self._window.show_fighters(current_fighter,
-                                   opponent,
-                                   self.__fighters,
-                                   self._saved_fight['index'],
-                                   self.__viewing_index)
+        self.__show_fighters(current_fighter,
+                             opponent,
+                             self.__fighters,
+                             self._saved_fight['index'],
+                             self.__viewing_index)
         return True  # Keep going
 
+    def __mark_fighter_changed(self,
+                               name,    # string: name of the fighter
+                               group    # string: group of the fighter
+                               ):
+        '''
+        Marks a fighter as changed for those things (like holding initiative)
+        that are kept in the fight rather than in the fighter.
+
+        Returns nothing.
+        '''
+        index, fighter = self.get_fighter_object(name, group)
+        if fighter is not None:
+            fighter.mark_changed()
+
     def __multi_step_history(self):
         '''
         Command ribbon method.
@@ -6066,11 +6625,11 @@ class FightHandler(ScreenHandler):
                                   ScreenHandler.maintain_game_file)
 
         opponent = self.get_opponent_for(current_fighter)
-        self._window.show_fighters(current_fighter,
-                                   opponent,
-                                   self.__fighters,
-                                   self._saved_fight['index'],
-                                   self.__viewing_index)
+        self.__show_fighters(current_fighter,
+                             opponent,
+                             self.__fighters,
+                             self._saved_fight['index'],
+                             self.__viewing_index)
         return True  # Keep going
 
     def __next_PC_name(self):
@@ -6097,6 +6656,17 @@ class FightHandler(ScreenHandler):
             next_index += 1
         return next_PC_name
 
+    def __note_change(self,
+                      thing     # ThingsInFight object that changed
+                      ):
+        '''
+        Change listener for the ThingsInFight in the fight.  Remembers what
+        changed so that the screen can redraw just those things.
+
+        Returns nothing.
+        '''
+        self.__changed_fighters.add(id(thing))
+
     def __notes(self,
                 notes_type  # 'fight-notes' or 'notes'
                 ):
@@ -6128,14 +6698,10 @@ class FightHandler(ScreenHandler):
                     '^G to exit')
 
         notes_recipient.rawdata[notes_type] = [x for x in notes.split('\n')]
+        notes_recipient.mark_changed()
 
-        # Redraw the fighters
-        opponent = self.get_opponent_for(current_fighter)
-        self._window.show_fighters(current_fighter,
-                                   opponent,
-                                   self.__fighters,
-                                   self._saved_fight['index'],
-                                   self.__viewing_index)
+        # The notes window covered the screen so redraw all of it.
+        self._draw_screen()
         return True  # Keep going
 
     def __number_monsters(self,
@@ -6222,13 +6788,41 @@ class FightHandler(ScreenHandler):
                                   ScreenHandler.maintain_game_file)
         current_fighter = self.get_current_fighter()
         opponent = self.get_opponent_for(current_fighter)
-        self._window.show_fighters(current_fighter,
-                                   opponent,
-                                   self.__fighters,
-                                   self._saved_fight['index'],
-                                   self.__viewing_index)
+        self.__show_fighters(current_fighter,
+                             opponent,
+                             self.__fighters,
+                             self._saved_fight['index'],
+                             self.__viewing_index)
         return True  # Keep going
 
+    def __publish_player_view(self):
+        '''
+        Sends what the players can see of the fight (the initiative order,
+        the state of each fighter, and the round) to the player view, if
+        there is one (see ca_player_view).
+
+        Returns nothing.
+        '''
+        player_view = self.world.get_player_view()
+        if player_view is None:
+            return
+
+        fighters = []
+        current = None
+        for index, fighter in enumerate(self.__fighters):
+            if fighter.name == ca_fighter.Venue.name or fighter.is_absent():
+                continue
+            if index == self._saved_fight['index']:
+                current = len(fighters)
+            fighters.append({
+                'name': self.get_display_name(fighter),
+                'state': FightHandler.player_view_states.get(
+                        fighter.get_state(), 'alive')})
+
+        player_view.publish({'round': self._saved_fight['round'],
+                             'current': current,
+                             'fighters': fighters})
+
     def __quit(self):
         '''
         Command ribbon method.
@@ -6352,14 +6946,44 @@ class FightHandler(ScreenHandler):
                                       ScreenHandler.maintain_game_file)
 
             opponent = self.get_opponent_for(next_fighter)
-            self._window.show_fighters(next_fighter,
-                                       opponent,
-                                       self.__fighters,
-                                       self._saved_fight['index'],
-                                       self.__viewing_index)
+            self.__show_fighters(next_fighter,
+                                 opponent,
+                                 self.__fighters,
+                                 self._saved_fight['index'],
+                                 self.__viewing_index)
 
         self.world.playing_back = False
 
+    def __rebuild_after_undo(self,
+                             root_keys  # set: keys (see |__get_undo_roots|)
+                                        #   of the data that was put back
+                             ):
+        '''
+        Called by the undo stack after an undo or redo.  The fighters' data
+        is back the way it was but the things built from that data (the
+        Timer objects, for example) aren't so they're built again.
+
+        Returns nothing.
+        '''
+        for fighter in self.__fighters:
+            if (fighter.group, fighter.name) in root_keys:
+                fighter.timers.rebuild()
+                fighter.mark_changed()
+
+    def __redo(self):
+        '''
+        Command ribbon method.
+
+        Redoes the last action that was undone.
+
+        Returns: False to exit the current ScreenHandler, True to stay.
+        '''
+        self.world.ruleset.do_action(self.get_current_fighter(),
+                                     {'action-name': 'redo'},
+                                     self)
+        self.__show_after_undo()
+        return True  # Keep fighting
+
     def __remove_fighter_at_index(
             self,
             from_index  # index into _saved_fight and __fighters
@@ -6394,14 +7018,10 @@ class FightHandler(ScreenHandler):
             return True  # Keep fighting
 
         label_recipient.rawdata['label'] = None
+        label_recipient.mark_changed()
 
-        # Redraw the fighters
-        opponent = self.get_opponent_for(current_fighter)
-        self._window.show_fighters(current_fighter,
-                                   opponent,
-                                   self.__fighters,
-                                   self._saved_fight['index'],
-                                   self.__viewing_index)
+        # Redraw everything (see __label).
+        self._draw_screen()
         return True
 
     def __select_fighter(self,
@@ -6442,6 +7062,62 @@ class FightHandler(ScreenHandler):
                                                      default_selection)
         return selected_fighter, current_fighter
 
+    def __show_fighters(self,
+                        current_fighter,    # Fighter object
+                        opponent,           # Fighter object
+                        fighters,           # list of ThingsInFight
+                        current_index,      # int: index of the fighter with
+                                            #   the initiative
+                        selected_index=None # int: index being viewed
+                        ):
+        '''
+        Shows the fighters, only redrawing the things that have changed since
+        the last time they were shown.
+
+        Returns nothing.
+        '''
+        changed = self.__changed_fighters
+        self.__changed_fighters = set()
+        self._window.show_fighters(current_fighter,
+                                   opponent,
+                                   fighters,
+                                   current_index,
+                                   selected_index,
+                                   changed)
+
+    def __show_after_undo(self):
+        '''
+        Puts the fighters back in the order of the (just undone or redone)
+        fight and redraws everything.
+
+        Returns nothing.
+        '''
+        by_key = {(fighter.group, fighter.name): fighter
+                  for fighter in self.__fighters}
+        fighters = []
+        for fighter_dict in self._saved_fight['fighters']:
+            key = (fighter_dict['group'], fighter_dict['name'])
+            if key in by_key:
+                fighters.append(by_key[key])
+        self.__fighters[:] = fighters
+
+        self.__viewing_index = None
+        for fighter in self.__fighters:
+            fighter.mark_changed()
+
+        next_PC_name = self.__next_PC_name()
+        self._window.round_ribbon(self._saved_fight['round'],
+                                  next_PC_name,
+                                  self.world.source_filename,
+                                  ScreenHandler.maintain_game_file)
+        current_fighter = self.get_current_fighter()
+        opponent = self.get_opponent_for(current_fighter)
+        self.__show_fighters(current_fighter,
+                             opponent,
+                             self.__fighters,
+                             self._saved_fight['index'],
+                             self.__viewing_index)
+
     def __show_history(self):
         '''
         Command ribbon method.
@@ -6612,11 +7288,11 @@ class FightHandler(ScreenHandler):
                                          self)
 
         opponent = self.get_opponent_for(current_fighter)
-        self._window.show_fighters(current_fighter,
-                                   opponent,
-                                   self.__fighters,
-                                   self._saved_fight['index'],
-                                   self.__viewing_index)
+        self.__show_fighters(current_fighter,
+                             opponent,
+                             self.__fighters,
+                             self._saved_fight['index'],
+                             self.__viewing_index)
         return True  # Keep fighting
 
     def __timer_cancel(self):
@@ -6650,11 +7326,47 @@ class FightHandler(ScreenHandler):
         # Display the results
 
         opponent = self.get_opponent_for(current_fighter)
-        self._window.show_fighters(current_fighter,
-                                   opponent,
-                                   self.__fighters,
-                                   self._saved_fight['index'],
-                                   self.__viewing_index)
+        self.__show_fighters(current_fighter,
+                             opponent,
+                             self.__fighters,
+                             self._saved_fight['index'],
+                             self.__viewing_index)
+        return True  # Keep fighting
+
+    def __summary_page_down(self):
+        '''
+        Command ribbon method.
+
+        Scrolls the summary of fighters down a page.
+
+        Returns: False to exit the current ScreenHandler, True to stay.
+        '''
+        self._window.scroll_summary(FightHandler.SUMMARY_PAGE)
+        return True  # Keep going
+
+    def __summary_page_up(self):
+        '''
+        Command ribbon method.
+
+        Scrolls the summary of fighters up a page.
+
+        Returns: False to exit the current ScreenHandler, True to stay.
+        '''
+        self._window.scroll_summary(-FightHandler.SUMMARY_PAGE)
+        return True  # Keep going
+
+    def __undo(self):
+        '''
+        Command ribbon method.
+
+        Undoes the last action.
+
+        Returns: False to exit the current ScreenHandler, True to stay.
+        '''
+        self.world.ruleset.do_action(self.get_current_fighter(),
+                                     {'action-name': 'undo'},
+                                     self)
+        self.__show_after_undo()
         return True  # Keep fighting
 
     def __view_init(self):
@@ -6669,11 +7381,11 @@ class FightHandler(ScreenHandler):
         self.__viewing_index = None
         current_fighter = self.get_current_fighter()
         opponent = self.get_opponent_for(current_fighter)
-        self._window.show_fighters(current_fighter,
-                                   opponent,
-                                   self.__fighters,
-                                   self._saved_fight['index'],
-                                   self.__viewing_index)
+        self.__show_fighters(current_fighter,
+                             opponent,
+                             self.__fighters,
+                             self._saved_fight['index'],
+                             self.__viewing_index)
         return True  # Keep going
 
     def __view_next(self):
@@ -6692,11 +7404,11 @@ class FightHandler(ScreenHandler):
         opponent = self.get_opponent_for(viewing_fighter)
         if self.__viewing_index == self._saved_fight['index']:
             self.__viewing_index = None
-        self._window.show_fighters(viewing_fighter,
-                                   opponent,
-                                   self.__fighters,
-                                   self._saved_fight['index'],
-                                   self.__viewing_index)
+        self.__show_fighters(viewing_fighter,
+                             opponent,
+                             self.__fighters,
+                             self._saved_fight['index'],
+                             self.__viewing_index)
         return True  # Keep going
 
     def __view_prev(self):
@@ -6715,11 +7427,11 @@ class FightHandler(ScreenHandler):
         opponent = self.get_opponent_for(viewing_fighter)
         if self.__viewing_index == self._saved_fight['index']:
             self.__viewing_index = None
-        self._window.show_fighters(viewing_fighter,
-                                   opponent,
-                                   self.__fighters,
-                                   self._saved_fight['index'],
-                                   self.__viewing_index)
+        self.__show_fighters(viewing_fighter,
+                             opponent,
+                             self.__fighters,
+                             self._saved_fight['index'],
+                             self.__viewing_index)
         return True  # Keep going
 
     def __wait(self):
@@ -6902,6 +7614,12 @@ class MainHandler(ScreenHandler):
                             'func': self.__resurrect_fight,
                             'help': 'Put a fight that has been completed ' +
                                     'back in the list of availble fights'},
+                 ord('V'): {'name': 'validation report',
+                            'func': self.__show_validation,
+                            'help': 'Show the problems found so far by ' +
+                                    'the background check of every PC, ' +
+                                    'NPC, template, and monster in the ' +
+                                    'game file.'},
                  ord('S'): {'name': 'toggle: Save On Exit',
                             'func': self.__maintain_game_file,
                             'help': 'Toggle whether all of the changes to ' +
@@ -6936,10 +7654,17 @@ class MainHandler(ScreenHandler):
         for name in self.world.get_creature_details_list('PCs'):
             rawdata = self.world.get_creature_details(name, 'PCs')
             if rawdata is not None:
-                value = self.world.ruleset.check_creature_consistent(name, rawdata)
+                value = self.world.check_creature_consistent(name,
+                                                             'PCs',
+                                                             rawdata)
                 if value == ca_ruleset.Ruleset.STOP_CHECKING:
                     break
 
+        # Check everybody else in the background.
+        self.__validation = ca_validation.ValidationService(self.world.ruleset)
+        self.__validation.check_world(self.world)
+        self.__validation_results = []  # ValidationResult objects
+
     #
     # Public Methods
     #
@@ -7269,6 +7994,7 @@ class MainHandler(ScreenHandler):
 
         Returns: False to exit the current ScreenHandler, True to stay.
         '''
+        self.__validation.shutdown(wait=False)
         self._window.close()
         del self._window
         self._window = None
@@ -7513,6 +8239,35 @@ class MainHandler(ScreenHandler):
 
         self.__char_index = 0
 
+    def __show_validation(self):
+        '''
+        Command ribbon method.
+
+        Shows the problems that the background validation has found so far.
+
+        Returns: True -- anything but None in a menu handler
+        '''
+        self.__validation_results.extend(self.__validation.get_results())
+
+        lines = []
+        for result in self.__validation_results:
+            lines.append([{'text': '%s (%s)' % (result.name, result.group),
+                           'mode': curses.A_BOLD}])
+            for problem in result.problems:
+                for string in problem:
+                    lines.append([{'text': '  %s' % string,
+                                   'mode': curses.A_NORMAL}])
+
+        if not self.__validation.is_done():
+            lines.append([{'text': '(Still checking...)',
+                           'mode': curses.A_NORMAL}])
+        elif len(self.__validation_results) == 0:
+            lines.append([{'text': 'No problems found',
+                           'mode': curses.A_NORMAL}])
+
+        self._window_manager.display_window('Validation Report', lines)
+        return True
+
     def __toggle_Monster_PC_NPC_display(self):
         '''
         Command ribbon method.
@@ -7622,6 +8377,8 @@ class Program(object):
     As part of that, it manages the debug files (which are really just
     snapshots of the Game File).
     '''
+    patch_extension = '.patch.json.gz'
+
     def __init__(self,
                  source_filename,     # string: Name of the Game File
                  ):
@@ -7642,6 +8399,44 @@ class Program(object):
         '''
         self.__snapshots[tag] = filename
 
+    @staticmethod
+    def get_bug_report_snapshot(
+            folder,         # string: bug report folder
+            bug_report,     # dict: contents of the bug report file
+            tag             # string: which snapshot (e.g., 'fight')
+            ):
+        '''
+        Finds one of the snapshots in a bug report folder, rebuilding it
+        from its patch (see |make_bug_report|) if it hasn't been rebuilt,
+        already.
+
+        Returns the name of the snapshot file or None if it couldn't be
+        rebuilt.
+        '''
+        filename = os.path.join(folder, bug_report['snapshots'][tag])
+        if not filename.endswith(Program.patch_extension):
+            return filename  # It was saved whole
+
+        rebuilt_filename = '%s.json' % filename[:-len(Program.patch_extension)]
+        if os.path.exists(rebuilt_filename):
+            return rebuilt_filename
+
+        base_tag = bug_report['base-snapshot']
+        data = Program.__read_json(
+                os.path.join(folder, bug_report['snapshots'][base_tag]))
+        if data is None:
+            return None
+        try:
+            with gzip.open(filename, 'rt') as f:
+                patch = json.load(f)
+        except (OSError, ValueError):
+            return None
+        data = diff_json.JsonPatch.apply(data, patch)
+
+        with open(rebuilt_filename, 'w') as f:
+            json.dump(data, f, indent=2)
+        return rebuilt_filename
+
     def make_bug_report(self,
                         history,           # list of action dicts for the
                                            #   most recently started fight
@@ -7666,15 +8461,18 @@ class Program(object):
                 with ca_json.GmJson(crash_snapshot) as crashfile:
                     if 'current-fight' in crashfile.read_data:
                         if 'history' in crashfile.read_data['current-fight']:
-                            history = crashfile.read_data['current-fight'][
-                                    'history']
+                            history = ca_history.History(
+                                    crashfile.read_data['current-fight'][
+                                        'history'])
 
         # Build the bug report
 
         bug_report = {
             'version':    VERSION,
             'world':      self.__source_filename,
-            'history':    copy.deepcopy(history),
+            'history':    (history.to_actions()
+                           if isinstance(history, ca_history.History)
+                           else history),
             'report':     user_description,
             'snapshots':  self.__snapshots
         }
@@ -7706,16 +8504,10 @@ class Program(object):
 
         os.mkdir(new_debug_folder)
 
-        # Copy the snapshot files into the bug report directory.
+        # Put the snapshot files into the bug report directory.
 
-        new_snapshots = {}
-        for key, path_name in self.__snapshots.items():
-            shutil.copy(path_name, new_debug_folder)
-            folder_name, filename = os.path.split(path_name)
-            new_snapshots[key] = filename
-            # os.path.join(new_debug_folder, filename)
-
-        bug_report['snapshots'] = new_snapshots
+        bug_report['base-snapshot'], bug_report['snapshots'] = (
+                self.__write_snapshots(new_debug_folder))
 
         # Dump the bug report into bug report file (in the directory)
 
@@ -7726,6 +8518,65 @@ class Program(object):
 
         return bug_report_game_file
 
+    #
+    # Private methods
+    #
+
+    @staticmethod
+    def __read_json(filename    # string: name of a JSON file
+                    ):
+        '''
+        Reads a JSON file without complaining (a bug report is often made
+        when things have gone wrong).
+
+        Returns the contents of the file or None if it couldn't be read.
+        '''
+        try:
+            with open(filename, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def __write_snapshots(self,
+                          folder    # string: bug report folder
+                          ):
+        '''
+        Puts the snapshots into a bug report folder.  The first one (the
+        Game File at startup) is copied whole and each of the others is
+        written as a gzipped JSON patch (see diff_json.JsonPatch) against
+        the first.  That way, a bug report isn't several copies of a big
+        Game File.  A snapshot that can't be read is copied whole.
+
+        Returns a tuple: (tag of the whole snapshot,
+                          {tag: filename in the folder, ...})
+        '''
+        base_tag = None
+        base = None
+        new_snapshots = {}
+        for tag, path_name in self.__snapshots.items():
+            folder_name, filename = os.path.split(path_name)
+            snapshot = None
+            if base_tag is None:
+                base_tag = tag
+                base = Program.__read_json(path_name)
+            elif base is not None:
+                snapshot = Program.__read_json(path_name)
+
+            if snapshot is None:
+                shutil.copy(path_name, folder)
+                new_snapshots[tag] = filename
+                continue
+
+            patch_filename = '%s%s' % (os.path.splitext(filename)[0],
+                                       Program.patch_extension)
+            with gzip.open(os.path.join(folder, patch_filename), 'wt') as f:
+                json.dump(diff_json.JsonPatch.make(base, snapshot),
+                          f,
+                          cls=ca_json.BytesEncoder)
+            new_snapshots[tag] = patch_filename
+
+        return base_tag, new_snapshots
+
 
 class Options(object):
     # The JSON file that contains options is expected to look like this:
@@ -7760,10 +8611,10 @@ class Options(object):
     def set_global_option(self, option_name, option_value):
         self.__global_options[option_name] = option_value
 
+VERSION = '00.07.00'    # major version, minor version, bug fixes
+
 # Main
 if __name__ == '__main__':
-    VERSION = '00.07.00'    # major version, minor version, bug fixes
-
     parser = MyArgumentParser()
     parser.add_argument(
             'filename',
@@ -7783,6 +8634,12 @@ if __name__ == '__main__':
             default=False)
     parser.add_argument('-r', '--replay',
                         help='Play history from bug report folder.')
+    parser.add_argument(
+            '--profile_startup',
+            help='Show how long each module takes to import and each part ' +
+                 'of the program takes to start.  Debugging only.',
+            action='store_true',
+            default=False)
 
     ARGS = parser.parse_args()
 
@@ -7794,8 +8651,12 @@ if __name__ == '__main__':
     replay_history = None
 
     program = None
-    with (CaGmWindowManager() as window_manager,
-            ca_gurps_ruleset.GurpsRuleset(window_manager) as ruleset):
+    world = None
+    with ca_startup.profile.timing('window manager'):
+        window_manager = CaGmWindowManager()
+    with ca_startup.profile.timing('ruleset'):
+        ruleset = ca_gurps_ruleset.GurpsRuleset(window_manager)
+    with window_manager, ruleset:
 
         # Prefs
         # NOTE: When other things find their way into the prefs, the scope
@@ -7824,9 +8685,15 @@ if __name__ == '__main__':
 
             # Extract information from bug_report file
             with ca_json.GmJson(files[0]) as bug_report:
-                filename = bug_report.read_data['snapshots']['fight']
-                filename = os.path.join(ARGS.replay, filename)
-                replay_history = bug_report.read_data['history']
+                filename = Program.get_bug_report_snapshot(
+                        ARGS.replay, bug_report.read_data, 'fight')
+                if filename is None:
+                    window_manager.error(
+                            ['Could not rebuild the fight snapshot in "%s"' %
+                             ARGS.replay])
+                    sys.exit(2)
+                replay_history = ca_history.History(
+                        bug_report.read_data['history']).to_actions()
                 if 'report' in bug_report.read_data:
                     report_text = bug_report.read_data['report']
         else:
@@ -7911,6 +8778,19 @@ if __name__ == '__main__':
 
         # Read the Campaign Data
 
+        # If the last session didn't get as far as writing the Game File,
+        # its autosave is newer than the Game File.
+        if (ARGS.replay is None and not ARGS.maintain_game_file and
+                ca_autosave.AutosaveService.is_recoverable(filename)):
+            recover_menu = [('yes (the old file is kept as .bak)', True),
+                            ('no (the autosave is removed)', False)]
+            recover, ignore = window_manager.menu(
+                    'Recover "%s" from its autosave' % filename, recover_menu)
+            if recover is True:
+                ca_autosave.AutosaveService.recover(filename)
+            elif recover is False:
+                ca_autosave.AutosaveService.discard(filename)
+
         # If the program exits before we turn this to True, we probably
         # exited via a crash
         orderly_shutdown = False
@@ -7926,7 +8806,9 @@ if __name__ == '__main__':
                 sys.exit(2)
 
             program = Program(filename)
-            world = World(filename, campaign, ruleset, program, window_manager)
+            with ca_startup.profile.timing('World'):
+                world = World(filename, campaign, ruleset, program,
+                              window_manager)
             campaign_options = (None if 'options' not in world.rawdata else
                                 world.rawdata['options'])
             # NOTE: |prefs| is not guaranteed to be writeable
@@ -7946,42 +8828,66 @@ if __name__ == '__main__':
                 world.dont_save_on_exit()
             else:
                 world.do_save_on_exit()
-
-            if report_text is not None:
-                naked_lines = report_text.split('\n')
-                lines = []
-                for line in naked_lines:
-                    line = line.rstrip('\r')
-                    line = line.rstrip('\n')
-                    line = line.rstrip()
-                    if len(line) > 0:
-                        lines.append([{'text': line, 'mode': curses.A_NORMAL}])
-
-                window_manager.display_window('Playing Back Bug Report', lines)
-
-            if world.rawdata['current-fight']['saved']:
-                is_new = False if os.path.exists(FightHandler.timing_file) else True
-                mode = 'w' if is_new else 'a'
-                with open(FightHandler.timing_file, mode) as f:
-                    world.ruleset.set_timing_file(f, is_new)
-
-                    fight_handler = FightHandler(window_manager,
-                                                 world,
-                                                 None,
-                                                 replay_history)
-                    fight_handler.handle_user_input_until_done()
-
-                    world.ruleset.set_timing_file(None)
-
-            # Enter into the mainloop
-            main_handler = MainHandler(window_manager, world)
-            orderly_shutdown = main_handler.handle_user_input_until_done()
+            world.start_autosave(options.get_option('autosave-seconds'),
+                                 window_manager)
+            world.start_player_view(options.get_option('player-view'),
+                                    window_manager)
+
+            # The autosave has to be done before the Game File is written
+            # on exit (even if there's a crash) so that the autosave file
+            # can be discarded once the Game File is safely written.
+            try:
+                if report_text is not None:
+                    naked_lines = report_text.split('\n')
+                    lines = []
+                    for line in naked_lines:
+                        line = line.rstrip('\r')
+                        line = line.rstrip('\n')
+                        line = line.rstrip()
+                        if len(line) > 0:
+                            lines.append([{'text': line,
+                                           'mode': curses.A_NORMAL}])
+
+                    window_manager.display_window('Playing Back Bug Report',
+                                                  lines)
+
+                if world.rawdata['current-fight']['saved']:
+                    is_new = (False if os.path.exists(FightHandler.timing_file)
+                              else True)
+                    mode = 'w' if is_new else 'a'
+                    with open(FightHandler.timing_file, mode) as f:
+                        world.ruleset.set_timing_file(f, is_new)
+
+                        with ca_startup.profile.timing('FightHandler'):
+                            fight_handler = FightHandler(window_manager,
+                                                         world,
+                                                         None,
+                                                         replay_history)
+                        window_manager.display_startup_profile()
+                        fight_handler.handle_user_input_until_done()
+
+                        world.ruleset.set_timing_file(None)
+
+                # Enter into the mainloop
+                with ca_startup.profile.timing('MainHandler'):
+                    main_handler = MainHandler(window_manager, world)
+                window_manager.display_startup_profile()
+                orderly_shutdown = main_handler.handle_user_input_until_done()
+            finally:
+                world.stop_player_view()
+                world.stop_autosave()
+                world.update_timer_rounds()  # before the Game File's written
 
             # TODO (remove): Bokor Requiem
             #debug = ca_debug.Debug()
             #debug.header1('Exit')
             #debug.pprint(campaign.read_data['PCs'])
 
+        # The Game File's been written (leaving |campaign| writes it) so the
+        # autosave isn't needed anymore.
+        if world is not None and world.is_saved_on_exit():
+            ca_autosave.AutosaveService.discard(filename)
+
         # Write a crashdump of the shutdown
         debug = ca_debug.Debug()
         debug.finish_up()
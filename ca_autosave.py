@@ -0,0 +1,247 @@
+#! /usr/bin/python
+
+import concurrent.futures
+import json
+import os
+import pickle
+import threading
+import time
+
+import ca_json
+
+
+class AutosaveService(object):
+    '''
+    Writes a copy of the Game File every so often so that a crash (or a
+    power failure) doesn't lose a whole session.  The copy goes in its own
+    file (see |get_autosave_filename|); the Game File, itself, is only
+    written when the program exits.  If the program doesn't get that far,
+    the copy is offered the next time the Game File is opened (see
+    |is_recoverable| and |recover|).
+
+    Writing a big Game File takes long enough to notice so only the
+    snapshot is taken on the UI thread: the data is pickled (which is much
+    faster than writing it as JSON and gives us a copy that the UI can't
+    change out from under us).  A worker thread turns the snapshot into
+    JSON and writes it to a temporary file that then replaces the autosave
+    file, so the autosave file is never half-written.
+
+    Nothing is written if the data hasn't changed since the last save.  If
+    a save is still running when the next one comes due, the next one waits
+    for the following tick.
+    '''
+    def __init__(self,
+                 filename,              # string: the Game File
+                 seconds,               # number: seconds between saves
+                 window_manager=None    # GmWindowManager object for errors
+                 ):
+        self.__filename = AutosaveService.get_autosave_filename(filename)
+        self.__seconds = seconds
+        self.__window_manager = window_manager
+        self.__executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=1,
+                thread_name_prefix='autosave')
+        self.__future = None        # concurrent.futures.Future of the save
+                                    #   that's running
+        self.__last_snapshot = None # pickled data from the last save
+                                    #   (guarded by |__lock|)
+        self.__last_time = time.monotonic()
+        self.__lock = threading.Lock()
+        self.__stats = {'saves': 0,             # number of files written
+                        'unchanged': 0,         # saves skipped: no change
+                        'busy': 0,              # saves skipped: still saving
+                        'snapshot_seconds': 0.0,    # last snapshot (UI)
+                        'save_seconds': 0.0,        # last save (worker)
+                        'max_save_seconds': 0.0,
+                        'total_save_seconds': 0.0,
+                        'bytes': 0,             # size of the last file
+                        'error': None}          # string: last error
+        self.__reported_error = None
+
+    @staticmethod
+    def discard(filename    # string: the Game File
+                ):
+        '''
+        Removes the autosave file for |filename|, if there is one.  Do this
+        once the Game File has been written.
+
+        Returns nothing.
+        '''
+        try:
+            os.remove(AutosaveService.get_autosave_filename(filename))
+        except FileNotFoundError:
+            pass
+
+    @staticmethod
+    def get_autosave_filename(filename  # string: the Game File
+                              ):
+        '''
+        Returns the name of the file to which |filename| is autosaved (e.g.,
+        'campaign.json' is autosaved to 'campaign.autosave.json').
+        '''
+        base, extension = os.path.splitext(filename)
+        return '%s.autosave%s' % (base, extension if extension else '.json')
+
+    def get_stats(self):
+        '''
+        Returns a copy of the statistics kept about the saves (see
+        |__init__|).  Times are in seconds.
+        '''
+        with self.__lock:
+            return dict(self.__stats)
+
+    def is_due(self):
+        '''
+        Returns True if it's time for another save, False otherwise.
+        '''
+        return time.monotonic() - self.__last_time >= self.__seconds
+
+    @staticmethod
+    def is_recoverable(filename     # string: the Game File
+                       ):
+        '''
+        Returns True if there's an autosave of |filename| that's newer than
+        |filename| (i.e., the program didn't exit cleanly after saving it).
+        '''
+        autosave_filename = AutosaveService.get_autosave_filename(filename)
+        try:
+            autosave_time = os.stat(autosave_filename).st_mtime
+        except FileNotFoundError:
+            return False
+        try:
+            return autosave_time >= os.stat(filename).st_mtime
+        except FileNotFoundError:
+            return True
+
+    @staticmethod
+    def recover(filename    # string: the Game File
+                ):
+        '''
+        Replaces |filename| with its autosave.  The Game File that's replaced
+        is kept as '<filename>.bak'.
+
+        Returns nothing.
+        '''
+        autosave_filename = AutosaveService.get_autosave_filename(filename)
+        if os.path.exists(filename):
+            os.replace(filename, '%s.bak' % filename)
+        os.replace(autosave_filename, filename)
+
+    def save_now(self,
+                 rawdata    # dict: the data to be written
+                 ):
+        '''
+        Takes a snapshot of |rawdata| and has it written in the background.
+
+        Returns True if a save was started, False if it wasn't (because the
+        data hasn't changed or the last save is still running).
+        '''
+        self.__last_time = time.monotonic()
+        self.__report_error()
+
+        if self.__future is not None and not self.__future.done():
+            with self.__lock:
+                self.__stats['busy'] += 1
+            return False
+
+        start = time.perf_counter()
+        snapshot = pickle.dumps(rawdata, protocol=pickle.HIGHEST_PROTOCOL)
+        snapshot_seconds = time.perf_counter() - start
+
+        with self.__lock:
+            self.__stats['snapshot_seconds'] = snapshot_seconds
+            if snapshot == self.__last_snapshot:
+                self.__stats['unchanged'] += 1
+                return False
+            self.__last_snapshot = snapshot
+
+        self.__future = self.__executor.submit(self.__save, snapshot)
+        return True
+
+    def shutdown(self,
+                 wait=True  # bool: wait for a save that's running to finish
+                 ):
+        '''
+        Stops the service.  Nothing else is saved.
+
+        Returns nothing.
+        '''
+        self.__executor.shutdown(wait=wait)
+
+    def tick(self,
+             rawdata    # dict: the data to be written
+             ):
+        '''
+        Saves |rawdata| if it's time to do so.  Call this every so often
+        (after each command, for example) from the UI thread.
+
+        Returns nothing.
+        '''
+        if self.is_due():
+            self.save_now(rawdata)
+        else:
+            self.__report_error()
+
+    def wait(self):
+        '''
+        Waits for the save that's running (if there is one) to finish.
+
+        Returns nothing.
+        '''
+        if self.__future is not None:
+            self.__future.result()
+
+    #
+    # Private methods
+    #
+
+    def __report_error(self):
+        '''
+        Shows (once) the error from the last save, if there was one.
+
+        Returns nothing.
+        '''
+        with self.__lock:
+            error = self.__stats['error']
+        if error is None or error is self.__reported_error:
+            return
+        self.__reported_error = error
+        if self.__window_manager is not None:
+            self.__window_manager.error(['Autosave of "%s" failed:' %
+                                         self.__filename,
+                                         error])
+
+    def __save(self,
+               snapshot     # bytes: pickled data to be written
+               ):
+        '''
+        Writes the snapshot as JSON.  Runs on the worker thread.
+
+        Returns nothing.
+        '''
+        start = time.perf_counter()
+        temp_filename = '%s.tmp' % self.__filename
+        try:
+            data = json.dumps(pickle.loads(snapshot),
+                              indent=2,
+                              cls=ca_json.BytesEncoder)
+            with open(temp_filename, 'w') as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_filename, self.__filename)
+        except (OSError, TypeError, ValueError) as e:
+            with self.__lock:
+                self.__stats['error'] = str(e)
+                # Make sure the next save doesn't think this one worked.
+                self.__last_snapshot = None
+            return
+
+        seconds = time.perf_counter() - start
+        with self.__lock:
+            self.__stats['saves'] += 1
+            self.__stats['save_seconds'] = seconds
+            self.__stats['total_save_seconds'] += seconds
+            if seconds > self.__stats['max_save_seconds']:
+                self.__stats['max_save_seconds'] = seconds
+            self.__stats['bytes'] = len(data)
@@ -0,0 +1,255 @@
+#! /usr/bin/python
+
+import functools
+import re
+
+class Damage(object):
+    '''
+    Immutable description of the damage done by an attack.  This is the one
+    place that damage expressions like '1d+4', '3d(2) burn', 'sw+2', or 'thr'
+    are parsed and formatted.
+
+    Damage comes in two flavors:
+
+        dice-based, like a laser pistol or a sick stick: |num_dice| and |plus|
+            describe the dice and |st| is None.
+
+        strength-based, like a sword or a punch: |st| is 'sw' or 'thr', the
+            number of dice comes from the wielder's ST (see B16), and |plus| is
+            added to that.  |num_dice| is 0.
+
+    Damage objects are interned: asking for the same expression (or the same
+    native dict) twice hands back the same object so that each distinct
+    expression is parsed, and formatted, exactly once.  Only the
+    |max_interned| most recently used are kept.  Don't modify them.
+    '''
+    __slots__ = ('num_dice', 'plus', 'type', 'armor_divisor', 'st',
+                 '_Damage__string')
+
+    # '1d+4', '2d', '-2', 'sw+2', 'thr', '3d(2) burn', '1d-1 pi+'
+    expression_re = re.compile(
+            '^ *(?P<st>sw|thr)?' +
+            ' *((?P<dice>[0-9]+) *d)?' +
+            ' *(?P<plus>[+-]? *[0-9]+)?' +
+            ' *(\\( *(?P<divisor>[0-9.]+) *\\))?' +
+            ' *(?P<type>[A-Za-z]+[+-]*)? *$')
+
+    max_interned = 4096
+
+    def __init__(self,
+                 num_dice=0,            # int
+                 plus=0,                # int
+                 damage_type=None,      # string: 'cut', 'pi', 'cr', ...
+                 armor_divisor=None,    # number or None
+                 st=None                # None, 'sw', or 'thr'
+                 ):
+        object.__setattr__(self, 'num_dice', num_dice)
+        object.__setattr__(self, 'plus', plus)
+        object.__setattr__(self, 'type', damage_type)
+        object.__setattr__(self, 'armor_divisor', armor_divisor)
+        object.__setattr__(self, 'st', st)
+        object.__setattr__(self, '_Damage__string', None)
+
+    def __setattr__(self, name, value):
+        raise AttributeError('Damage objects are immutable')
+
+    def __eq__(self, other):
+        if not isinstance(other, Damage):
+            return False
+        return self.__key() == other.__key()
+
+    def __hash__(self):
+        return hash(self.__key())
+
+    def __repr__(self):
+        return 'Damage(%s)' % self.to_string()
+
+    @staticmethod
+    def get(num_dice=0,         # int
+            plus=0,             # int
+            damage_type=None,   # string: 'cut', 'pi', 'cr', ...
+            armor_divisor=None, # number or None
+            st=None             # None, 'sw', or 'thr'
+            ):
+        '''
+        Returns the interned Damage object with these values.
+        '''
+        # Always positional so that the same values are the same cache key.
+        return Damage.__get(num_dice, plus, damage_type, armor_divisor, st)
+
+    @staticmethod
+    def parse(string,               # string: '1d+4', 'sw-2', '3d(2) burn', ...
+              damage_type=None,     # string: used if |string| has no type
+              armor_divisor=None    # number: used if |string| has no divisor
+              ):
+        '''
+        Parses a damage expression.  A number without a 'd' is a plus so
+        '-2' is a plus of -2 (which is the way GCS describes strength-based
+        damage).
+
+        Returns the interned Damage object or None if |string| isn't a damage
+        expression.
+        '''
+        return Damage.__parse(string, damage_type, armor_divisor)
+
+    @staticmethod
+    def from_native(damage  # dict: 'damage' from a weapon in the Game File
+                    ):
+        '''
+        Converts the damage description in a weapon (the Game File's native
+        format) into a Damage object.  The native format looks like:
+
+            {'st': 'sw', 'plus': -2, 'type': 'cut'}
+            {'dice': {'num_dice': 1, 'plus': 4, 'type': 'pi'}}
+
+        Returns the interned Damage object or None if |damage| describes
+        neither.
+        '''
+        if damage is None:
+            return None
+        if 'st' in damage:
+            return Damage.get(0,
+                              damage.get('plus', 0),
+                              damage.get('type'),
+                              damage.get('armor_divisor'),
+                              damage['st'])
+        if 'dice' in damage:
+            dice = damage['dice']
+            return Damage.get(dice.get('num_dice', 0),
+                              dice.get('plus', 0),
+                              dice.get('type'),
+                              dice.get('armor_divisor'),
+                              None)
+        return None
+
+    def dice_string(self):
+        '''
+        Returns the dice part of the damage: '1d+4' or 'sw+2'.
+        '''
+        if self.st is not None:
+            return '%s%+d' % (self.st, self.plus)
+        return '%dd%+d' % (self.num_dice, self.plus)
+
+    def is_st_based(self):
+        return self.st is not None
+
+    def to_native(self):
+        '''
+        Returns a new dict (in the Game File's format) describing this damage.
+        '''
+        if self.st is not None:
+            result = {'st': self.st, 'plus': self.plus, 'type': self.type}
+        else:
+            result = {'dice': {'num_dice': self.num_dice,
+                               'plus': self.plus,
+                               'type': self.type}}
+        if self.armor_divisor is not None:
+            if self.st is not None:
+                result['armor_divisor'] = self.armor_divisor
+            else:
+                result['dice']['armor_divisor'] = self.armor_divisor
+        return result
+
+    def to_string(self):
+        '''
+        Returns the damage as an expression: '1d+4 (pi)', '3d+0(2) (burn)'.
+        The string is only built once.
+        '''
+        if self.__string is None:
+            string = [self.dice_string()]
+            if self.armor_divisor is not None:
+                string.append('(%s)' % self.armor_divisor)
+            if self.type is not None and len(self.type) > 0:
+                string.append(' (%s)' % self.type)
+            object.__setattr__(self, '_Damage__string', ''.join(string))
+        return self.__string
+
+    def __key(self):
+        return (self.num_dice, self.plus, self.type, self.armor_divisor,
+                self.st)
+
+    @staticmethod
+    @functools.lru_cache(maxsize=max_interned)
+    def __get(num_dice,         # int
+              plus,             # int
+              damage_type,      # string: 'cut', 'pi', 'cr', ...
+              armor_divisor,    # number or None
+              st                # None, 'sw', or 'thr'
+              ):
+        '''
+        Returns the interned Damage object with these values (see |get|).
+        '''
+        return Damage(num_dice, plus, damage_type, armor_divisor, st)
+
+    @staticmethod
+    @functools.lru_cache(maxsize=max_interned)
+    def __parse(string,         # string: '1d+4', 'sw-2', '3d(2) burn', ...
+                damage_type,    # string: used if |string| has no type
+                armor_divisor   # number: used if |string| has no divisor
+                ):
+        '''
+        Parses a damage expression (see |parse|).
+
+        Returns the interned Damage object or None if |string| isn't a damage
+        expression.
+        '''
+        match = Damage.expression_re.match(string)
+        if match is None:
+            return None
+        if (match.group('st') is None and match.group('dice') is None and
+                match.group('plus') is None):
+            return None  # Just a type (or nothing) isn't any damage
+
+        num_dice = (0 if match.group('dice') is None
+                    else int(match.group('dice')))
+        plus = (0 if match.group('plus') is None
+                else int(match.group('plus').replace(' ', '')))
+        if match.group('divisor') is not None:
+            divisor = float(match.group('divisor'))
+            armor_divisor = int(divisor) if divisor.is_integer() else divisor
+        if match.group('type') is not None:
+            damage_type = match.group('type')
+
+        return Damage.get(num_dice, plus, damage_type, armor_divisor,
+                          match.group('st'))
+
+
+def format_damage(damage    # dict: one entry from GurpsRuleset.get_damage
+                  ):
+    '''
+    Converts one of the dicts returned by GurpsRuleset.get_damage, like:
+
+        {'attack_type': <string> (e.g., 'sw')
+         'num_dice': <int>
+         'plus': <int>
+         'damage_type': <string> (eg, 'crushing')
+         'notes': <string> (optional)}
+
+    into a string like 'sw: 1d+2 (cut=x1.5)'.  The fight screen shows the same
+    damage over and over so the most recently used strings are cached.
+    '''
+    return _format_damage(damage['attack_type'],
+                          damage['num_dice'],
+                          damage['plus'],
+                          damage['damage_type'],
+                          None if 'notes' not in damage else damage['notes'])
+
+
+@functools.lru_cache(maxsize=1024)
+def _format_damage(attack_type,     # string (e.g., 'sw') or None
+                   num_dice,        # int
+                   plus,            # int
+                   damage_type,     # string (eg, 'crushing')
+                   notes            # string or None
+                   ):
+    '''
+    Returns the string for |format_damage|.
+    '''
+    string = []
+    if attack_type is not None:
+        string.append('%s: ' % attack_type)
+    string.append('%dd%+d ' % (num_dice, plus))
+    string.append('(%s)' % damage_type)
+    if notes is not None:
+        string.append(', %s' % notes)
+    return ''.join(string)
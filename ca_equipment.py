@@ -4,6 +4,7 @@ import copy
 import curses
 import pprint
 
+import ca_damage
 import ca_debug
 
 # The JSON source to objects in the 'stuff' array is expected to look like
@@ -419,17 +420,17 @@ class EquipmentManager(object):
                 continue
 
             if 'damage' in item_type:
-                damage = item_type['damage']
+                damage = ca_damage.Damage.from_native(item_type['damage'])
                 texts = []
-                if 'dice' in damage:
-                    texts.append('dam(%s): %dd%+d' % (
-                                                  damage['dice']['type'],
-                                                  damage['dice']['num_dice'],
-                                                  damage['dice']['plus']))
-                elif 'st' in damage:
-                    texts.append('dam(%s): %s%+d' % (damage['st'],
-                                                     damage['type'],
-                                                     damage['plus']))
+                if damage is None:
+                    pass
+                elif damage.is_st_based():
+                    texts.append('dam(%s): %s%+d' % (damage.st,
+                                                     damage.type,
+                                                     damage.plus))
+                else:
+                    texts.append('dam(%s): %s' % (damage.type,
+                                                  damage.dice_string()))
 
                 if 'reload' in item:
                     if item['reload_type'] == Equipment.RELOAD_ONE:
@@ -657,6 +658,18 @@ class Weapon(object):
         notes = self.get_param('notes', mode)
         return damage, notes
 
+    def get_damage_expression(self,
+                              mode   # string: how is the weapon used?
+                              ):
+        '''
+        Like |get_damage_next_shot| but the damage is returned as an
+        (interned, so cheap) ca_damage.Damage object rather than a dict.
+
+        Returns (Damage object or None, notes (scalar string) for this shot)
+        '''
+        damage, notes = self.get_damage_next_shot(mode)
+        return ca_damage.Damage.from_native(damage), notes
+
     def get_param(self,
                   param, # string: parameter being retrieved
                   mode   # string: how is the weapon used?
@@ -713,9 +726,10 @@ class Weapon(object):
             return False
         for mode in self.rawdata['type']:
             full_mode = self.rawdata['type'][mode]
-            if ('damage' in full_mode and 'st' in full_mode['damage'] and
-                    (full_mode['damage']['st'] == 'sw' or
-                     full_mode['damage']['st'] == 'thr')):
+            if 'damage' not in full_mode:
+                continue
+            damage = ca_damage.Damage.from_native(full_mode['damage'])
+            if damage is not None and damage.st in ('sw', 'thr'):
                 return True
         return False
 
@@ -59,6 +59,57 @@ class ThingsInFight(object):
                                        self,
                                        self._window_manager)
 
+        # Change notification (so, for example, the fight screen only redraws
+        # the things that changed).
+
+        self.__change_count = 0
+        self.__change_listeners = []
+
+    #
+    # Change notification methods
+    #
+
+    def add_change_listener(self,
+                            callback  # function(ThingsInFight object)
+                            ):
+        '''
+        Registers |callback| to be called whenever this thing is changed.  A
+        callback that's already registered isn't registered twice.
+
+        Returns nothing.
+        '''
+        if callback not in self.__change_listeners:
+            self.__change_listeners.append(callback)
+
+    def get_change_count(self):
+        '''
+        Returns the number of times this thing has been changed.  Compare it
+        against an earlier value to see if anything's changed since then.
+        '''
+        return self.__change_count
+
+    def mark_changed(self):
+        '''
+        Tells everyone who's listening that this thing's data has changed.
+        Anything that modifies the thing's rawdata should call this.
+
+        Returns nothing.
+        '''
+        self.__change_count += 1
+        for callback in self.__change_listeners:
+            callback(self)
+
+    def remove_change_listener(self,
+                               callback  # function(ThingsInFight object)
+                               ):
+        '''
+        Unregisters a callback registered by |add_change_listener|.
+
+        Returns nothing.
+        '''
+        if callback in self.__change_listeners:
+            self.__change_listeners.remove(callback)
+
     #
     # Equipment related methods
     #
@@ -74,7 +125,9 @@ class ThingsInFight(object):
 
         Returns the new index of the equipment (for testing).
         '''
-        return self.equipment.add(new_item, source, container_stack)
+        new_item_index = self.equipment.add(new_item, source, container_stack)
+        self.mark_changed()
+        return new_item_index
 
     def ask_how_many(self,
                      item_index,    # index into fighter's stuff list
@@ -126,7 +179,9 @@ class ThingsInFight(object):
         Returns: the discarded item
         '''
         count = self.ask_how_many(item_index, count, container_stack)
-        return self.equipment.remove(item_index, count, container_stack)
+        item = self.equipment.remove(item_index, count, container_stack)
+        self.mark_changed()
+        return item
 
     #
     # Notes methods
@@ -169,6 +224,16 @@ class ThingsInFight(object):
         '''
         return '%s' % self.name
 
+    def get_description_short_key(self,
+                                  fight_handler  # FightHandler, ignored
+                                  ):
+        '''
+        Returns something that changes whenever |get_description_short| would
+        return something different (so the description can be cached) or
+        None if there's no such thing.
+        '''
+        return self.name
+
     def get_notes(self):
         '''
         Returns a list of strings describing the current fighting state of the
@@ -334,6 +399,18 @@ class Venue(ThingsInFight):
 
         return fighter_string
 
+    def get_description_short_key(self,
+                                  fight_handler  # FightHandler, ignored
+                                  ):
+        '''
+        Returns something that changes whenever |get_description_short| would
+        return something different.
+        '''
+        return (self.name,
+                'stuff' in self.rawdata and len(self.rawdata['stuff']) > 0,
+                'timers' in self.rawdata and len(self.rawdata['timers']) > 0,
+                'notes' in self.rawdata and len(self.rawdata['notes']) > 0)
+
     def get_state(self):
         return Fighter.FIGHT
 
@@ -436,6 +513,7 @@ class Fighter(ThingsInFight):
         new_item_index = self.equipment.add(new_item,
                                             source,
                                             container_stack)
+        self.mark_changed()
 
         # if we're adding something to a container, then it can't be preferred.
         if len(container_stack) > 0:
@@ -577,6 +655,7 @@ class Fighter(ThingsInFight):
 
         if result is not None:
             self.rawdata[param][ability_name] = result
+            self.mark_changed()
 
         return result
 
@@ -597,7 +676,7 @@ class Fighter(ThingsInFight):
             if (item_index not in self.rawdata['armor-index'] and
                     'natural-armor' in item and item['natural-armor']):
                 self.rawdata['armor-index'].append(item_index)
-
+        self.mark_changed()
 
     def don_armor_by_index(self,
                            index  # Index of armor in fighter's 'stuff'
@@ -607,6 +686,7 @@ class Fighter(ThingsInFight):
 
         if index not in self.rawdata['armor-index']:
             self.rawdata['armor-index'].append(index)
+            self.mark_changed()
 
     def draw_weapon_by_index(self,
                              weapon_index  # Index of weapon in fighter's 'stuff'
@@ -625,6 +705,7 @@ class Fighter(ThingsInFight):
             self.rawdata['weapon-index'].append(weapon_index)
         elif weapon_indexes[0] is None:     # [0, x]
             weapon_indexes[0] = weapon_index
+        self.mark_changed()
         #else:
         #    error
 
@@ -642,6 +723,7 @@ class Fighter(ThingsInFight):
         index, item = self.equipment.get_item_by_name(name)
         if index is not None:
             self.rawdata['weapon-index'].append(index)
+            self.mark_changed()
         return index, ca_equipment.Weapon(item)
 
     def end_fight(self,
@@ -808,6 +890,7 @@ class Fighter(ThingsInFight):
             for item_index, item in enumerate(self.rawdata['stuff']):
                 if 'natural-weapon' in item and item['natural-weapon']:
                     self.rawdata['weapon-index'].append(item_index)
+        self.mark_changed()
 
     #def print_me(self):
     #    print '-- Fighter (%s, %s) --' % (self.name, self.group)
@@ -834,6 +917,7 @@ class Fighter(ThingsInFight):
         before_item_count = self.equipment.get_item_count(container_stack)
         count = self.ask_how_many(index_to_remove, count, container_stack)
         item = self.equipment.remove(index_to_remove, count, container_stack)
+        self.mark_changed()
         after_item_count = self.equipment.get_item_count(container_stack)
 
         # Adjust indexes into the list if the list changed.
@@ -967,6 +1051,16 @@ class Fighter(ThingsInFight):
 
         return fighter_string
 
+    def get_description_short_key(self,
+                                  fight_handler  # FightHandler object
+                                  ):
+        '''
+        Returns something that changes whenever |get_description_short| would
+        return something different (so the description can be cached).
+        '''
+        return self._ruleset.get_fighter_description_short_key(self,
+                                                               fight_handler)
+
     def get_notes(self):
         '''
         Returns a list of strings describing the current fighting state of the
@@ -1120,6 +1214,7 @@ class Fighter(ThingsInFight):
             if state_num == conscious_number:
                 self.rawdata['state'] = state_name
                 break
+        self.mark_changed()
 
         if not self.is_conscious():
             self.rawdata['opponent'] = None  # unconscious men fight nobody
@@ -1152,6 +1247,7 @@ class Fighter(ThingsInFight):
                 self.rawdata['label'] = None
 
         self._ruleset.start_fight(self)
+        self.mark_changed()
 
     def start_turn(self,
                    fight_handler    # FightHandler object
@@ -1165,7 +1261,11 @@ class Fighter(ThingsInFight):
         self._ruleset.start_turn(self, fight_handler)
         self.timers.decrement_all()
         self.timers.fire_expired_timers(ca_timers.Timer.FIRE_ROUND_START)
-        for timer in self.timers.get_all():
+
+        # Only look at (and bring up to date) the timers if one of them has
+        # the fighter busy.
+        busy_timers = self.timers.get_all() if self.timers.is_busy() else []
+        for timer in busy_timers:
             if 'busy' in timer.rawdata and timer.rawdata['busy']:
                 window_text = []
                 lines = timer.get_description()
@@ -1181,6 +1281,7 @@ class Fighter(ThingsInFight):
                 self.rawdata['actions_this_turn'].append('busy')
                 fight_handler.add_to_history(
                         {'comment': '(%s) is busy this round' % self.name})
+        self.mark_changed()
 
     def toggle_absent(self):
         '''
@@ -1193,6 +1294,7 @@ class Fighter(ThingsInFight):
             self.rawdata['state'] = 'alive'
         else:
             self.rawdata['state'] = 'Absent'
+        self.mark_changed()
 
     #
     # Protected and Private Methods
@@ -13,6 +13,7 @@ import sys
 import traceback
 import unicodedata
 
+import ca_damage
 import ca_debug
 import ca_equipment
 import ca_gui
@@ -51,6 +52,10 @@ class SkillsCalcs(object):
     difficulty_offset = {'E':0, 'A':-1, 'H':-2, 'VH':-3}
     # Bartender is really a professional skill
 
+    # 'DX/E', 'iq/vh', ...
+    difficulty_re = re.compile('(?P<attrib>[A-Za-z]+)(?P<slash>/)' +
+                               '(?P<difficulty>[A-Za-z]+)')
+
     def __init__(self,
                  window_manager):
         self.__ruleset = ca_gurps_ruleset.GurpsRuleset(window_manager)
@@ -65,7 +70,11 @@ class SkillsCalcs(object):
                             char,             # Character object
                             skill_gcs,        # dict: skill from GCS
                             skill_name,       # name of skill
-                            cost              # points spent on skill
+                            cost,             # points spent on skill
+                            default_level=None,     # int: best default level
+                                                    #   (from SkillGraph)
+                            equipment_bonuses=None  # from
+                                                    #   compile_equipment_bonuses
                            ):
         # TODO (now): the following skills are augmented by stuff
         #   - axe/mace: ?
@@ -89,21 +98,9 @@ class SkillsCalcs(object):
         '''
         debug = ca_debug.Debug(quiet=GcsImport.QUIET_SKILLS)
 
-        if skill_name not in SkillsCalcs.skills:
-            # Get the skill info from GCS
-            if 'difficulty' not in skill_gcs:
-                return 0
-            match = re.match(
-                    '(?P<attrib>[A-Za-z]+)(?P<slash>/)' +
-                    '(?P<difficulty>[A-Za-z]+)',
-                    skill_gcs['difficulty'])
-            if match is None:
-                return 0
-            skill_native = {'attr': match.group('attrib').lower(),
-                            'diff': match.group('difficulty').upper()}
-        else:
-            # {'attr':'dx', 'diff':'E', 'default':-4}
-            skill_native = SkillsCalcs.skills[skill_name]
+        skill_native = self.get_native_skill(skill_gcs, skill_name)
+        if skill_native is None:
+            return 0
 
         if skill_native['attr'] not in char.char['permanent']:
             window_manager.error([
@@ -120,6 +117,11 @@ class SkillsCalcs(object):
                     'level' in skill_gcs['defaulted_from']):
                 return skill_gcs['defaulted_from']['level']
 
+            # Next best is the default that the skill graph worked out from
+            # the character's attributes and other skills.
+            if default_level is not None:
+                return default_level
+
             # Well crap, we have to use our own default calculation, then.
             if skill_native['default'] is None:
                 window_manager.error([
@@ -166,7 +168,10 @@ class SkillsCalcs(object):
                                              level))
 
         # Add modifiers due to equipment
-        plus = self.__get_equipment_bonuses(char.stuff, 'skill', skill_name)
+        if equipment_bonuses is None:
+            equipment_bonuses = self.compile_equipment_bonuses(char.stuff,
+                                                               'skill')
+        plus = self.__get_equipment_bonuses(equipment_bonuses, skill_name)
         level += plus
         debug.print('  equipment +%d = %d' % (plus, level))
 
@@ -243,22 +248,19 @@ class SkillsCalcs(object):
                             'name': '<regex>'}, ...
 
     '''
-    def __get_equipment_bonuses(self,
-                                equipment,   # list of dict, maybe w/containers
-                                type_name, # 'attribute' or 'skill'
-                                skill_name,
-                                #must_be_in_use=False # weapons or armor
-                                ):
-        # These equipment bonuses are handled differently.  Instead of giving,
-        # for example, bonuses on all beam weapons when you have a laser
-        # sight, this program requires that you attach a laser sight to a
-        # specific beam weapon in order to get the plus.
-        dont_get_bonuses_for_these_skills = ['Beam Weapons (Pistol)',
-                                             'Beam Weapons (Rifle)'
-                                             ]
-        if skill_name in dont_get_bonuses_for_these_skills:
-            return 0
+    def compile_equipment_bonuses(self,
+                                  equipment,   # list of dict, maybe w/containers
+                                  type_name,   # 'attribute' or 'skill'
+                                  ):
+        '''
+        Walks the equipment list (including the contents of containers) once
+        and returns a flat list of the bonuses of type |type_name| with their
+        regexes precompiled.  The result is meant to be handed to
+        |get_gcs_skill_level| so that a character's equipment isn't rescanned
+        for every one of the character's skills.
 
+        Returns [(compiled regex, amount), ...]
+        '''
         # Figure out what items are currently in use.  This is for currently
         # held weapons and armor.
 
@@ -284,7 +286,7 @@ class SkillsCalcs(object):
         #            'amount': <number>,
         #            'name': '<regex>'}, ...
 
-        total_bonus = 0
+        compiled_bonuses = []
         for item in equipment:
             #if must_be_in_use and item not in in_use_items:
             #    continue
@@ -294,12 +296,58 @@ class SkillsCalcs(object):
                     if bonus['type'] != type_name:
                         continue
                     # NOTE:  bonus['name'] is a regex
-                    if re.match(bonus['name'], skill_name, re.IGNORECASE):
-                        total_bonus += bonus['amount']
+                    compiled_bonuses.append(
+                            (re.compile(bonus['name'], re.IGNORECASE),
+                             bonus['amount']))
 
             if 'stuff' in item:
-                total_bonus += self.__get_equipment_bonuses(
-                        item['stuff'], type_name, skill_name)
+                compiled_bonuses.extend(self.compile_equipment_bonuses(
+                        item['stuff'], type_name))
+
+        return compiled_bonuses
+
+    def get_native_skill(self,
+                         skill_gcs,   # dict: skill from GCS
+                         skill_name   # name of skill
+                         ):
+        '''
+        Returns the ruleset's description of the skill or, if the ruleset
+        doesn't know about it, one built from the GCS skill.  The description
+        looks like: {'attr':'dx', 'diff':'E', 'default':-4}.  Returns None if
+        neither the ruleset nor GCS describes the skill.
+        '''
+        if skill_name in SkillsCalcs.skills:
+            return SkillsCalcs.skills[skill_name]
+
+        # Get the skill info from GCS
+        if 'difficulty' not in skill_gcs:
+            return None
+        match = SkillsCalcs.difficulty_re.match(skill_gcs['difficulty'])
+        if match is None:
+            return None
+        return {'attr': match.group('attrib').lower(),
+                'diff': match.group('difficulty').upper(),
+                'default': None}
+
+    def __get_equipment_bonuses(self,
+                                equipment_bonuses, # [(regex, amount), ...]
+                                skill_name,
+                                #must_be_in_use=False # weapons or armor
+                                ):
+        # These equipment bonuses are handled differently.  Instead of giving,
+        # for example, bonuses on all beam weapons when you have a laser
+        # sight, this program requires that you attach a laser sight to a
+        # specific beam weapon in order to get the plus.
+        dont_get_bonuses_for_these_skills = ['Beam Weapons (Pistol)',
+                                             'Beam Weapons (Rifle)'
+                                             ]
+        if skill_name in dont_get_bonuses_for_these_skills:
+            return 0
+
+        total_bonus = 0
+        for regex, amount in equipment_bonuses:
+            if regex.match(skill_name):
+                total_bonus += amount
 
         return total_bonus
 
@@ -334,6 +382,204 @@ class SkillsCalcs(object):
             plus = table[len(table) - 1] + points + 1 - len(table)
         return plus
 
+class SkillGraph(object):
+    '''
+    Dependency graph of the skills and techniques owned by a GCS character.
+
+    The nodes are the character's skills and techniques (the character's
+    attributes are the leaves).  The edges are the 'defaults' that an unbought
+    skill may use.  Bought skills are based only on attributes and, per B173,
+    one can't default from a skill that is, itself, only defaulted so the
+    graph has no cycles even though GCS skills commonly default to each
+    other.  A technique's value is relative to the skill on which it's based
+    (see |get_technique_value|) so techniques have no edges.
+
+    The graph is built once per import and evaluated in topological order with
+    the levels memoized so that default chains are computed only once.
+    '''
+    def __init__(self,
+                 window_manager,    # ca_gui.GmWindowManager object (errors)
+                 skills_calcs,      # SkillsCalcs object
+                 char,              # FromGcs object (needs 'char' and 'stuff')
+                 skills_gcs         # list of skill and technique dicts (GCS)
+                 ):
+        self.__window_manager = window_manager
+        self.__skills_calcs = skills_calcs
+        self.__char = char
+        self.__skills_gcs = skills_gcs
+
+        # The nodes are the indexes into |skills_gcs|.
+        self.__names = {}           # index: full name of skill
+        self.__index_from_name = {} # full skill name: index
+        self.__prereqs = {}         # index: [(index, modifier), ...]
+        self.__levels = None        # index: level (memoized by |evaluate|)
+
+        self.__build()
+
+    @staticmethod
+    def get_full_name(thing_gcs  # dict: GCS skill or default
+                      ):
+        '''
+        Returns the name of the skill including its specialization, like
+        'Guns (Pistol)'.
+        '''
+        if ('specialization' in thing_gcs and
+                len(thing_gcs['specialization']) > 0):
+            return '%s (%s)' % (thing_gcs['name'], thing_gcs['specialization'])
+        return thing_gcs['name']
+
+    @staticmethod
+    def get_technique_value(technique_gcs  # dict: GCS technique
+                            ):
+        '''
+        Returns the value of a technique relative to the level of the skill
+        on which it's based (the technique's 'default').
+        '''
+        plus = SkillsCalcs.tech_plus_from_pts(
+                technique_gcs['difficulty'],
+                SkillGraph.__get_cost(technique_gcs))
+        return plus + technique_gcs['default'].get('modifier', 0)
+
+    def evaluate(self):
+        '''
+        Calculates the level of every skill in the graph (and the value of
+        every technique) in dependency order.
+
+        Returns {index into skills_gcs: level, ...}
+        '''
+        if self.__levels is not None:
+            return self.__levels
+        self.__levels = {}
+
+        # Kahn's algorithm.  |dependents| maps a node to the nodes that
+        # depend on it.
+        waiting_on = {}
+        dependents = {index: [] for index in self.__names}
+        for index in self.__names:
+            waiting_on[index] = len(self.__prereqs[index])
+            for prereq, modifier in self.__prereqs[index]:
+                dependents[prereq].append(index)
+
+        ready = [index for index, count in waiting_on.items() if count == 0]
+        equipment_bonuses = self.__skills_calcs.compile_equipment_bonuses(
+                self.__char.stuff, 'skill')
+        while len(ready) > 0:
+            index = ready.pop()
+            self.__levels[index] = self.__evaluate_node(index,
+                                                        equipment_bonuses)
+            for dependent in dependents[index]:
+                waiting_on[dependent] -= 1
+                if waiting_on[dependent] == 0:
+                    ready.append(dependent)
+
+        # Shouldn't happen (see the class comment) but don't lose skills if
+        # GCS hands us a cycle.
+        for index in self.__names:
+            if index not in self.__levels:
+                self.__prereqs[index] = []
+                self.__levels[index] = self.__evaluate_node(index,
+                                                            equipment_bonuses)
+
+        return self.__levels
+
+    def __build(self):
+        '''
+        Makes nodes for all of the skills and techniques and then connects
+        them with their defaults.
+        '''
+        for index, skill_gcs in enumerate(self.__skills_gcs):
+            if 'type' not in skill_gcs:
+                continue
+            if skill_gcs['type'] not in ['skill', 'technique']:
+                continue
+            name = SkillGraph.get_full_name(skill_gcs)
+            self.__names[index] = name
+            self.__prereqs[index] = []
+            if skill_gcs['type'] == 'skill':
+                self.__index_from_name[name] = index
+
+        for index in self.__names:
+            skill_gcs = self.__skills_gcs[index]
+            if skill_gcs['type'] != 'skill':
+                continue  # Techniques have no edges (see the class comment)
+            if self.__get_cost(skill_gcs) == 0 and 'defaults' in skill_gcs:
+                # You can only default from a skill that's been bought.
+                for default in skill_gcs['defaults']:
+                    if default['type'] != 'skill':
+                        continue
+                    default_name = SkillGraph.get_full_name(default)
+                    if default_name not in self.__index_from_name:
+                        continue
+                    prereq = self.__index_from_name[default_name]
+                    if prereq == index:
+                        continue
+                    if self.__get_cost(self.__skills_gcs[prereq]) == 0:
+                        continue
+                    self.__prereqs[index].append(
+                            (prereq, default.get('modifier', 0)))
+
+    def __evaluate_node(self,
+                        index,              # int: index into skills_gcs
+                        equipment_bonuses   # [(regex, amount), ...]
+                        ):
+        skill_gcs = self.__skills_gcs[index]
+        if skill_gcs['type'] == 'technique':
+            return SkillGraph.get_technique_value(skill_gcs)
+
+        cost = self.__get_cost(skill_gcs)
+        default_level = None
+        if cost == 0:
+            default_level = self.__get_best_default(index)
+
+        return self.__skills_calcs.get_gcs_skill_level(
+                self.__window_manager,
+                self.__char,
+                skill_gcs,
+                self.__names[index],
+                cost,
+                default_level=default_level,
+                equipment_bonuses=equipment_bonuses)
+
+    def __get_best_default(self,
+                           index   # int: index into skills_gcs
+                           ):
+        '''
+        Returns the best level that an unbought skill gets from its
+        attribute and skill defaults (or None if it has no defaults).
+        '''
+        skill_gcs = self.__skills_gcs[index]
+        permanent = self.__char.char['permanent']
+        best = None
+
+        candidates = []
+        skill_native = self.__skills_calcs.get_native_skill(
+                skill_gcs, self.__names[index])
+        if (skill_native is not None and
+                skill_native.get('default') is not None and
+                skill_native['attr'] in permanent):
+            candidates.append(permanent[skill_native['attr']] +
+                              skill_native['default'])
+
+        for default in skill_gcs.get('defaults', []):
+            attr = default['type'].lower()
+            if attr == 'will':
+                attr = 'wi'
+            if attr in permanent:
+                candidates.append(permanent[attr] + default.get('modifier', 0))
+
+        for prereq, modifier in self.__prereqs[index]:
+            candidates.append(self.__levels[prereq] + modifier)
+
+        for candidate in candidates:
+            if best is None or candidate > best:
+                best = candidate
+        return best
+
+    @staticmethod
+    def __get_cost(skill_gcs  # dict: skill from GCS
+                   ):
+        return 0 if 'points' not in skill_gcs else skill_gcs['points']
+
 class FromGcs(object):
     '''
     Reads the data from the GCS file and converts the data into native format.
@@ -463,9 +709,7 @@ class FromGcs(object):
                     }
             if 'difficulty' in gcs_skill:
                 # attribute / difficulty
-                match = re.match(
-                        '(?P<attrib>[A-Za-z]+)(?P<slash>/)' +
-                        '(?P<difficulty>[A-Za-z]+)',
+                match = SkillsCalcs.difficulty_re.match(
                         gcs_skill['difficulty'])
                 if match is not None:
                     native_skill['attr'] = self.__map_attrib(
@@ -655,7 +899,7 @@ class FromGcs(object):
         Builds a local equipment list from the JSON extracted from a GCS
         .eqp file.
         '''
-        skills, techniques = self.__build_skill_descriptions('rows')
+        skills, techniques = self.__build_skill_descriptions()
         return skills, techniques
 
 
@@ -1003,8 +1247,6 @@ class FromGcs(object):
         if 'skills' not in self.__gcs_data:
             return skills_result, techniques_result
 
-        skills = SkillsCalcs(self.__window_manager)
-
         for skill_gcs in self.__gcs_data['skills']:
             base_name = skill_gcs['name']
 
@@ -1037,19 +1279,10 @@ class FromGcs(object):
                     "equip": {"laser sight": 1}},
                 '''
                 skill = {'ask': 'number'}
-
-                # Name
-                if ('specialization' in skill_gcs and
-                        len(skill_gcs['specialization']) > 0):
-                    name_text = '%s (%s)' % (skill_gcs['name'],
-                                             skill_gcs['specialization'])
-                else:
-                    name_text = skill_gcs['name']
+                name_text = SkillGraph.get_full_name(skill_gcs)
 
                 # attribute / difficulty
-                match = re.match(
-                        '(?P<attrib>[A-Za-z]+)(?P<slash>/)' +
-                        '(?P<difficulty>[A-Za-z]+)',
+                match = SkillsCalcs.difficulty_re.match(
                         skill_gcs['difficulty'])
                 if match is None:
                     continue
@@ -1070,8 +1303,8 @@ class FromGcs(object):
 
                 skills_result[name_text] = skill
 
-            #elif skill_gcs['type'] == 'technique':
-            '''
+            elif skill_gcs['type'] == 'technique':
+                '''
                 GCS entry:
                 {
                     "type": "technique",
@@ -1095,26 +1328,15 @@ class FromGcs(object):
 
                 CA entry:
                 "Off-Hand Weapon Training (Knife)": {"ask": "number"},
-            '''
-            #    # print('\n=== Technique: %s ===' % base_name) # TODO: remove
-            #    difficulty = skill_gcs['difficulty'] # 'H', 'A'
-            #    cost_gcs = 0 if 'points' not in skill_gcs else skill_gcs['points']
-            #    plus = SkillsCalcs.tech_plus_from_pts(difficulty, cost_gcs) ###################33
-
-            #    default = skill_gcs['default']['name']
-            #    if 'specialization' in skill_gcs['default']:
-            #        default += (' (%s)' % skill_gcs['default']['specialization'])
-            #    skill_base = (0 if 'modifier' not in skill_gcs['default'] else ####################
-            #                  skill_gcs['default']['modifier'])
-            #    # print('based on %s = %d+%d' % (default, plus, skill_base)) # TODO: remove
-
-            #    technique = {
-            #        'name': base_name,
-            #        'default': default,
-            #        'value': plus + skill_base
-            #        }
-            #    techniques_result.append(technique)
-            return skills_result, techniques_result
+                '''
+                technique = {
+                    'name': base_name,
+                    'default': SkillGraph.get_full_name(skill_gcs['default']),
+                    'value': SkillGraph.get_technique_value(skill_gcs)
+                    }
+                techniques_result.append(technique)
+
+        return skills_result, techniques_result
 
     def __convert_skills(self):
         '''
@@ -1137,8 +1359,13 @@ class FromGcs(object):
             return
 
         skills = SkillsCalcs(self.__window_manager)
+        graph = SkillGraph(self.__window_manager,
+                           skills,
+                           self,
+                           self.__gcs_data['skills'])
+        levels = graph.evaluate()
 
-        for skill_gcs in self.__gcs_data['skills']:
+        for index, skill_gcs in enumerate(self.__gcs_data['skills']):
             base_name = skill_gcs['name']
 
             debug.header3(base_name)
@@ -1147,36 +1374,18 @@ class FromGcs(object):
                 pass
 
             elif skill_gcs['type'] == 'skill':
-                if ('specialization' in skill_gcs and
-                        len(skill_gcs['specialization']) > 0):
-                    name_text = '%s (%s)' % (skill_gcs['name'],
-                                             skill_gcs['specialization'])
-                    debug.print(' %s' % name_text)
-                else:
-                    name_text = skill_gcs['name']
-
-                cost_gcs = 0 if 'points' not in skill_gcs else skill_gcs['points']
-
-                level_gcs = skills.get_gcs_skill_level(
-                        self.__window_manager, self, skill_gcs, name_text, cost_gcs)
-                self.char['skills'][name_text] = level_gcs
+                name_text = SkillGraph.get_full_name(skill_gcs)
+                debug.print(' %s' % name_text)
+                self.char['skills'][name_text] = levels[index]
             elif skill_gcs['type'] == 'technique':
                 debug.print('\n=== Technique: %s ===' % base_name)
-                difficulty = skill_gcs['difficulty'] # 'H', 'A'
-                cost_gcs = 0 if 'points' not in skill_gcs else skill_gcs['points']
-                plus = SkillsCalcs.tech_plus_from_pts(difficulty, cost_gcs) ###################33
-
-                default = skill_gcs['default']['name']
-                if 'specialization' in skill_gcs['default']:
-                    default += (' (%s)' % skill_gcs['default']['specialization'])
-                skill_base = (0 if 'modifier' not in skill_gcs['default'] else ####################
-                              skill_gcs['default']['modifier'])
-                debug.print('based on %s = %d+%d' % (default, plus, skill_base))
+                default = SkillGraph.get_full_name(skill_gcs['default'])
+                debug.print('based on %s = %d' % (default, levels[index]))
 
                 technique = {
                     'name': base_name,
                     'default': default,
-                    'value': plus + skill_base
+                    'value': levels[index]
                     }
                 self.char['techniques'].append(technique)
 
@@ -1234,9 +1443,7 @@ class FromGcs(object):
             # Spell difficulty
             # 'difficulty' = 'IQ/H' or 'IQ/VH'
 
-            match = re.match(
-                    '(?P<attrib>[A-Za-z]+)(?P<slash>/)' +
-                    '(?P<difficulty>[A-Za-z]+)',
+            match = SkillsCalcs.difficulty_re.match(
                     spell_gcs['difficulty'])
             if match is None:
                 continue
@@ -1313,100 +1520,80 @@ class FromGcs(object):
             name,   # string: for error messages, really
             weapon  # dict: the whole weapon
             ):
-        _st = ''
-        _type = ''
-        _base = ''
         damage = {}
 
         # 'damage': {'base': '-1', 'st': 'sw', 'type': 'imp'},
 
-        match = None
-        if 'base' in weapon['damage']:
-            # "damage": { "type": "HP", "base": "1d+4" }, # blaster
-            # "damage": { "type": "fat", "base": "1d+1" }, # sick stick
-            # "damage": { "type": "FP", "base": "1d+3" }, # zip tazer
-            # "damage": { "type": "", "base": "2d+4" }, # laser pistol
-            # "damage": { "type": "burn", "base": "3d", "armor_divisor": 2 }, # lasor rifle
-            # "damage": { "type": "", "base": "3d", "armor_divisor": 3 }, # laser rifle
-            #
-            # "damage": { "type": "cut", "st": "sw", "base": "1d"},
-            #
-            # {"damage": {"dice":{"plus":1,"num_dice":1,"type":"fat"}}}
-            match = re.match(
-                    '(?P<dice>[0-9]*)(?P<d>d?)' +
-                    '(?P<sign>[+-]?)(?P<plus>[0-9]*)',
-                    weapon['damage']['base'])
-
-        if 'damage' in weapon:
-            if 'st' in weapon['damage']:
-                # "damage": { "type": "cr", "st": "thr", "base": "-1" },
-                # "damage": { "type": "cr", "st": "thr" },
-                # "damage": { "type": "cut", "st": "sw", "base": "-2" },
-                # "damage": { "type": "imp", "st": "thr" },
-                # "damage": { "type": "imp", "st": "thr", "base": "-1" },
-
-                # strength based, like:
-                # <damage st="sw" type="cut" base="-2"/>
-                # {"damage": {"st": "sw", "type": "cut", "plus": -2}},
-                _st = weapon['damage']['st']
-                _type = weapon['damage']['type']
-                there_is_a_d = (match is not None and
-                        match.group('d') is not None and
-                        len(match.group('d')) > 0)
-
+        if 'damage' not in weapon:
+            return damage
+
+        # "damage": { "type": "HP", "base": "1d+4" }, # blaster
+        # "damage": { "type": "fat", "base": "1d+1" }, # sick stick
+        # "damage": { "type": "FP", "base": "1d+3" }, # zip tazer
+        # "damage": { "type": "", "base": "2d+4" }, # laser pistol
+        # "damage": { "type": "burn", "base": "3d", "armor_divisor": 2 }, # lasor rifle
+        # "damage": { "type": "", "base": "3d", "armor_divisor": 3 }, # laser rifle
+        #
+        # "damage": { "type": "cut", "st": "sw", "base": "1d"},
+        #
+        # {"damage": {"dice":{"plus":1,"num_dice":1,"type":"fat"}}}
+        # An empty 'base' is the same as none at all.  Anything else that
+        # isn't a damage expression is reported (GCS doesn't write those) rather
+        # than being imported as no damage.
+        base = None
+        if ('base' in weapon['damage'] and
+                len(weapon['damage']['base'].strip()) > 0):
+            base = ca_damage.Damage.parse(weapon['damage']['base'])
+            if base is None:
+                self.__window_manager.error([
+                    'Can\'t parse damage "%s"' % weapon['damage']['base'],
+                    'Weapon %s will be malformed' % name])
+                return damage
+
+        # TODO (eventually): the ruleset doesn't, yet, handle armor divisors
+        # so 'armor_divisor' isn't copied into the native damage.
+
+        if 'st' in weapon['damage']:
+            # "damage": { "type": "cr", "st": "thr", "base": "-1" },
+            # "damage": { "type": "cr", "st": "thr" },
+            # "damage": { "type": "cut", "st": "sw", "base": "-2" },
+            # "damage": { "type": "imp", "st": "thr" },
+            # "damage": { "type": "imp", "st": "thr", "base": "-1" },
+
+            # strength based, like:
+            # <damage st="sw" type="cut" base="-2"/>
+            # {"damage": {"st": "sw", "type": "cut", "plus": -2}},
+            _base = 0
+            if base is not None and base.num_dice > 0:
                 # "damage": { "type": "cut", "st": "sw", "base": "1d"}
-                if there_is_a_d:
-                    # Not the usual case
-                    # TODO (eventually): support strength + dice of damage.  It's easy,
-                    # here, but it's a little harder in ca_gurps_ruleset.
-                    # Such as in:
-                    # "damage": { "type": "cut", "st": "sw", "base": "1d"},
-                    self.__window_manager.error([
-                        'Not currently supporting strength + dice damage',
-                        'together.  Weapon %s will be malformed' % name])
-                    _base = (0 if 'base' not in weapon['damage']
-                             else int(match.group('dice')))
-                else:
-                    _base = (0 if 'base' not in weapon['damage']
-                             else int(weapon['damage']['base']))
-
-                damage = {'st': _st, 'plus': _base, 'type': _type}
-
-            elif 'base' in weapon['damage']:
-                # "damage": { "type": "HP", "base": "1d+4" }, # blaster
-                # "damage": { "type": "fat", "base": "1d+1" }, # sick stick
-                # "damage": { "type": "FP", "base": "1d+3" }, # zip tazer
-                # "damage": { "type": "", "base": "2d+4" }, # laser pistol
-                # "damage": { "type": "burn", "base": "3d", "armor_divisor": 2 }, # lasor rifle
-                # "damage": { "type": "", "base": "3d", "armor_divisor": 3 }, # laser rifle
-                #
-                # {"damage": {"dice":{"plus":1,"num_dice":1,"type":"fat"}}}
-                match = re.match(
-                        '(?P<dice>[0-9]*)(?P<d>d?)' +
-                        '(?P<sign>[+-]?)(?P<plus>[0-9]*)',
-                        weapon['damage']['base'])
-                if match is not None:
-                    _num_dice = (0 if (match.group('dice') is None or
-                                 len(match.group('dice')) == 0) else
-                                 int(match.group('dice')))
-                    _plus = (0 if (match.group('plus') is None or
-                                 len(match.group('plus')) == 0) else
-                                 int(match.group('plus')))
-                    if (match.group('sign') is not None and
-                            len(match.group('sign')) > 0):
-                        sign = 1 if match.group('sign') == '+' else -1
-                        _plus *= sign
-                    _type = ('pi'
-                             if ('type' not in weapon['damage'] or
-                                 len(weapon['damage']['type']) == 0) else
-                                 weapon['damage']['type'])
-                    damage['dice'] = {
-                            'num_dice': _num_dice,
-                            'plus': _plus,
-                            'type': _type}
-            else:
-                # "damage": { "type": "HT-4 aff" }, # tear gas
-                pass # TODO (eventually)
+                # Not the usual case
+                # TODO (eventually): support strength + dice of damage.  It's easy,
+                # here, but it's a little harder in ca_gurps_ruleset.
+                # Such as in:
+                # "damage": { "type": "cut", "st": "sw", "base": "1d"},
+                self.__window_manager.error([
+                    'Not currently supporting strength + dice damage',
+                    'together.  Weapon %s will be malformed' % name])
+                _base = base.num_dice
+            elif base is not None:
+                _base = base.plus
+
+            damage = ca_damage.Damage.get(plus=_base,
+                                          damage_type=weapon['damage']['type'],
+                                          st=weapon['damage']['st']
+                                          ).to_native()
+
+        elif base is not None:
+            _type = ('pi'
+                     if ('type' not in weapon['damage'] or
+                         len(weapon['damage']['type']) == 0) else
+                         weapon['damage']['type'])
+            damage = ca_damage.Damage.get(num_dice=base.num_dice,
+                                          plus=base.plus,
+                                          damage_type=_type).to_native()
+        else:
+            # "damage": { "type": "HT-4 aff" }, # tear gas
+            pass # TODO (eventually)
 
         return damage
 
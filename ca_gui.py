@@ -306,6 +306,8 @@ class GmWindowManager(object):
     '''
 
     ESCAPE = 27  # ASCII value for the escape character
+    filter_menu_threshold = 40  # Menus longer than this are narrowed down
+                                #   by typing (see |menu|)
 
     # Foreground / background colors
     (RED_BLACK,
@@ -852,6 +854,10 @@ class GmWindowManager(object):
         the result.
 
         The result value in strings_results can be anything and take any form.
+
+        In a menu with more than |filter_menu_threshold| entries, the user
+        narrows the menu down by typing part of the entry they want (rather
+        than picking an entry by its first letter).
         '''
         (MENU_STRING, MENU_RESULT) = list(range(0, 2))
 
@@ -866,6 +872,9 @@ class GmWindowManager(object):
             return (self.__handle_menu_result(strings_results[0][MENU_RESULT]),
                     0)
 
+        if len(strings_results) > GmWindowManager.filter_menu_threshold:
+            return self.__filtered_menu(title, strings_results, starting_index)
+
         # height and width of text box (not border)
         height = len(strings_results)
         max_height = curses.LINES - 2  # 2 for the box
@@ -1099,6 +1108,113 @@ class GmWindowManager(object):
 
         return border_win, menu_win
 
+    def __filtered_menu(self,
+                        title,              # string: title of the menu
+                        strings_results,    # array of tuples (string,
+                                            #   return-value) (see |menu|)
+                        starting_index      # int: who is selected when the
+                                            #   menu starts
+                        ):
+        '''
+        Presents a long menu that the user narrows down by typing part of
+        the entry they want (see MenuFilter).  Backspace takes back a
+        character and escape clears what's been typed (or, if nothing's
+        been typed, leaves the menu).  Only the entries that fit in the
+        window are drawn.
+
+        Returns the result and the index of the result (like |menu|).
+        '''
+        (MENU_STRING, MENU_RESULT) = list(range(0, 2))
+        menu_filter = MenuFilter([entry[MENU_STRING]
+                                  for entry in strings_results])
+
+        # height and width of text box (not border)
+        lines, cols = self.getmaxyx()
+        height = min(len(strings_results) + 1, lines - 4)  # +1: typed text
+        width = 0 if title is None else len(title)
+        for string, result in strings_results:
+            if len(string) > width:
+                width = len(string)
+        width += 1  # Seems to need one more space (or Curses freaks out)
+        if width > cols-4:
+            width = cols-4
+
+        border_win, menu_win = self.__centered_boxed_window(height,
+                                                            width,
+                                                            title)
+        height, width = menu_win.getmaxyx()
+        page = height - 1   # lines for entries (below the typed text)
+
+        typed = ''
+        matches = menu_filter.find(typed)   # indexes into |strings_results|
+        index = (0 if starting_index >= len(matches)
+                 else starting_index)       # index into |matches|
+        top = 0                             # first of |matches| that's shown
+
+        while True:  # The only way out is to return a result
+            if index < top:
+                top = index
+            elif index >= top + page:
+                top = index - page + 1
+
+            # Only draw the entries that fit in the window
+            menu_win.erase()
+            prompt = '> %s  (%d of %d)' % (typed,
+                                           len(matches),
+                                           len(strings_results))
+            menu_win.addstr(0, 0, prompt[:width-1], curses.A_BOLD)
+            for line, match in enumerate(matches[top:top+page]):
+                mode = (curses.A_STANDOUT if top + line == index
+                        else curses.A_NORMAL)
+                string = strings_results[match][MENU_STRING]
+                menu_win.addstr(line + 1, 0, string[:width-1], mode)
+            menu_win.refresh()
+
+            user_input = self.get_one_character()
+            new_typed = typed
+            if user_input == ord('\n'):
+                if len(matches) == 0:
+                    continue
+                del border_win
+                del menu_win
+                self.hard_refresh_all()
+                result_index = matches[index]
+                return (self.__handle_menu_result(
+                            strings_results[result_index][MENU_RESULT]),
+                        result_index)
+            elif user_input == GmWindowManager.ESCAPE:
+                if len(typed) == 0:
+                    del border_win
+                    del menu_win
+                    self.hard_refresh_all()
+                    return None, None
+                new_typed = ''
+            elif user_input in (curses.KEY_BACKSPACE,
+                                curses.ascii.BS,
+                                curses.ascii.DEL):
+                new_typed = typed[:-1]
+            elif len(matches) == 0:
+                pass  # Nothing to move around in
+            elif user_input == curses.KEY_HOME:
+                index = 0
+            elif user_input == curses.KEY_UP:
+                index = len(matches) - 1 if index == 0 else index - 1
+            elif user_input == curses.KEY_DOWN:
+                index = 0 if index == len(matches) - 1 else index + 1
+            elif user_input == curses.KEY_NPAGE:
+                index = min(index + page, len(matches) - 1)
+            elif user_input == curses.KEY_PPAGE:
+                index = max(index - page, 0)
+
+            if user_input < 256 and curses.ascii.isprint(user_input):
+                new_typed = typed + chr(user_input)
+
+            if new_typed != typed:
+                typed = new_typed
+                matches = menu_filter.find(typed)
+                index = 0
+                top = 0
+
     def __handle_menu_result(self,
                              menu_result  # Can literally be anything
                              ):
@@ -1127,6 +1243,416 @@ class GmWindowManager(object):
         pass
 
 
+class ScriptedWindow(object):
+    '''
+    Stands in for a curses window (and for any of the program's GmWindow
+    objects) when a ScriptedWindowManager is running the program.  Nothing
+    is drawn: every method that isn't defined here does nothing.
+    '''
+    # Used by the fight screen
+    fighter_win_width = 40
+    len_timer_leader = 1
+
+    def __init__(self,
+                 height,    # int: number of lines in the window
+                 width      # int: number of columns in the window
+                 ):
+        self.__height = height
+        self.__width = width
+
+    def __getattr__(self, name):
+        return ScriptedWindow.__do_nothing
+
+    def getmaxyx(self):
+        ''' Returns a tuple containing the height and width of the window. '''
+        return self.__height, self.__width
+
+    def get_width(self):
+        ''' Returns the width of the window. '''
+        return self.__width
+
+    def uses_whole_screen(self):
+        ''' Returns False -- there's no screen to cover. '''
+        return False
+
+    @staticmethod
+    def __do_nothing(*args, **kwargs):
+        return None
+
+
+class ScriptedWindowManager(GmWindowManager):
+    '''
+    A GmWindowManager that doesn't need a terminal.  Batch tools,
+    benchmarks, and simulations can use it to run the real code (rulesets,
+    handlers, and all) at full speed.
+
+    Every question the program asks (menus, input boxes, keystrokes) is
+    answered from a queue of responses for that question's title.  If there
+    aren't any responses queued for a question, the |policy| answers it.
+    What the program would have shown (menus, windows, errors) is recorded
+    in a transcript (see |get_transcript|) rather than drawn.
+
+    Menu responses are the menu entry's result (the second part of the
+    (string, result) tuple), just as if the user had picked that entry.
+    Input box responses are strings.  Keystroke responses are ints (like
+    ord('q') or curses.KEY_HOME).
+    '''
+    def __init__(self,
+                 policy=None,           # function(kind, title, choices) that
+                                        #   answers questions that don't have
+                                        #   queued responses (None means
+                                        #   |cancel_policy|).  |kind| is
+                                        #   'menu', 'input', 'edit', or
+                                        #   'char'.
+                 keep_transcript=True,  # bool: record what's shown (errors
+                                        #   are always kept)
+                 height=24,             # int: lines on the pretend screen
+                 width=80               # int: columns on the pretend screen
+                 ):
+        super(ScriptedWindowManager, self).__init__()
+        self.__policy = (ScriptedWindowManager.cancel_policy if policy is None
+                         else policy)
+        self.__keep_transcript = keep_transcript
+        self.__height = height
+        self.__width = width
+
+        self.__menu_responses = {}       # title: [result, ...]
+        self.__input_box_responses = {}  # title: [string, ...]
+        self.__char_responses = []       # [int, ...]
+
+        self.__transcript = []  # {'kind': ..., 'title': ..., ...}
+        self.errors = []        # list of lists of strings
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exception_type, exception_value, exception_traceback):
+        return False
+
+    @staticmethod
+    def cancel_policy(kind,     # string: 'menu', 'input', 'edit', or 'char'
+                      title,    # string: title of the question (or None)
+                      choices   # menu: list of (string, result) tuples,
+                                #   edit: the initial contents, otherwise:
+                                #   None
+                      ):
+        '''
+        Answers every question the way the user would by hitting <ESC> or
+        entering nothing.  Edit windows are left as they were.
+
+        Returns the answer.
+        '''
+        if kind == 'menu':
+            return None
+        if kind == 'input':
+            return ''
+        if kind == 'edit':
+            return choices
+        return GmWindowManager.ESCAPE
+
+    @staticmethod
+    def first_choice_policy(kind,   # string: see |cancel_policy|
+                            title,  # string: title of the question (or None)
+                            choices # see |cancel_policy|
+                            ):
+        '''
+        Picks the first entry of every menu (and, otherwise, answers like
+        |cancel_policy|).
+
+        Returns the answer.
+        '''
+        if kind == 'menu':
+            return choices[0][1]
+        return ScriptedWindowManager.cancel_policy(kind, title, choices)
+
+    def clear_responses(self):
+        '''
+        Throws away every queued response.
+
+        Returns nothing.
+        '''
+        self.__menu_responses = {}
+        self.__input_box_responses = {}
+        self.__char_responses = []
+
+    def clear_transcript(self):
+        '''
+        Throws away the transcript and the errors.
+
+        Returns nothing.
+        '''
+        self.__transcript = []
+        self.errors = []
+
+    def color_of_fighter(self):
+        return curses.A_NORMAL
+
+    def color_of_npc(self):
+        return curses.A_NORMAL
+
+    def color_of_venue(self):
+        return curses.A_NORMAL
+
+    def display_window(self,
+                       title,   # string: title of the window
+                       lines,   # [[{'text', 'mode'}, ], ...]
+                       scroll_to=None
+                       ):
+        '''
+        Records the lines that would have been displayed.
+
+        Returns: nothing
+        '''
+        self.__record({'kind': 'display',
+                       'title': title,
+                       'lines': [''.join(piece['text'] for piece in line)
+                                 for line in lines]})
+
+    def edit_window(self,
+                    height,     # int: height of the window in characters
+                    width,      # int: width of the window in characters
+                    contents,   # initial string (w/ \n) for the window
+                    title,      # string: title of the window
+                    footer      # string: displayed at the bottom of the box
+                    ):
+        '''
+        Returns the edited contents of the window (the next response queued
+        for |title| with |set_input_box_response|).
+        '''
+        contents = self.__next_response(self.__input_box_responses,
+                                        'edit',
+                                        title,
+                                        contents)
+        self.__record({'kind': 'edit', 'title': title, 'response': contents})
+        return contents
+
+    def error(self,
+              strings,          # array of single-line strings
+              title=' ERROR '   # string: title of the error box
+              ):
+        ''' Records an error. '''
+        self.errors.append(strings)
+        self.__record({'kind': 'error', 'title': title, 'lines': strings})
+
+    def get_build_fight_gm_window(self,
+                                  command_ribbon_choices  # dict: see
+                                                          #   GmWindow
+                                  ):
+        ''' Returns a ScriptedWindow in place of a PersonnelGmWindow. '''
+        return ScriptedWindow(self.__height, self.__width)
+
+    def get_fight_gm_window(self,
+                            ruleset,                 # Ruleset object
+                            command_ribbon_choices,  # dict: see GmWindow
+                            fight_handler            # FightHandler object
+                            ):
+        ''' Returns a ScriptedWindow in place of a FightGmWindow. '''
+        return ScriptedWindow(self.__height, self.__width)
+
+    def get_main_gm_window(self,
+                           command_ribbon_choices  # dict: see GmWindow
+                           ):
+        ''' Returns a ScriptedWindow in place of a MainGmWindow. '''
+        return ScriptedWindow(self.__height, self.__width)
+
+    def get_mode_from_fighter_state(self,
+                                    state  # from STATE_COLOR
+                                    ):
+        return curses.A_NORMAL
+
+    def get_one_character(self,
+                          window=None  # ignored
+                          ):
+        '''
+        Returns the next keystroke queued with |set_char_response|.
+        '''
+        if len(self.__char_responses) > 0:
+            return self.__char_responses.pop(0)
+        return self.__policy('char', None, None)
+
+    def get_string(self, window=None):
+        ''' Returns the policy's answer for an untitled input box. '''
+        return self.__policy('input', None, None)
+
+    def get_transcript(self,
+                       kinds=None   # list of strings: kinds of entry to
+                                    #   return (None for all of them)
+                       ):
+        '''
+        Returns a list of what the program showed, in order.  Each entry is a
+        dict with 'kind' ('menu', 'input', 'edit', 'display', 'error', or
+        'print'), 'title', and either 'lines' (what was shown) or 'choices'
+        and 'response' (the question and its answer).
+        '''
+        if kinds is None:
+            return list(self.__transcript)
+        return [entry for entry in self.__transcript if entry['kind'] in kinds]
+
+    def getmaxyx(self):
+        ''' Returns a tuple containing the height and width of the screen. '''
+        return self.__height, self.__width
+
+    def input_box(self,
+                  height,   # int: height of the data window
+                  width,    # int: width of the data window
+                  title     # string: title of the input box
+                  ):
+        '''
+        Returns the next response queued for |title| with
+        |set_input_box_response|.  This also answers |input_box_number| and
+        |input_box_calc| (which both use |input_box|).
+        '''
+        string = self.__next_response(self.__input_box_responses,
+                                      'input',
+                                      title,
+                                      None)
+        self.__record({'kind': 'input', 'title': title, 'response': string})
+        return string
+
+    def menu(self,
+             title,             # string: title of the menu
+             strings_results,   # array of tuples (string, return-value)
+                                #   (see GmWindowManager.menu)
+             starting_index=0,  # Who is selected when the menu starts
+             skip_singles=True  # Do I show menu even if it's only got 1 item?
+             ):
+        '''
+        Answers a menu with the next response queued for |title| with
+        |set_menu_response|.  Like the real menu, a menu with only one entry
+        answers itself (unless |skip_singles| is False) and nested menus and
+        'doit' functions in the results are handled.
+
+        Returns the result and the index of the result.
+        '''
+        if len(strings_results) < 1:
+            return None, None
+
+        if len(strings_results) == 1 and skip_singles:
+            result = strings_results[0][1]
+        else:
+            result = self.__next_response(self.__menu_responses,
+                                          'menu',
+                                          title,
+                                          strings_results)
+        self.__record({'kind': 'menu',
+                       'title': title,
+                       'choices': [string for string, ignore in
+                                   strings_results],
+                       'response': result})
+        if result is None:
+            return None, None
+
+        index = 0
+        for entry_index, (string, entry_result) in enumerate(strings_results):
+            if entry_result is result or entry_result == result:
+                index = entry_index
+                break
+        return self.__handle_menu_result(result), index
+
+    def new_native_window(self,
+                          height=None,
+                          width=None,  # window size
+                          top_line=0,
+                          left_column=0  # window placement
+                          ):
+        ''' Returns a ScriptedWindow. '''
+        return ScriptedWindow(self.__height if height is None else int(height),
+                              self.__width if width is None else int(width))
+
+    def printit(self,
+                string  # String to print
+                ):
+        ''' Records a debug string. '''
+        self.__record({'kind': 'print', 'title': None, 'lines': [string]})
+
+    def set_char_response(self,
+                          char  # int: keystroke, like ord('q')
+                          ):
+        '''
+        Queues a keystroke (for |get_one_character|).  Keystrokes are used in
+        the order in which they were queued.
+
+        Returns nothing.
+        '''
+        self.__char_responses.append(char)
+
+    def set_input_box_response(self,
+                               title,   # string: title of the input box
+                               string   # string: what the user typed
+                               ):
+        '''
+        Queues a response for an input box (or an edit window) with the
+        title |title|.  Responses are used in the order in which they were
+        queued.
+
+        Returns nothing.
+        '''
+        self.__input_box_responses.setdefault(title, []).append(string)
+
+    def set_menu_response(self,
+                          title,    # string: title of the menu
+                          result    # second part of the (string, result)
+                                    #   tuple of the menu entry to pick (or
+                                    #   None to cancel the menu)
+                          ):
+        '''
+        Queues a response for a menu with the title |title|.  Responses are
+        used in the order in which they were queued.
+
+        Returns nothing.
+        '''
+        self.__menu_responses.setdefault(title, []).append(result)
+
+    #
+    # Private Methods
+    #
+
+    def __handle_menu_result(self,
+                             menu_result  # Can literally be anything
+                             ):
+        '''
+        Handles nested menus and 'doit' functions in a menu's result (see
+        GmWindowManager.menu).
+
+        Returns the result of the menu or the return value of the 'doit'
+        function, as appropriate.
+        '''
+        if isinstance(menu_result, dict):
+            while 'menu' in menu_result:
+                menu_result, ignore = self.menu('Which', menu_result['menu'])
+                if menu_result is None:  # Bail out regardless of nesting level
+                    return None
+
+            if 'doit' in menu_result and menu_result['doit'] is not None:
+                param = (None if 'param' not in menu_result
+                         else menu_result['param'])
+                menu_result = (menu_result['doit'])(param)
+
+        return menu_result
+
+    def __next_response(self,
+                        responses,  # dict: title: [response, ...]
+                        kind,       # string: 'menu', 'input', or 'edit'
+                        title,      # string: title of the question
+                        choices     # passed to the policy
+                        ):
+        '''
+        Returns the next queued response for |title| or, if there isn't one,
+        the policy's answer.
+        '''
+        queue = responses.get(title)
+        if queue is not None and len(queue) > 0:
+            return queue.pop(0)
+        return self.__policy(kind, title, choices)
+
+    def __record(self,
+                 entry  # dict: see |get_transcript|
+                 ):
+        ''' Adds |entry| to the transcript if we're keeping one. '''
+        if self.__keep_transcript:
+            self.__transcript.append(entry)
+
+
 class GmScrollableWindow(object):
     '''
     This class represents a window of data that might be larger than the
@@ -1269,6 +1795,66 @@ class GmScrollableWindow(object):
         ''' Touches all of this window's sub-panes.  '''
         self.__window.touchwin()
 
+
+class MenuFilter(object):
+    '''
+    Finds the menu entries that contain what the user has typed so far
+    (ignoring case).  Entries that start with it come first, then the ones
+    that only contain it, each in menu order.
+
+    The entries are indexed by each of the characters they contain so the
+    first character typed only looks at the entries that have it.  After
+    that, each character typed only looks at the entries that matched
+    before it (and backing up goes back to an earlier answer) so filtering
+    a menu of thousands of entries takes no time as the user types.
+    '''
+    def __init__(self,
+                 strings    # list of strings: the menu entries
+                 ):
+        self.__strings = [string.lower() for string in strings]
+        self.__by_character = {}    # character: [index into |strings|, ...]
+        for index, string in enumerate(self.__strings):
+            for character in set(string):
+                self.__by_character.setdefault(character, []).append(index)
+
+        # [(text, [index of matching entry, ...]), ...], each text is the
+        # one before it with one more character
+        self.__found = []
+
+    def find(self,
+             text   # string: what the user has typed
+             ):
+        '''
+        Returns a list of the indexes of the entries that contain |text|
+        (all of them if |text| is empty), the ones that start with |text|
+        first.
+        '''
+        text = text.lower()
+        if len(text) == 0:
+            self.__found = []
+            return list(range(len(self.__strings)))
+
+        # Go back to the longest earlier answer that this one builds on.
+        while (len(self.__found) > 0 and
+                not text.startswith(self.__found[-1][0])):
+            self.__found.pop()
+
+        if len(self.__found) == 0:
+            matches = self.__by_character.get(text[0], [])
+        else:
+            matches = self.__found[-1][1]
+
+        if len(self.__found) == 0 or self.__found[-1][0] != text:
+            matches = [index for index in matches
+                       if text in self.__strings[index]]
+            self.__found.append((text, matches))
+
+        return ([index for index in matches
+                 if self.__strings[index].startswith(text)] +
+                [index for index in matches
+                 if not self.__strings[index].startswith(text)])
+
+
 class GetFilenameWindow(object):
     def __init__(self,
                  window_manager,
@@ -1,20 +1,28 @@
 #! /usr/bin/python
 
+import collections
 import copy
 import curses
+import itertools
 import pprint
 import random
 import re
+import threading
+import types
 
+import ca_damage
 import ca_debug
 import ca_fighter
 import ca_equipment
-import ca_gcs_import
 import ca_gui
 import ca_json
 import ca_ruleset
+import ca_startup
 import ca_timers
 
+# The GURPS Character Sheet importer is big and only used for imports
+ca_gcs_import = ca_startup.LazyModule('ca_gcs_import')
+
 # The JSON source to a "ranged weapon", "swung weapon", "thrust weapon",
 #   "natural weapon", "armor" or "natural armor" is expected to look like this:
 #
@@ -104,6 +112,185 @@ import ca_timers
 #           weapon's primary skill.
 
 
+class GurpsInfoSection(object):
+    '''
+    A top-level section of gurps_info.json (e.g., GurpsRuleset.spells) that
+    isn't read until somebody uses it.
+    '''
+    def __init__(self,
+                 name   # string: top-level key in gurps_info.json
+                 ):
+        self.__name = name
+        self.__empty = {}   # Used if there's no gurps_info.json
+
+    def __get__(self, instance, owner):
+        data = owner.get_gurps_info_section(self.__name)
+        return self.__empty if data is None else data
+
+
+class SpellIndex(object):
+    '''
+    Lookups into the ruleset's spells (from gurps_info.json) that are built
+    once rather than every time someone looks at the spells.  The index
+    rebuilds itself if spells are added or removed or if it's told that the
+    spells have changed (see |mark_changed|).
+    '''
+    __stamps = itertools.count()    # Unique stamp for each build of any index
+
+    def __init__(self,
+                 spells     # dict: name: spell from gurps_info.json
+                 ):
+        self.__spells = spells
+        self.__lock = threading.Lock()  # Guards the rebuild
+        self.__spell_count = None
+        self.__stale = False    # True if the spells changed since the build
+        self.__stamp = None     # Changes every time the index is rebuilt
+        self.names = []             # spell names, sorted
+        self.battle_castable = set()    # names of spells that can be cast
+                                        #   quickly at a distance
+        self.by_range = {}          # range: [name, ...]
+        self.by_casting_time = {}   # casting time (None is special):
+                                    #   [name, ...]
+        self.by_save = {}           # attribute: [name, ...]
+        self.by_notes_prefix = {}   # book reference (e.g., 'M40'):
+                                    #   [name, ...]
+        self.__build()
+
+    def get(self,
+            name    # string: name of the spell
+            ):
+        '''
+        Returns the ruleset's spell (not a copy -- don't modify it) or None.
+        '''
+        self.__update()
+        return self.__spells.get(name)
+
+    def get_names(self,
+                  spell_range=None,     # string: 'melee', 'missile', ...
+                  casting_time=None,    # int
+                  save=None,            # string: attribute that resists it
+                  notes_prefix=None     # string: book reference
+                  ):
+        '''
+        Returns a sorted list of the names of the spells that match all of
+        the criteria that aren't None.
+        '''
+        self.__update()
+        names = None
+        for criterion, index in ((spell_range, self.by_range),
+                                 (casting_time, self.by_casting_time),
+                                 (save, self.by_save),
+                                 (notes_prefix, self.by_notes_prefix)):
+            if criterion is None:
+                continue
+            matches = set(index.get(criterion, []))
+            names = matches if names is None else (names & matches)
+        if names is None:
+            return list(self.names)
+        return sorted(names)
+
+    def get_stamp(self):
+        '''
+        Returns a value that's different every time this (or any other)
+        SpellIndex is rebuilt.  Anything built from the spells can be kept
+        until the stamp changes.
+        '''
+        self.__update()
+        return self.__stamp
+
+    def is_for(self,
+               spells   # dict: name: spell
+               ):
+        '''
+        Returns True if this is the index of |spells|.
+        '''
+        return spells is self.__spells
+
+    @staticmethod
+    def is_battle_castable(spell    # dict: spell from gurps_info.json
+                           ):
+        '''
+        Returns True if a bad guy might want to cast the spell during a
+        battle (i.e., it's quick to cast and it isn't a melee spell).
+        '''
+        return ((spell['casting time'] is None or
+                 spell['casting time'] <= 2) and
+                spell['range'] != 'melee')
+
+    def mark_changed(self):
+        '''
+        Tells the index that spells have been modified in place (which it
+        can't see by counting them).  The index is rebuilt the next time
+        it's used.
+
+        Returns nothing.
+        '''
+        self.__stale = True
+
+    #
+    # Private methods
+    #
+
+    def __build(self):
+        '''
+        Builds the indexes from the spells.  The new indexes are put in
+        place all at once so that someone reading them while they're being
+        built sees the old ones.
+
+        Returns nothing.
+        '''
+        self.__stale = False
+        spell_count = len(self.__spells)
+        names = sorted(self.__spells.keys())
+        battle_castable = set()
+        by_range = {}
+        by_casting_time = {}
+        by_save = {}
+        by_notes_prefix = {}
+
+        for name in names:
+            spell = self.__spells[name]
+            if SpellIndex.is_battle_castable(spell):
+                battle_castable.add(name)
+            by_range.setdefault(spell.get('range'), []).append(name)
+            by_casting_time.setdefault(spell.get('casting time'),
+                                       []).append(name)
+            for attribute in spell.get('save', []):
+                by_save.setdefault(attribute, []).append(name)
+            notes = spell.get('notes')
+            if notes:
+                prefix = notes.split(',')[0].strip()
+                by_notes_prefix.setdefault(prefix, []).append(name)
+
+        self.names = names
+        self.battle_castable = battle_castable
+        self.by_range = by_range
+        self.by_casting_time = by_casting_time
+        self.by_save = by_save
+        self.by_notes_prefix = by_notes_prefix
+        self.__spell_count = spell_count
+        self.__stamp = next(SpellIndex.__stamps)
+
+    def __is_stale(self):
+        '''
+        Returns True if the indexes need to be rebuilt.
+        '''
+        return self.__stale or len(self.__spells) != self.__spell_count
+
+    def __update(self):
+        '''
+        Rebuilds the indexes if spells have been added, removed, or changed.
+        Only one thread does the rebuilding.
+
+        Returns nothing.
+        '''
+        if not self.__is_stale():
+            return
+        with self.__lock:
+            if self.__is_stale():
+                self.__build()
+
+
 class GurpsRuleset(ca_ruleset.Ruleset):
     '''
     GURPS is a trademark of Steve Jackson Games, and its rules and art are
@@ -172,66 +359,94 @@ class GurpsRuleset(ca_ruleset.Ruleset):
     damage_mult = {'burn': 1.0, 'cor': 1.0, 'cr':  1.0, 'cut': 1.5,
                    'imp':  2.0, 'pi-': 0.5, 'pi':  1.0, 'pi+': 1.5,
                    'pi++': 2.0, 'tbb': 1.0, 'tox': 1.0}
-    melee_damage = {1:  {'thr': {'num_dice': 1, 'plus': -6},
-                         'sw':  {'num_dice': 1, 'plus': -5}},
-                    2:  {'thr': {'num_dice': 1, 'plus': -6},
-                         'sw':  {'num_dice': 1, 'plus': -5}},
-                    3:  {'thr': {'num_dice': 1, 'plus': -5},
-                         'sw':  {'num_dice': 1, 'plus': -4}},
-                    4:  {'thr': {'num_dice': 1, 'plus': -5},
-                         'sw':  {'num_dice': 1, 'plus': -4}},
-                    5:  {'thr': {'num_dice': 1, 'plus': -4},
-                         'sw':  {'num_dice': 1, 'plus': -3}},
-                    6:  {'thr': {'num_dice': 1, 'plus': -4},
-                         'sw':  {'num_dice': 1, 'plus': -3}},
-                    7:  {'thr': {'num_dice': 1, 'plus': -3},
-                         'sw':  {'num_dice': 1, 'plus': -2}},
-                    8:  {'thr': {'num_dice': 1, 'plus': -3},
-                         'sw':  {'num_dice': 1, 'plus': -2}},
-                    9:  {'thr': {'num_dice': 1, 'plus': -2},
-                         'sw':  {'num_dice': 1, 'plus': -1}},
-                    10: {'thr': {'num_dice': 1, 'plus': -2},
-                         'sw':  {'num_dice': 1, 'plus': 0}},
-                    11: {'thr': {'num_dice': 1, 'plus': -1},
-                         'sw':  {'num_dice': 1, 'plus': +1}},
-                    12: {'thr': {'num_dice': 1, 'plus': -1},
-                         'sw':  {'num_dice': 1, 'plus': +2}},
-                    13: {'thr': {'num_dice': 1, 'plus': 0},
-                         'sw':  {'num_dice': 2, 'plus': -1}},
-                    14: {'thr': {'num_dice': 1, 'plus': 0},
-                         'sw':  {'num_dice': 2, 'plus': 0}},
-                    15: {'thr': {'num_dice': 1, 'plus': +1},
-                         'sw':  {'num_dice': 2, 'plus': +1}},
-                    16: {'thr': {'num_dice': 1, 'plus': +1},
-                         'sw':  {'num_dice': 2, 'plus': +2}},
-                    17: {'thr': {'num_dice': 1, 'plus': +2},
-                         'sw':  {'num_dice': 3, 'plus': -1}},
-                    18: {'thr': {'num_dice': 1, 'plus': +2},
-                         'sw':  {'num_dice': 3, 'plus': 0}},
-                    19: {'thr': {'num_dice': 2, 'plus': -1},
-                         'sw':  {'num_dice': 3, 'plus': +1}},
-                    20: {'thr': {'num_dice': 2, 'plus': -1},
-                         'sw':  {'num_dice': 3, 'plus': +2}},
-                    21: {'thr': {'num_dice': 2, 'plus': 0},
-                         'sw':  {'num_dice': 4, 'plus': -1}},
-                    22: {'thr': {'num_dice': 2, 'plus': 0},
-                         'sw':  {'num_dice': 4, 'plus': 0}},
-                    23: {'thr': {'num_dice': 2, 'plus': +1},
-                         'sw':  {'num_dice': 4, 'plus': +1}},
-                    24: {'thr': {'num_dice': 2, 'plus': +1},
-                         'sw':  {'num_dice': 4, 'plus': +2}},
-                    25: {'thr': {'num_dice': 2, 'plus': +2},
-                         'sw':  {'num_dice': 5, 'plus': -1}}
-                    }
+    # Basic damage (B16) as (thrust, swing), each of which is (num_dice,
+    # plus), indexed by ST.  Above the end of this table, the damage only
+    # goes up every 5 ST (|melee_damage_by_5_st|) and, above ST 100, by a die
+    # every 10 ST.  Use |get_melee_damage| rather than these.
+    melee_damage = (
+        None,                # ST 0
+        ((1, -6), (1, -5)),  # ST 1
+        ((1, -6), (1, -5)),  # ST 2
+        ((1, -5), (1, -4)),  # ST 3
+        ((1, -5), (1, -4)),  # ST 4
+        ((1, -4), (1, -3)),  # ST 5
+        ((1, -4), (1, -3)),  # ST 6
+        ((1, -3), (1, -2)),  # ST 7
+        ((1, -3), (1, -2)),  # ST 8
+        ((1, -2), (1, -1)),  # ST 9
+        ((1, -2), (1, +0)),  # ST 10
+        ((1, -1), (1, +1)),  # ST 11
+        ((1, -1), (1, +2)),  # ST 12
+        ((1, +0), (2, -1)),  # ST 13
+        ((1, +0), (2, +0)),  # ST 14
+        ((1, +1), (2, +1)),  # ST 15
+        ((1, +1), (2, +2)),  # ST 16
+        ((1, +2), (3, -1)),  # ST 17
+        ((1, +2), (3, +0)),  # ST 18
+        ((2, -1), (3, +1)),  # ST 19
+        ((2, -1), (3, +2)),  # ST 20
+        ((2, +0), (4, -1)),  # ST 21
+        ((2, +0), (4, +0)),  # ST 22
+        ((2, +1), (4, +1)),  # ST 23
+        ((2, +1), (4, +2)),  # ST 24
+        ((2, +2), (5, -1)),  # ST 25
+        ((2, +2), (5, -1)),  # ST 26
+        ((3, -1), (5, +0)),  # ST 27
+        ((3, -1), (5, +0)),  # ST 28
+        ((3, +0), (5, +1)),  # ST 29
+        ((3, +0), (5, +1)),  # ST 30
+        ((3, +1), (5, +2)),  # ST 31
+        ((3, +1), (5, +2)),  # ST 32
+        ((3, +2), (6, -1)),  # ST 33
+        ((3, +2), (6, -1)),  # ST 34
+        ((4, -1), (6, +0)),  # ST 35
+        ((4, -1), (6, +0)),  # ST 36
+        ((4, +0), (6, +1)),  # ST 37
+        ((4, +0), (6, +1)),  # ST 38
+        ((4, +1), (6, +2)),  # ST 39
+        ((4, +1), (6, +2)),  # ST 40
+    )
+    melee_damage_by_5_st = (
+        ((4, +1), (6, +2)),  # ST 40
+        ((5, +0), (7, +1)),  # ST 45
+        ((5, +2), (8, -1)),  # ST 50
+        ((6, +0), (8, +1)),  # ST 55
+        ((7, -1), (9, +0)),  # ST 60
+        ((7, +1), (9, +2)),  # ST 65
+        ((8, +0), (10, +0)), # ST 70
+        ((8, +2), (10, +2)), # ST 75
+        ((9, +0), (11, +0)), # ST 80
+        ((9, +2), (11, +2)), # ST 85
+        ((10, +0), (12, +0)),# ST 90
+        ((10, +2), (12, +2)),# ST 95
+        ((11, +0), (13, +0)),# ST 100
+    )
+
+    # The tables above as (thrust, swing) ca_damage.Damage objects, built
+    # once, so that looking up damage doesn't build anything.
+    __melee_damage_objects = tuple(
+            None if row is None else
+            tuple(ca_damage.Damage.get(num_dice, plus)
+                  for num_dice, plus in row)
+            for row in melee_damage)
+    __melee_damage_by_5_st_objects = tuple(
+            tuple(ca_damage.Damage.get(num_dice, plus)
+                  for num_dice, plus in row)
+            for row in melee_damage_by_5_st)
 
     # These are specific to the Persephone version of the GURPS ruleset
 
-    abilities = {}
+    __gurps_info = None     # ca_json.GmJsonCache for gurps_info.json
+
+    abilities = GurpsInfoSection('abilities')
     # skills:
     #   'name': {'ask': 'number' | 'string' }
     #           {'value': value}
 
-    spells = {}
+    spells = GurpsInfoSection('spells')
+    __spell_index = None    # SpellIndex for |spells|
+    MAX_COMPLETE_SPELLS = 256   # creatures' merged spells kept (see
+                                #   |get_complete_spells|)
     # Spells:
     #   "range" not in the .spl file#
     #   duration:0 means instant
@@ -262,6 +477,11 @@ class GurpsRuleset(ca_ruleset.Ruleset):
         'lying':     {'attack': -4, 'defense': -3, 'target': -2},
     }
 
+    # Read-only views of the posture table, handed out by |get_posture_mods|
+    # so callers share them without being able to change them.
+    __posture_mods = {name: types.MappingProxyType(mods)
+                      for name, mods in posture.items()}
+
     # This is for the Persephone version of the GURPS ruleset.  It's only for
     # color and does not deal with armoring parts of the body or blowthrough
     # or anything that goes with the non-Lite version of GURPS.
@@ -308,12 +528,21 @@ class GurpsRuleset(ca_ruleset.Ruleset):
                  ):
         super(GurpsRuleset, self).__init__(window_manager)
 
-        # Read the skills, spells, and attributes from the file
+        # The skills, spells, and attributes are read from the file (or its
+        # cache) the first time they're used.  All the rulesets share the
+        # one copy.
+
+        if GurpsRuleset.__gurps_info is None:
+            GurpsRuleset.__gurps_info = ca_json.GmJsonCache('gurps_info.json')
+        else:
+            GurpsRuleset.__gurps_info.refresh()
+        self.__gurps_info = GurpsRuleset.__gurps_info
+        self.__save_gurps_info = False
 
-        self.__gurps_info = ca_json.GmJson('gurps_info.json')
-        if self.__gurps_info.open_read_close():
-            GurpsRuleset.spells = self.__gurps_info.read_data['spells']
-            GurpsRuleset.abilities = self.__gurps_info.read_data['abilities']
+        # Each creature's spells merged with the ruleset's spells (see
+        # |get_complete_spells|), least recently used first.
+        self.__complete_spells = collections.OrderedDict()
+                                        # key: [spell, ...]
 
         # If the fighter does one of these things and the turn is over, he
         # clearly hasn't forgotten to do something.  Other actions are passive
@@ -351,8 +580,8 @@ class GurpsRuleset(ca_ruleset.Ruleset):
             print('EXCEPTION type: %r' % exception_type)
             print('EXCEPTION val: %s' % exception_value)
             print('Traceback: %r' % exception_traceback)
-        if self.__gurps_info is not None:
-            self.__gurps_info.open_write_close(self.__gurps_info.write_data)
+        if self.__save_gurps_info:
+            self.__gurps_info.write() # Only if an import changed something
         return True
 
     #
@@ -374,16 +603,15 @@ class GurpsRuleset(ca_ruleset.Ruleset):
 
         spell_info = []
 
-        for spell_name in sorted(GurpsRuleset.spells.keys()):
-            spell = GurpsRuleset.spells[spell_name]
+        spell_index = GurpsRuleset.get_spell_index()
+        for spell_name in spell_index.get_names():
+            spell = spell_index.get(spell_name)
 
             # TODO (now): should be an option
             # Highlight the spells that a bad guy might want to cast during
             # battle.
             mode = (curses.color_pair(ca_gui.GmWindowManager.YELLOW_BLACK)
-                    if ((spell['casting time'] is None or
-                         spell['casting time'] <= 2) and
-                        spell['range'] != 'melee')
+                    if spell_name in spell_index.battle_castable
                     else curses.A_NORMAL)
 
             # Top line
@@ -508,18 +736,8 @@ class GurpsRuleset(ca_ruleset.Ruleset):
 
         Returns the string.
         '''
-        results = []
-        for damage in damages:
-            string = []
-            if damage['attack_type'] is not None:
-                string.append('%s: ' % damage['attack_type'])
-            string.append('%dd%+d ' % (damage['num_dice'], damage['plus']))
-            string.append('(%s)' % damage['damage_type'])
-            if 'notes' in damage and damage['notes'] is not None:
-                string.append(', %s' % damage['notes'])
-            results.append(''.join(string))
-
-        return ', '.join(results)
+        return ', '.join([ca_damage.format_damage(damage)
+                          for damage in damages])
 
     def do_save_on_exit(self):
         '''
@@ -529,10 +747,7 @@ class GurpsRuleset(ca_ruleset.Ruleset):
         Returns nothing.
         '''
         super(GurpsRuleset, self).do_save_on_exit()
-
-        # TODO (eventually): only set the following if BOTH do_save_on_exit
-        #   is called _and_ we've added data with an import.
-        self.__gurps_info.write_data = self.__gurps_info.read_data
+        self.__save_gurps_info = True
 
     def does_weapon_use_unarmed_skills(self,
                                        weapon  # Weapon object
@@ -565,8 +780,8 @@ class GurpsRuleset(ca_ruleset.Ruleset):
         Returns nothing.
         '''
         super(GurpsRuleset, self).dont_save_on_exit()
-        self.__gurps_info.open_read_close()
-        self.__gurps_info.write_data = None
+        self.__gurps_info.revert()
+        self.__save_gurps_info = False
 
     def end_turn(self,
                  fighter,       # Fighter object
@@ -689,8 +904,10 @@ class GurpsRuleset(ca_ruleset.Ruleset):
             # Build the 'Cast' menu
 
             spell_menu = []
+            complete_spells = self.get_complete_spells(fighter.rawdata)
             for index, spell in enumerate(fighter.rawdata['spells']):
-                menu_item = self.__build_cast_spell_menu_item(spell, index)
+                menu_item = self.__build_cast_spell_menu_item(
+                        spell, complete_spells[index], index)
                 if menu_item is not None:
                     spell_menu.append(menu_item)
             spell_menu = sorted(spell_menu, key=lambda x: x[0].upper())
@@ -709,7 +926,9 @@ class GurpsRuleset(ca_ruleset.Ruleset):
                 spell_name = timer.rawdata['data']['spell']['name']
 
                 # ignore the spell if there's no maintainence cost
-                spell_data = GurpsRuleset.spells[spell_name]
+                spell_data = GurpsRuleset.get_spell_index().get(spell_name)
+                if spell_data is None:
+                    continue
                 if 'maintain' not in spell_data:
                     continue
                 if spell_data['maintain'] is None:
@@ -735,9 +954,11 @@ class GurpsRuleset(ca_ruleset.Ruleset):
                     continue # Shouldn't happen; caster should know this spell
 
                 # Build the menu item and add it to the menu
-                menu_item = self.__build_cast_spell_menu_item(spell_found,
-                                                              index_found,
-                                                              maintain=True)
+                menu_item = self.__build_cast_spell_menu_item(
+                        spell_found,
+                        complete_spells[index_found],
+                        index_found,
+                        maintain=True)
                 if menu_item is not None:
                     maintain_spell_menu.append(menu_item)
 
@@ -838,6 +1059,51 @@ class GurpsRuleset(ca_ruleset.Ruleset):
 
         return block_skill, block_why
 
+    def get_complete_spells(self,
+                            creature    # dict: creature from the Game File
+                            ):
+        '''
+        Merges each of the creature's spells (name and skill) with the
+        ruleset's description of the spell.  The result is kept until the
+        creature's spell list (or the ruleset's spells) change and only the
+        most recently used GurpsRuleset.MAX_COMPLETE_SPELLS are kept.  Don't
+        modify the spells in the result (copy the one you want to change).
+
+        Returns: a list parallel to creature['spells'] with the merged spell
+            (or None if the ruleset doesn't know the spell).
+        '''
+        if 'spells' not in creature:
+            return []
+        spells = creature['spells']
+        spell_index = GurpsRuleset.get_spell_index()
+
+        try:
+            key = (spell_index.get_stamp(),
+                   tuple(tuple(sorted(spell.items())) for spell in spells))
+        except TypeError:
+            key = None  # Something in a spell that can't be hashed
+
+        if key is not None and key in self.__complete_spells:
+            self.__complete_spells.move_to_end(key)
+            return self.__complete_spells[key]
+
+        complete_spells = []
+        for spell in spells:
+            ruleset_spell = spell_index.get(spell['name'])
+            if ruleset_spell is None:
+                complete_spells.append(None)
+            else:
+                complete_spell = dict(spell)
+                complete_spell.update(ruleset_spell)
+                complete_spells.append(complete_spell)
+
+        if key is not None:
+            self.__complete_spells[key] = complete_spells
+            if (len(self.__complete_spells) >
+                    GurpsRuleset.MAX_COMPLETE_SPELLS):
+                self.__complete_spells.popitem(last=False)
+        return complete_spells
+
     def get_creature_abilities(self):
         '''
         Returns the list of capabilities that, according to the ruleset, a
@@ -1311,16 +1577,16 @@ class GurpsRuleset(ca_ruleset.Ruleset):
             output.append([{'text': 'Spells', 'mode': mode | curses.A_BOLD}])
 
             found_one = False
-            for spell in sorted(character.rawdata['spells'],
-                                key=lambda x: x['name']):
-                if spell['name'] not in GurpsRuleset.spells:
+            complete_spells = self.get_complete_spells(character.rawdata)
+            for spell, complete_spell in sorted(
+                    zip(character.rawdata['spells'], complete_spells),
+                    key=lambda x: x[0]['name']):
+                if complete_spell is None:
                     self._window_manager.error(
                         ['Spell "%s" not in GurpsRuleset.spells' %
                             spell['name']]
                         )
                     continue
-                complete_spell = copy.deepcopy(spell)
-                complete_spell.update(GurpsRuleset.spells[spell['name']])
                 found_one = True
                 output.append(
                         [{'text': '  %s (%d): %s' % (complete_spell['name'],
@@ -1476,6 +1742,24 @@ class GurpsRuleset(ca_ruleset.Ruleset):
 
         return fighter_string
 
+    def get_fighter_description_short_key(self,
+                                          fighter,      # Fighter object
+                                          fight_handler # FightHandler object
+                                          ):
+        '''
+        Returns a tuple that changes whenever |get_fighter_description_short|
+        would return something different so that the description can be
+        cached.  Everything in the fighter's rawdata is covered by the
+        fighter's change count; the rest is kept in the fight.
+        '''
+        return (fighter.get_change_count(),
+                fighter.name if fight_handler is None else
+                    fight_handler.get_display_name(fighter),
+                fighter.timers.is_busy(),
+                (fight_handler is not None and
+                    fight_handler.is_fighter_holding_init(fighter.name,
+                                                          fighter.group)))
+
     def get_fighter_notes(self,
                           fighter   # Fighter object
                           ):
@@ -1621,6 +1905,19 @@ class GurpsRuleset(ca_ruleset.Ruleset):
                                  fighter.name)])
         return notes
 
+    @staticmethod
+    def get_gurps_info_section(name  # string: top-level key in gurps_info.json
+                               ):
+        '''
+        Reads (if it hasn't already been read) a section of gurps_info.json.
+        Usually, you'd use GurpsRuleset.spells or GurpsRuleset.abilities.
+
+        Returns the section's data or None if it's not available.
+        '''
+        if GurpsRuleset.__gurps_info is None:
+            return None
+        return GurpsRuleset.__gurps_info.get_section(name)
+
     def get_import_commands(self,
                             world   # World object
                             ):
@@ -1646,6 +1943,30 @@ class GurpsRuleset(ca_ruleset.Ruleset):
         ''' Returns the filename extension for files from which to import.'''
         return ['.eqp']
 
+    @staticmethod
+    def get_melee_damage(st,            # int: the attacker's ST
+                         attack_type    # 'thr' or 'sw'
+                         ):
+        '''
+        Looks up the basic thrust or swing damage (B16) for |st|.  The table
+        is extrapolated past ST 100 by adding a die to each for every 10 ST.
+
+        Returns: a ca_damage.Damage object (with only num_dice and plus).
+        '''
+        column = 0 if attack_type == 'thr' else 1
+        st = max(st, 1)
+        if st < len(GurpsRuleset.__melee_damage_objects):
+            return GurpsRuleset.__melee_damage_objects[st][column]
+
+        top_st = 40 + 5 * (len(GurpsRuleset.__melee_damage_by_5_st_objects) - 1)
+        if st <= top_st:
+            return GurpsRuleset.__melee_damage_by_5_st_objects[
+                    (st - 40) // 5][column]
+
+        top = GurpsRuleset.__melee_damage_by_5_st_objects[-1][column]
+        return ca_damage.Damage.get(top.num_dice + (st - top_st) // 10,
+                                    top.plus)
+
     def get_parry_skill(self,                       # Public to aid in testing
                         fighter,        # Fighter object
                         weapon,         # Weapon object
@@ -1714,8 +2035,7 @@ class GurpsRuleset(ca_ruleset.Ruleset):
         Returns a dict with the attack, defense, and target minuses for the
         given posture.
         '''
-        return (None if posture not in GurpsRuleset.posture else
-                GurpsRuleset.posture[posture])
+        return GurpsRuleset.__posture_mods.get(posture)
 
     def get_sample_items(self):
         '''
@@ -1804,6 +2124,17 @@ class GurpsRuleset(ca_ruleset.Ruleset):
 
         return sections
 
+    @staticmethod
+    def get_spell_index():
+        '''
+        Returns the SpellIndex for the ruleset's spells (building it if the
+        spells have been replaced).
+        '''
+        if (GurpsRuleset.__spell_index is None or
+                not GurpsRuleset.__spell_index.is_for(GurpsRuleset.spells)):
+            GurpsRuleset.__spell_index = SpellIndex(GurpsRuleset.spells)
+        return GurpsRuleset.__spell_index
+
     def get_unarmed_weapon(self):
         item = {
           "count": 1,
@@ -2309,8 +2640,8 @@ class GurpsRuleset(ca_ruleset.Ruleset):
 
         # Damage
 
-        punch_damage = None  # Expressed as dice
-        kick_damage = None   # Expressed as dice
+        punch_damage = None  # ca_damage.Damage object
+        kick_damage = None   # ca_damage.Damage object
         st = fighter.rawdata['current']['st']
 
         # Base damage
@@ -2318,11 +2649,11 @@ class GurpsRuleset(ca_ruleset.Ruleset):
         kick_damage_why.append('Kick damage(B271)=thr')
 
         damage_modified = False
-        kick_damage = copy.deepcopy(GurpsRuleset.melee_damage[st]['thr'])
+        kick_damage = GurpsRuleset.get_melee_damage(st, 'thr')
         kick_damage_why.append('  plug ST(%d) into table on B16 = %dd%+d' %
                                (st,
-                                kick_damage['num_dice'],
-                                kick_damage['plus']))
+                                kick_damage.num_dice,
+                                kick_damage.plus))
 
         if 'delete me' in weapon.rawdata:
             weapon = None
@@ -2331,15 +2662,16 @@ class GurpsRuleset(ca_ruleset.Ruleset):
         # instead of making it a special case for brass knuckles.
         damage_array = None
         if weapon is None:
-            punch_damage = copy.deepcopy(GurpsRuleset.melee_damage[st]['thr'])
+            punch_damage = GurpsRuleset.get_melee_damage(st, 'thr')
             punch_damage_why.append('Punch damage(B271) = thr-1')
             punch_damage_why.append(
                     '  plug ST(%d) into table on B16 = %dd%+d' %
-                    (st, punch_damage['num_dice'], punch_damage['plus']))
-            punch_damage['plus'] -= 1
+                    (st, punch_damage.num_dice, punch_damage.plus))
+            punch_damage = ca_damage.Damage.get(punch_damage.num_dice,
+                                                punch_damage.plus - 1)
             punch_damage_why.append('  -1 (damage is thr-1) = %dd%+d' %
-                                    (punch_damage['num_dice'],
-                                     punch_damage['plus']))
+                                    (punch_damage.num_dice,
+                                     punch_damage.plus))
         else:
             modes = weapon.get_attack_modes()
             for mode in modes:
@@ -2354,8 +2686,10 @@ class GurpsRuleset(ca_ruleset.Ruleset):
 
         if plus_per_die_of_thrust != 0:
             damage_modified = True
-            kick_damage['plus'] += (kick_damage['num_dice'] *
-                                    plus_per_die_of_thrust)
+            kick_damage = ca_damage.Damage.get(
+                    kick_damage.num_dice,
+                    kick_damage.plus + (kick_damage.num_dice *
+                                        plus_per_die_of_thrust))
             kick_damage_why.append('  %+d/die due to %s' % (
                                                 plus_per_die_of_thrust,
                                                 plus_per_die_of_thrust_string))
@@ -2365,8 +2699,10 @@ class GurpsRuleset(ca_ruleset.Ruleset):
                         damage['plus'] += (damage['num_dice'] *
                                            plus_per_die_of_thrust)
             else:
-                punch_damage['plus'] += (punch_damage['num_dice'] *
-                                         plus_per_die_of_thrust)
+                punch_damage = ca_damage.Damage.get(
+                        punch_damage.num_dice,
+                        punch_damage.plus + (punch_damage.num_dice *
+                                             plus_per_die_of_thrust))
 
             punch_damage_why.append('  %+d/die of thrust due to %s' % (
                                                 plus_per_die_of_thrust,
@@ -2375,8 +2711,8 @@ class GurpsRuleset(ca_ruleset.Ruleset):
         # Show the 'why'
         if damage_modified:
             kick_damage_why.append('  ...for a kick damage total = %dd%+d' % (
-                                            kick_damage['num_dice'],
-                                            kick_damage['plus']))
+                                            kick_damage.num_dice,
+                                            kick_damage.plus))
             if damage_array is not None:
                 damage_str = self.damage_to_string(damage_array)
                 punch_damage_why.append('  ...for a punch damage total = %s' %
@@ -2384,8 +2720,8 @@ class GurpsRuleset(ca_ruleset.Ruleset):
             else:
                 punch_damage_why.append(
                                 '  ...for a punch damage total = %dd%+d' % (
-                                                punch_damage['num_dice'],
-                                                punch_damage['plus']))
+                                                punch_damage.num_dice,
+                                                punch_damage.plus))
 
         # Assemble final damage and 'why'
 
@@ -2396,8 +2732,8 @@ class GurpsRuleset(ca_ruleset.Ruleset):
         if damage_array is None:
             damage_array = [{
                 'attack_type': None,
-                'num_dice': punch_damage['num_dice'],
-                'plus': punch_damage['plus'],
+                'num_dice': punch_damage.num_dice,
+                'plus': punch_damage.plus,
                 'damage_type': damage_type_str
             }]
         result['punch_damage'] = self.damage_to_string(damage_array)
@@ -2405,8 +2741,8 @@ class GurpsRuleset(ca_ruleset.Ruleset):
         if kick_damage is not None:
             damage_array = [{
                 'attack_type': None,
-                'num_dice': kick_damage['num_dice'],
-                'plus': kick_damage['plus'],
+                'num_dice': kick_damage.num_dice,
+                'plus': kick_damage.plus,
                 'damage_type': damage_type_str
             }]
             result['kick_damage'] = self.damage_to_string(damage_array)
@@ -2465,12 +2801,17 @@ class GurpsRuleset(ca_ruleset.Ruleset):
         if filename is None:
             return True
 
+        native_data = GurpsRuleset.abilities['advantages']
+        original_data = copy.deepcopy(native_data)
+
         gcs_import = ca_gcs_import.GcsImport(self._window_manager)
         gcs_import.import_advantages_from_file(
                 self._window_manager,
-                self.__gurps_info.read_data['abilities']['advantages'],
+                native_data,
                 self,
                 filename)
+        if native_data != original_data:
+            self.__gurps_info.mark_modified('abilities')
         return True
 
     def import_equipment_from_file(self,
@@ -2511,12 +2852,17 @@ class GurpsRuleset(ca_ruleset.Ruleset):
         if filename is None:
             return True
 
+        native_data = GurpsRuleset.abilities['skills']
+        original_data = copy.deepcopy(native_data)
+
         gcs_import = ca_gcs_import.GcsImport(self._window_manager)
         gcs_import.import_skills_from_file(
                 self._window_manager,
-                self.__gurps_info.read_data['abilities']['skills'],
+                native_data,
                 self,
                 filename)
+        if native_data != original_data:
+            self.__gurps_info.mark_modified('abilities')
         return True
 
     def import_spells_from_file(self,
@@ -2534,12 +2880,18 @@ class GurpsRuleset(ca_ruleset.Ruleset):
         if filename is None:
             return True
 
+        native_data = GurpsRuleset.spells
+        original_data = copy.deepcopy(native_data)
+
         gcs_import = ca_gcs_import.GcsImport(self._window_manager)
         gcs_import.import_spells_from_file(
                 self._window_manager,
-                self.__gurps_info.read_data['spells'],
+                native_data,
                 self,
                 filename)
+        if native_data != original_data:
+            self.__gurps_info.mark_modified('spells')
+            GurpsRuleset.get_spell_index().mark_changed()
         return True
 
     def initiative(self,
@@ -2554,23 +2906,46 @@ class GurpsRuleset(ca_ruleset.Ruleset):
 
         Returns: the 'initiative' tuple
         '''
+        return self.initiatives([fighter], fighters)[(fighter.name,
+                                                      fighter.group)]
+
+    def initiatives(self,
+                    fighters,           # list of Fighter objects
+                    all_fighters=None   # list of all of the Fighter objects
+                                        #   in the fight (None if it's the
+                                        #   same as |fighters|)
+                    ):
+        '''
+        Generates the 'initiative' tuple (see |initiative|) for each of
+        |fighters|.  The group bonuses are figured once for the whole fight
+        and the tie-breaking rolls are made together, in the order of
+        |fighters|.
+
+        Returns: dict: (name, group) -> 'initiative' tuple
+        '''
+        if all_fighters is None:
+            all_fighters = fighters
+
         # Combat reflexes (B43) adds 1 to the initiative of every member of
-        # the party
-        combat_reflexes_bonus = 0
-        for creature in fighters:
-            if (creature.group == fighter.group and
-                    'Combat Reflexes' in creature.rawdata['advantages']):
-                # Technically, you're supposed to add 2 if the person with
-                # combat reflexes is the leader but I don't have a mechanic
-                # for designating the leader.
-                combat_reflexes_bonus = 1
-                break
-        value = (fighter.rawdata['current']['basic-speed'] +
-                 combat_reflexes_bonus)
-        return (value,
-                fighter.rawdata['current']['dx'],
-                ca_ruleset.Ruleset.roll(1, 6)
-                )
+        # the party.  Technically, you're supposed to add 2 if the person
+        # with combat reflexes is the leader but I don't have a mechanic for
+        # designating the leader.
+        combat_reflexes_groups = set()
+        for creature in all_fighters:
+            if 'Combat Reflexes' in creature.rawdata['advantages']:
+                combat_reflexes_groups.add(creature.group)
+
+        rolls = [ca_ruleset.Ruleset.roll(1, 6) for fighter in fighters]
+
+        result = {}
+        for fighter, roll in zip(fighters, rolls):
+            combat_reflexes_bonus = (1 if fighter.group in
+                                     combat_reflexes_groups else 0)
+            value = (fighter.rawdata['current']['basic-speed'] +
+                     combat_reflexes_bonus)
+            result[(fighter.name, fighter.group)] = (
+                    value, fighter.rawdata['current']['dx'], roll)
+        return result
 
     def offer_to_add_dependencies(self,
                                   world,    # World object, contains store
@@ -2699,7 +3074,7 @@ class GurpsRuleset(ca_ruleset.Ruleset):
                 if len(skills) == 0:
                     skill_list_string = '** NONE **'
                 skill_list_string = ', '.join(iter(skills.keys()))
-                self._window_manager.error([
+                self._consistency_error([
                     'Creature "%s"' % name,
                     '  has item "%s"' % item['name'],
                     '  but none of the skills to use it:',
@@ -2709,19 +3084,70 @@ class GurpsRuleset(ca_ruleset.Ruleset):
             duplicate_check = {}
             for spell in creature['spells']:
                 if spell['name'] in duplicate_check:
-                    self._window_manager.error([
+                    self._consistency_error([
                         'Creature "%s"' % name,
                         '  has two copies of spell "%s"' % spell['name']])
                 else:
                     duplicate_check[spell['name']] = 1
 
                 if spell['name'] not in GurpsRuleset.spells:
-                    self._window_manager.error([
+                    self._consistency_error([
                         'Creature "%s"' % name,
                         '  has spell "%s" that is not in ruleset' %
                         spell['name']])
         return result
 
+    def get_consistency_problems(self,
+                                 name,     # string: creature's name
+                                 creature  # dict from Game File
+                                 ):
+        '''
+        Finds the problems that |check_creature_consistent| complains about
+        without fixing them or using the window manager (see
+        Ruleset.get_consistency_problems).
+
+        Returns: list of problems, each of which is a list of single-line
+        strings.
+        '''
+        problems = super(GurpsRuleset, self).get_consistency_problems(name,
+                                                                      creature)
+        if name == ca_fighter.Venue.name or 'skills' not in creature:
+            return problems
+
+        fighter = ca_fighter.Fighter(name,
+                                     'dummy group',  # unused
+                                     creature,
+                                     self,
+                                     None)
+        for item in creature['stuff']:
+            if (ca_equipment.Equipment.is_natural_weapon(item) or
+                    ca_equipment.Equipment.is_natural_armor(item)):
+                continue # you can always use your natural items
+            missing_skills = self._get_missing_skill_names(fighter, item)
+            if len(missing_skills) > 0:
+                problems.append([
+                    'Creature "%s"' % name,
+                    '  has item "%s"' % item['name'],
+                    '  but none of the skills to use it:',
+                    '  %s' % ', '.join(missing_skills)])
+
+        if 'spells' in creature:
+            duplicate_check = {}
+            for spell in creature['spells']:
+                if spell['name'] in duplicate_check:
+                    problems.append([
+                        'Creature "%s"' % name,
+                        '  has two copies of spell "%s"' % spell['name']])
+                else:
+                    duplicate_check[spell['name']] = 1
+
+                if spell['name'] not in GurpsRuleset.spells:
+                    problems.append([
+                        'Creature "%s"' % name,
+                        '  has spell "%s" that is not in ruleset' %
+                        spell['name']])
+        return problems
+
     def make_empty_armor(self):
         '''
         Builds the minimum legal armor (the dict that goes into the
@@ -3003,8 +3429,7 @@ class GurpsRuleset(ca_ruleset.Ruleset):
 
             # Send the action for the second part
 
-            new_action = copy.deepcopy(action)
-            new_action['part'] = 2
+            new_action = self._make_part_2_action(action)
             self.do_action(fighter, new_action, fight_handler)
 
             return None  # No timer
@@ -3348,19 +3773,18 @@ class GurpsRuleset(ca_ruleset.Ruleset):
 
     def __build_cast_spell_menu_item(
             self,
-            spell, # dict from fighter's list
-            index, # int: index of spell in fighter's list
+            spell,          # dict from fighter's list
+            complete_spell, # dict: |spell| merged with the ruleset's spell
+                            #   (see get_complete_spells) or None
+            index,          # int: index of spell in fighter's list
             maintain=False
             ):
-        if spell['name'] not in GurpsRuleset.spells:
+        if complete_spell is None:
             self._window_manager.error(
                 ['Spell "%s" not in GurpsRuleset.spells' %
                     spell['name']])
             return None
 
-        complete_spell = copy.deepcopy(spell)
-        complete_spell.update(GurpsRuleset.spells[spell['name']])
-
         cast_text_array = ['%s -' % complete_spell['name']]
 
         for piece in ['cost',
@@ -3385,7 +3809,7 @@ class GurpsRuleset(ca_ruleset.Ruleset):
             result = (cast_text,
                       {'action': {'action-name': 'maintain-spell',
                                   'spell-index': index,
-                                  'complete spell': complete_spell}})
+                                  'complete spell': dict(complete_spell)}})
         else:
             result = (cast_text,
                       {'action': {'action-name': 'cast-spell',
@@ -3552,14 +3976,17 @@ class GurpsRuleset(ca_ruleset.Ruleset):
 
             spell_index = action['spell-index']
             spell = fighter.rawdata['spells'][spell_index]
+            complete_spell = self.get_complete_spells(
+                    fighter.rawdata)[spell_index]
 
-            if spell['name'] not in GurpsRuleset.spells:
+            if complete_spell is None:
                 self._window_manager.error(
                     ['Spell "%s" not in GurpsRuleset.spells' % spell['name']]
                 )
                 return None  # No timers
-            complete_spell = copy.deepcopy(spell)
-            complete_spell.update(GurpsRuleset.spells[spell['name']])
+
+            # This spell gets filled-in, below, so it needs its own copy.
+            complete_spell = dict(complete_spell)
 
             # Duration
 
@@ -3746,9 +4173,8 @@ class GurpsRuleset(ca_ruleset.Ruleset):
 
             # Send the action for the second part
 
-            new_action = copy.deepcopy(action)
-            new_action['complete spell'] = complete_spell
-            new_action['part'] = 2
+            new_action = self._make_part_2_action(
+                    action, {'complete spell': complete_spell})
 
             if opponent is not None and spell_worked_on_opponent:
                 new_action['opponent'] = {'name': opponent.name,
@@ -4133,8 +4559,7 @@ class GurpsRuleset(ca_ruleset.Ruleset):
 
             # Send the action for the second part
 
-            new_action = copy.deepcopy(action)
-            new_action['part'] = 2
+            new_action = self._make_part_2_action(action)
             self.do_action(fighter, new_action, fight_handler)
 
             return None  # No timer
@@ -4215,8 +4640,7 @@ class GurpsRuleset(ca_ruleset.Ruleset):
 
             # Send the action for the second part
 
-            new_action = copy.deepcopy(action)
-            new_action['part'] = 2
+            new_action = self._make_part_2_action(action)
             self.do_action(fighter, new_action, fight_handler)
 
             return None  # No timer
@@ -4446,18 +4870,16 @@ class GurpsRuleset(ca_ruleset.Ruleset):
 
             # TODO (eventually): In other event, maybe, show the tables and such
 
-            # Send the action for the second part
+            # Send the action for the second part.  It copies the comment
+            # from this part -- that's what gets displayed for the history
+            # command.
 
-            # Do a deepcopy for the second part to copy the comment --
-            # that's what gets displayed for the history command.
-
-            new_action = copy.deepcopy(action)
+            new_action = self._make_part_2_action(
+                    action, {'all-out-option': all_out_option})
             if shots_fired > 1:
                 new_action['shots_fired'] = shots_fired
             if all_out_option is not None:
                 new_action['bonus'] = all_out_option
-            new_action['all-out-option'] = all_out_option
-            new_action['part'] = 2
             self.do_action(fighter, new_action, fight_handler)
 
             return None # No timers for part 1
@@ -4646,11 +5068,8 @@ class GurpsRuleset(ca_ruleset.Ruleset):
                     if made_skill_roll:
                         reload_time -= 1
 
-            new_action = copy.deepcopy(action)
-            new_action['time'] = reload_time
-            new_action['part'] = 2
-            if 'notimer' in action:
-                new_action['notimer'] = action['notimer']
+            new_action = self._make_part_2_action(action,
+                                                  {'time': reload_time})
 
             # TODO (eventually): the action should be launched by a timer
             self.do_action(fighter, new_action, fight_handler)
@@ -4789,36 +5208,35 @@ class GurpsRuleset(ca_ruleset.Ruleset):
         why = []
 
         # Get the method of calculating the damage
-        damage, notes = weapon.get_damage_next_shot(mode)
-        debug.print('Damage formula')
-        debug.pprint(damage)
+        damage, notes = weapon.get_damage_expression(mode)
+        debug.print('Damage formula: %r' % damage)
+
+        if damage is None:
+            pass
 
-        if 'st' in damage:
+        elif damage.is_st_based():
             debug.print('found ST')
 
             st = fighter.rawdata['current']['st']
 
-            attack_type = damage['st']  # 'sw' or 'thr'
+            attack_type = damage.st  # 'sw' or 'thr'
+            basic_damage = GurpsRuleset.get_melee_damage(st, attack_type)
             # This is 'cut', 'imp', 'pi' or ...
-            damage_type_str = self.__get_damage_type_str(damage['type'])
+            damage_type_str = self.__get_damage_type_str(damage.type)
             results.append(
                 {'attack_type': attack_type, # 'thr', 'sw'
-                 'num_dice':
-                    GurpsRuleset.melee_damage[st][attack_type]['num_dice'],
-                 'plus': GurpsRuleset.melee_damage[st][attack_type]['plus'] +
-                    damage['plus'],
+                 'num_dice': basic_damage.num_dice,
+                 'plus': basic_damage.plus + damage.plus,
                  'damage_type': damage_type_str,
                  'notes': notes})
 
             why.append('Weapon %s, %s' % (weapon.rawdata['name'], mode))
-            why.append('  Damage: %s%+d' % ( attack_type, damage['plus']))
+            why.append('  Damage: %s' % damage.dice_string())
             why.append('  plug ST(%d) into table on B16 = %dd%+d' %
-                       (st,
-                        GurpsRuleset.melee_damage[st][attack_type]['num_dice'],
-                        GurpsRuleset.melee_damage[st][attack_type]['plus']))
-            if damage['plus'] != 0:
+                       (st, basic_damage.num_dice, basic_damage.plus))
+            if damage.plus != 0:
                 # TODO (eventually): attack_type = 'sw' and there's none of that in |damage|
-                why.append('  %+d for the weapon' % damage['plus'])
+                why.append('  %+d for the weapon' % damage.plus)
 
             # All-Out Attack can affect damage
             # a "strong" attack does the better of +2 damage or +1 per die
@@ -4828,8 +5246,7 @@ class GurpsRuleset(ca_ruleset.Ruleset):
             all_out_attack_plus = 0
             if (all_out_option is not None and
                     all_out_option == GurpsRuleset.ALL_OUT_STRONG_ATTACK):
-                num_dice_damage = (
-                        GurpsRuleset.melee_damage[st][attack_type]['num_dice'])
+                num_dice_damage = basic_damage.num_dice
                 all_out_attack_plus = (
                         num_dice_damage if num_dice_damage > 2 else 2)
                 why.append('  %+d for all-out attack, strong' %
@@ -4838,28 +5255,24 @@ class GurpsRuleset(ca_ruleset.Ruleset):
             # Final tally
 
             why.append('  ...damage: %dd%+d' %
-                       (GurpsRuleset.melee_damage[st][attack_type]['num_dice'],
-                        GurpsRuleset.melee_damage[st][attack_type]['plus'] +
-                        damage['plus'] +
-                        all_out_attack_plus))
-        elif 'dice' in damage:
+                       (basic_damage.num_dice,
+                        basic_damage.plus + damage.plus + all_out_attack_plus))
+        else:
             # if we're here, the damage is based on the weapon and not the
             # capabilities of the wielder.  Therefore, the damage may be a
             # function of the ammo in the clip.  Check that.
 
             # {'damage': {'dice': {'plus':#, 'num_dice':#, 'type': 'pi' or ...
             debug.print('found DICE')
-            damage_type_str = self.__get_damage_type_str(
-                    damage['dice']['type'])
+            damage_type_str = self.__get_damage_type_str(damage.type)
             results.append(
                 {'attack_type': None,
-                 'num_dice': damage['dice']['num_dice'],
-                 'plus': damage['dice']['plus'],
+                 'num_dice': damage.num_dice,
+                 'plus': damage.plus,
                  'damage_type': damage_type_str,
                  'notes': notes})
             why.append('Weapon %s, %s' % (weapon.rawdata['name'], mode))
-            why.append('  Damage: %dd%+d' % (damage['dice']['num_dice'],
-                                             damage['dice']['plus']))
+            why.append('  Damage: %s' % damage.dice_string())
 
             # Shotguns need more explanation B373
             # TODO (now): B373 - one hit per multiple of 'rcl'.  We're treating rcl as 1,
@@ -4881,8 +5294,8 @@ class GurpsRuleset(ca_ruleset.Ruleset):
                     why.append('      1 (on hit success) + margin of HIT success')
                     why.append('    Closer than 5 yards, DR *= %d, but...' % mult_factor)
                     why.append('      ...Damage: %dd%+d per shot taken' % (
-                        (mult_factor * damage['dice']['num_dice']),
-                        (mult_factor * damage['dice']['plus'])))
+                        (mult_factor * damage.num_dice),
+                        (mult_factor * damage.plus)))
                     why.append('    Dodge success removes 1 pellet + 1 pellet per margin ')
                     why.append('      of success (closer than 5 yards, it\'s the shot,')
                     why.append('      not the pellet that\'s dodged)')
@@ -4917,6 +5330,25 @@ class GurpsRuleset(ca_ruleset.Ruleset):
         return damage_type_str
 
 
+    def _get_consistency_sections(self,
+                                  creature   # dict from Game File
+                                  ):
+        '''
+        Returns: dict containing the parts of |creature| on which
+        |check_creature_consistent| depends.
+        '''
+        sections = super(GurpsRuleset,
+                         self)._get_consistency_sections(creature)
+        sections['skills'] = creature.get('skills')
+        if 'current' in creature:
+            sections['current'] = sorted(creature['current'].keys())
+        if 'spells' in creature:
+            # Whether the ruleset knows the spell is part of the check, too.
+            sections['spells'] = [[spell['name'],
+                                   spell['name'] in GurpsRuleset.spells]
+                                  for spell in creature['spells']]
+        return sections
+
     def _get_missing_skill_names(self,
                                  fighter,   # Fighter object
                                  weapon     # dict: item in Fighter's equipment
@@ -4926,7 +5358,7 @@ class GurpsRuleset(ca_ruleset.Ruleset):
         that this weapon has, this method returns the name of at least one good
         skill for the fighter to have.
         '''
-        debug = ca_debug.Debug()
+        debug = ca_debug.Debug(quiet=True)
         debug.header1('_get_missing_skill_names')
         debug.print('weapon:')
         debug.pprint(weapon)
@@ -5225,13 +5657,12 @@ class GurpsRuleset(ca_ruleset.Ruleset):
 
                     # DO ANY USER-INTERFACE STUFF
 
-                    # Send the action for the second part
-
-                    # Do a deepcopy for the second part to copy the comment --
-                    # that's what gets displayed for the history command.
+                    # Send the action for the second part.  Part 2 copies
+                    # part 1 (so it has the comment -- that's what gets
+                    # displayed for the history command).
 
-                    new_action = copy.deepcopy(action)
-                    new_action['part'] = 2
+                    new_action = self._make_part_2_action(
+                            action, {'answer': answer})
                     self.do_action(fighter, new_action, fight_handler)
 
                     return None # No timers for part 1
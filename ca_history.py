@@ -0,0 +1,188 @@
+#! /usr/bin/python
+
+import copy
+
+
+class StringTable(object):
+    '''
+    Keeps one copy of each of the strings (fighter names, groups, action
+    names) that show up over and over in a fight's history so that the
+    thousands of actions in a long fight share them.
+    '''
+    def __init__(self):
+        self.__strings = {}     # string: the one copy of that string
+        self.__fighters = {}    # (name, group): the one copy of that tuple
+
+    def fighter(self,
+                name,   # string: fighter's name
+                group   # string: fighter's group
+                ):
+        '''
+        Returns the shared (name, group) tuple for a fighter.
+        '''
+        key = (name, group)
+        result = self.__fighters.get(key)
+        if result is None:
+            result = (self.intern(name), self.intern(group))
+            self.__fighters[key] = result
+        return result
+
+    def intern(self,
+               string  # string (or None)
+               ):
+        '''
+        Returns the shared copy of |string|.
+        '''
+        if string is None:
+            return None
+        return self.__strings.setdefault(string, string)
+
+
+class ActionRecord(object):
+    '''
+    One entry in a fight's history: an action (see Ruleset.do_action) or a
+    comment.  The action name and fighter are kept separately (and shared
+    through a StringTable) from the rest of the action's parameters.
+
+    Records are read like the action dicts from which they came (|in|,
+    |[]|, and |get| work with the same keys) but they're not to be modified.
+    Use |replace| to make a new record that differs from this one.
+    '''
+    __slots__ = ('name', 'fighter', 'params')
+
+    def __init__(self,
+                 name,      # string: 'action-name' or None for a comment
+                 fighter,   # (name, group) tuple or None
+                 params     # dict: the rest of the action
+                 ):
+        self.name = name
+        self.fighter = fighter
+        self.params = params
+
+    def __contains__(self, key):
+        if key == 'action-name':
+            return self.name is not None
+        if key == 'fighter':
+            return self.fighter is not None
+        return key in self.params
+
+    def __getitem__(self, key):
+        if key == 'action-name':
+            if self.name is None:
+                raise KeyError(key)
+            return self.name
+        if key == 'fighter':
+            if self.fighter is None:
+                raise KeyError(key)
+            return {'name': self.fighter[0], 'group': self.fighter[1]}
+        return self.params[key]
+
+    @staticmethod
+    def from_action(action,     # dict: {'action-name': xxx, ...} or string
+                    strings     # StringTable object
+                    ):
+        '''
+        Builds a record from an action dict.  Like the action dicts that used
+        to be kept in the history, the parameters' values are shared with
+        |action| rather than copied.
+
+        Returns: the new ActionRecord.
+        '''
+        if isinstance(action, str):
+            # Some old Game Files have bare strings for comments
+            return ActionRecord(None, None, {'comment': action})
+
+        params = {}
+        name = None
+        fighter = None
+        for key, value in action.items():
+            if key == 'action-name':
+                name = strings.intern(value)
+            elif key == 'fighter' and isinstance(value, dict):
+                fighter = strings.fighter(value['name'], value['group'])
+            else:
+                params[key] = value
+        return ActionRecord(name, fighter, params)
+
+    def get(self,
+            key,            # string: key into the action
+            default=None    # returned if |key| isn't in the action
+            ):
+        return self[key] if key in self else default
+
+    def replace(self,
+                changes     # dict: parameters to change in the new record
+                ):
+        '''
+        Makes a new record that's the same as this one except for |changes|.
+        Everything that isn't changed is shared with this record.
+
+        Returns: the new ActionRecord.
+        '''
+        params = dict(self.params)
+        name = self.name
+        for key, value in changes.items():
+            if key == 'action-name':
+                name = value
+            else:
+                params[key] = value
+        return ActionRecord(name, self.fighter, params)
+
+    def to_action(self):
+        '''
+        Returns a new action dict (in the form taken by Ruleset.do_action).
+        '''
+        action = copy.deepcopy(self.params)
+        if self.name is not None:
+            action['action-name'] = self.name
+        if self.fighter is not None:
+            action['fighter'] = {'name': self.fighter[0],
+                                 'group': self.fighter[1]}
+        return action
+
+
+class History(object):
+    '''
+    The history of a fight: a list of ActionRecord objects.  This lives in
+    the Game File (world.rawdata['current-fight']['history']).  The compact
+    records are only kept in memory; the Game File gets the plain list of
+    action dicts (see |to_actions|).
+    '''
+    def __init__(self,
+                 data=None  # list of action dicts or None for an empty
+                            #   history
+                 ):
+        self.__strings = StringTable()
+        self.__records = []
+
+        if data is not None:
+            for action in data:
+                self.append(action)
+
+    def __getitem__(self, index):
+        return self.__records[index]
+
+    def __iter__(self):
+        return iter(self.__records)
+
+    def __len__(self):
+        return len(self.__records)
+
+    def append(self,
+               action   # dict: {'action-name': xxx, ...} or ActionRecord
+               ):
+        '''
+        Adds an action to the end of the history.
+
+        Returns nothing.
+        '''
+        if not isinstance(action, ActionRecord):
+            action = ActionRecord.from_action(action, self.__strings)
+        self.__records.append(action)
+
+    def to_actions(self):
+        '''
+        Returns a list of action dicts (the form Ruleset.do_action and the
+        bug report replay take).
+        '''
+        return [record.to_action() for record in self.__records]
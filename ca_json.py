@@ -1,7 +1,12 @@
 #! /usr/bin/python
 import ca_gui
 
+import hashlib
 import json
+import os
+import pickle
+import stat
+import threading
 import traceback
 
 class BytesEncoder(json.JSONEncoder):
@@ -19,6 +24,10 @@ class BytesEncoder(json.JSONEncoder):
             if window_manager is not None:
                 window_manager.error(['Converting "%r"' % obj])
             return obj.decode('utf-8')
+        if hasattr(obj, 'to_actions'):
+            # ca_history.History keeps its compact records in memory only;
+            # the file gets the plain list of actions.
+            return obj.to_actions()
         return json.JSONEncoder.default(self, obj)
 
 class GmJson(object):
@@ -117,3 +126,376 @@ class GmJson(object):
         if write_data is not None:
             with open(self.__filename, 'w') as f:
                 json.dump(write_data, f, indent=2, cls=BytesEncoder) # , ensure_ascii=False)
+
+
+class GmJsonCache(object):
+    '''
+    A big, mostly read-only, JSON file (like gurps_info.json) whose top-level
+    sections are only read when they're asked for.
+
+    The first time the JSON file is parsed, each of its sections is pickled
+    into a cache file next to it.  After that, a section is just unpickled
+    from the cache (which is a lot faster than parsing the JSON) unless the
+    JSON file has changed.  A change is noticed by the file's modification
+    time and size and, if those don't match, by the hash of its contents.
+
+    The cache is only read if it belongs to this user and nobody else can
+    write to it (unpickling a file runs whatever's in it).
+
+    The JSON file is only written if a section has been changed (see
+    |mark_modified|).
+
+    The sections may be asked for from more than one thread (see
+    ca_validation) so everything that reads or changes the sections holds a
+    lock.
+    '''
+    CACHE_VERSION = 1
+
+    def __init__(self,
+                 filename,            # file containing the JSON to be read
+                 window_manager=None  # send error messages here
+                 ):
+        self.__filename = filename
+        self.__cache_filename = os.path.join(
+                os.path.dirname(os.path.abspath(filename)),
+                '.%s.cache' % os.path.basename(filename))
+        self.__window_manager = window_manager
+        self.__lock = threading.RLock()
+        self.found_file = None
+
+        self.__stamp = None         # (mtime, size) of the JSON file
+        self.__section_names = []   # in the order they're in the JSON file
+        self.__sections = {}        # name: data for the sections read so far
+        self.__modified = set()     # names of sections changed in memory
+        self.__cache_base = None    # where the 1st section is in the cache
+        self.__cache_offsets = {}   # name: (offset, length) in the cache
+
+        self.__open()
+
+    def get_section(self,
+                    name    # string: top-level key in the JSON file
+                    ):
+        '''
+        Reads the section (from the cache, if possible) if it hasn't already
+        been read.  Changes to the returned data are kept (see |write|).
+
+        Returns the section's data or None if there's no such section.
+        '''
+        with self.__lock:
+            if name in self.__sections:
+                return self.__sections[name]
+            if name not in self.__section_names:
+                return None
+
+            data = self.__read_cached_section(name)
+            if data is None:
+                # The cache went away out from under us.  Go to the source.
+                self.__read_json()
+                return self.__sections.get(name)
+
+            self.__sections[name] = data
+            return data
+
+    def get_section_names(self):
+        '''
+        Returns a list of the names of the top-level sections in the file.
+        '''
+        with self.__lock:
+            return list(self.__section_names)
+
+    def is_modified(self):
+        '''
+        Returns True if any section has changed since the file was read.
+        '''
+        return len(self.__modified) > 0
+
+    def mark_modified(self,
+                      name  # string: top-level key in the JSON file
+                      ):
+        '''
+        Notes that a section's data has been changed (so that |write| will
+        write it).
+
+        Returns nothing.
+        '''
+        with self.__lock:
+            if name not in self.__sections:
+                self.get_section(name)
+            if name not in self.__section_names:
+                self.__section_names.append(name)
+            self.__modified.add(name)
+
+    def refresh(self):
+        '''
+        Forgets the sections that have been read if the JSON file has
+        changed since it was read.  Nothing is forgotten if there are changes
+        that haven't been written.
+
+        Returns nothing.
+        '''
+        with self.__lock:
+            if self.is_modified():
+                return
+            try:
+                stamp = self.__get_stamp()
+            except OSError:
+                stamp = None
+            if stamp != self.__stamp:
+                self.__open()
+
+    def revert(self):
+        '''
+        Throws away any changes to the sections.  They'll be read, again,
+        when they're next asked for.
+
+        Returns nothing.
+        '''
+        with self.__lock:
+            self.__open()
+
+    def write(self):
+        '''
+        Writes the JSON file (and its cache) if any section has changed.
+
+        Returns True if the file was written, False otherwise.
+        '''
+        with self.__lock:
+            if not self.is_modified():
+                return False
+
+            write_data = {}
+            for name in self.__section_names:
+                write_data[name] = self.get_section(name)
+
+            with open(self.__filename, 'w') as f:
+                json.dump(write_data, f, indent=2, cls=BytesEncoder)
+            self.__modified = set()
+
+            try:
+                self.__stamp = self.__get_stamp()
+                sha256 = self.__hash_file()
+            except OSError:
+                return True
+            self.__write_cache(sha256,
+                               {name: pickle.dumps(data,
+                                                   pickle.HIGHEST_PROTOCOL)
+                                for name, data in write_data.items()})
+            return True
+
+    #
+    # Private methods
+    #
+
+    def __error(self,
+                error_array  # list of strings
+                ):
+        if self.__window_manager is None:
+            for message in error_array:
+                print(message)
+        else:
+            self.__window_manager.error(error_array)
+
+    def __get_stamp(self):
+        '''
+        Returns a tuple that changes whenever the JSON file does (mostly --
+        see |__hash_file|).  Raises OSError if the file's not there.
+        '''
+        stat = os.stat(self.__filename)
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def __hash_file(self):
+        '''
+        Returns the hex SHA-256 of the JSON file's contents.
+        '''
+        with open(self.__filename, 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()
+
+    def __open_cache(self):
+        '''
+        Opens the cache file for reading but only if it belongs to this user
+        and nobody else can write to it.  The file's checked after it's
+        opened so it can't be swapped out between the check and the read.
+
+        Returns the open file or None if the cache can't be used.
+        '''
+        try:
+            f = open(self.__cache_filename, 'rb')
+        except OSError:
+            return None
+        status = os.fstat(f.fileno())
+        if ((hasattr(os, 'getuid') and status.st_uid != os.getuid()) or
+                (status.st_mode & (stat.S_IWGRP | stat.S_IWOTH)) != 0):
+            f.close()
+            return None
+        return f
+
+    def __open(self):
+        '''
+        Forgets everything that's been read and gets the list of sections
+        from the cache (or, if the cache is stale, from the JSON file).
+
+        Returns nothing.
+        '''
+        self.__section_names = []
+        self.__sections = {}
+        self.__modified = set()
+        self.__cache_base = None
+        self.__cache_offsets = {}
+
+        try:
+            self.__stamp = self.__get_stamp()
+        except OSError:
+            self.found_file = False
+            self.__stamp = None
+            self.__error(['** JSON file "%s" does not exist' %
+                          self.__filename])
+            return
+        self.found_file = True
+
+        header, cache_base, pickled_sections = self.__read_cache()
+        if header is not None and header['stamp'] != self.__stamp:
+            # The file's been touched.  It may not have actually changed.
+            if header['sha256'] == self.__hash_file():
+                self.__section_names = list(header['names'])
+                self.__write_cache(header['sha256'], pickled_sections)
+                return
+            header = None
+
+        if header is None:
+            self.__read_json()
+            return
+
+        self.__section_names = list(header['names'])
+        self.__cache_offsets = header['offsets']
+        self.__cache_base = cache_base
+
+    def __read_cache(self):
+        '''
+        Reads the header of the cache file.
+
+        Returns a tuple: (header, offset of the 1st section, dict of name:
+            pickled section).  The header is None if the cache can't be
+            used.  The pickled sections are only read (and only needed) if
+            the JSON file's stamp doesn't match the one in the cache.
+        '''
+        f = self.__open_cache()
+        if f is None:
+            return None, None, None
+        try:
+            with f:
+                header = pickle.load(f)
+                cache_base = f.tell()
+                if (not isinstance(header, dict) or
+                        header.get('version') != GmJsonCache.CACHE_VERSION):
+                    return None, None, None
+                pickled_sections = None
+                if header['stamp'] != self.__stamp:
+                    pickled_sections = {}
+                    for name in header['names']:
+                        offset, length = header['offsets'][name]
+                        f.seek(cache_base + offset)
+                        pickled_sections[name] = f.read(length)
+                return header, cache_base, pickled_sections
+        except (OSError, EOFError, AttributeError, KeyError, TypeError,
+                ValueError, pickle.UnpicklingError):
+            return None, None, None
+
+    def __read_cached_section(self,
+                              name  # string: top-level key in the JSON file
+                              ):
+        '''
+        Returns the section's data from the cache or None if it can't be
+        read.
+        '''
+        if self.__cache_base is None or name not in self.__cache_offsets:
+            return None
+        offset, length = self.__cache_offsets[name]
+        f = self.__open_cache()
+        if f is None:
+            return None
+        try:
+            with f:
+                f.seek(self.__cache_base + offset)
+                return pickle.loads(f.read(length))
+        except (OSError, EOFError, ValueError, pickle.UnpicklingError):
+            return None
+
+    def __read_json(self):
+        '''
+        Parses the JSON file, keeps all of its sections (except those that
+        have already been read), and rebuilds the cache.
+
+        Returns nothing.
+        '''
+        try:
+            with open(self.__filename, 'rb') as f:
+                raw = f.read()
+            read_data = json.loads(raw.decode('utf-8'))
+        except (OSError, ValueError) as e:
+            self.__error(['* Could not read JSON file "%s"' % self.__filename,
+                          str(e)])
+            return
+
+        if not isinstance(read_data, dict):
+            self.__error(['* JSON file "%s" is not a dict' % self.__filename])
+            return
+
+        self.__section_names = list(read_data.keys())
+        for name, data in read_data.items():
+            if name not in self.__sections:
+                self.__sections[name] = data
+
+        self.__write_cache(hashlib.sha256(raw).hexdigest(),
+                           {name: pickle.dumps(data,
+                                               pickle.HIGHEST_PROTOCOL)
+                            for name, data in read_data.items()})
+
+    def __write_cache(self,
+                      sha256,           # string: hash of the JSON file
+                      pickled_sections  # dict: name: pickled section
+                      ):
+        '''
+        Writes the cache file: a pickled header followed by each pickled
+        section.  The cache is replaced all at once so that nobody sees half
+        of one.  Not being able to write the cache isn't an error; the JSON
+        file will just be parsed next time.
+
+        Returns nothing.
+        '''
+        offsets = {}
+        offset = 0
+        for name in self.__section_names:
+            length = len(pickled_sections[name])
+            offsets[name] = (offset, length)
+            offset += length
+        header = pickle.dumps({'version': GmJsonCache.CACHE_VERSION,
+                               'stamp': self.__stamp,
+                               'sha256': sha256,
+                               'names': self.__section_names,
+                               'offsets': offsets},
+                              pickle.HIGHEST_PROTOCOL)
+
+        temp_filename = '%s.%d' % (self.__cache_filename, os.getpid())
+        try:
+            if os.path.lexists(temp_filename):
+                os.remove(temp_filename)  # Left over from a crash
+            # Only this user can read or write the cache (see |__open_cache|).
+            fd = os.open(temp_filename,
+                         os.O_WRONLY | os.O_CREAT | os.O_EXCL,
+                         stat.S_IRUSR | stat.S_IWUSR)
+            with os.fdopen(fd, 'wb') as f:
+                f.write(header)
+                for name in self.__section_names:
+                    f.write(pickled_sections[name])
+            os.replace(temp_filename, self.__cache_filename)
+        except OSError:
+            try:
+                os.remove(temp_filename)
+            except OSError:
+                pass
+            self.__cache_base = None
+            self.__cache_offsets = {}
+            return
+
+        self.__cache_base = len(header)
+        self.__cache_offsets = offsets
@@ -0,0 +1,252 @@
+#! /usr/bin/python
+
+import copy
+import os
+import random
+import re
+
+import ca_json
+
+
+class CreatureFactory(object):
+    '''
+    Makes creatures from one of the templates in the Game File.  Each entry
+    in a template (and each attribute in its 'permanent' entry) looks like
+    one of these:
+
+        {'type': 'value', 'value': <anything>}  # copied into each creature
+        {'type': 'dice', 'value': '3d+2'}       # rolled for each creature
+
+    The template is worked out once so that making a bunch of creatures from
+    it is just a matter of copying values and rolling dice.  The dice for
+    all of the creatures are rolled together.
+    '''
+    # '3d', '2d+1', '1d6-2', '3d10' (the default die has 6 sides)
+    dice_re = re.compile('^ *(?P<dice>[0-9]+) *d *(?P<sides>[0-9]+)?' +
+                         ' *(?P<plus>[+-] *[0-9]+)? *$')
+
+    (VALUE, DICE, UNKNOWN) = list(range(3))
+
+    # TODO (eventually, maybe):
+    #   {'type': 'ask-string', 'value': x}
+    #   {'type': 'ask-numeric', 'value': x}
+    #   {'type': 'ask-logical', 'value': x}
+    #   {'type': 'derived', 'value': comlicated stuff -- eventually}
+
+    def __init__(self,
+                 ruleset,               # Ruleset object
+                 template,              # dict: {key: {'type': ...,
+                                        #              'value': ...}, ...}
+                 window_manager=None    # GmWindowManager object for errors
+                 ):
+        self.__ruleset = ruleset
+        self.__window_manager = window_manager
+        self.__fields = []  # (section, key, kind, value) where section is
+                            #   'permanent' or None (for the top level) and
+                            #   value is a (num_dice, sides, plus) tuple
+                            #   for DICE
+
+        for key, value in template.items():
+            if key == 'permanent':
+                for ikey, ivalue in value.items():
+                    self.__fields.append(('permanent',
+                                          ikey,
+                                          *self.__compile(ikey, ivalue)))
+            else:
+                self.__fields.append((None, key, *self.__compile(key, value)))
+
+    def make_creatures(self,
+                       count    # int: number of creatures to make
+                       ):
+        '''
+        Makes |count| creatures from the template.
+
+        Returns a list of creature dicts.
+        '''
+        rolls = {}  # index into |self.__fields|: [roll for each creature]
+        for index, (section, key, kind, value) in enumerate(self.__fields):
+            if kind == CreatureFactory.DICE:
+                num_dice, sides, plus = value
+                rolls[index] = CreatureFactory.roll_dice(num_dice,
+                                                         sides,
+                                                         plus,
+                                                         count)
+
+        creatures = []
+        for creature_index in range(count):
+            creature = self.__ruleset.make_empty_creature()
+            for index, (section, key, kind, value) in enumerate(self.__fields):
+                if kind == CreatureFactory.VALUE:
+                    value = copy.deepcopy(value)
+                elif kind == CreatureFactory.DICE:
+                    value = rolls[index][creature_index]
+                else:
+                    value = None
+
+                if section is None:
+                    creature[key] = value
+                else:
+                    creature['permanent'][key] = value
+                    creature['current'][key] = value
+            creatures.append(creature)
+        return creatures
+
+    @staticmethod
+    def roll_dice(num_dice,     # int: number of dice per roll
+                  sides,        # int: number of sides on each die
+                  plus,         # int: added to each roll
+                  count         # int: number of rolls
+                  ):
+        '''
+        Rolls the same dice |count| times.
+
+        Returns a list of the |count| results.
+        '''
+        faces = random.choices(range(1, sides + 1), k=num_dice * count)
+        return [sum(faces[start:start + num_dice]) + plus
+                for start in range(0, num_dice * count, num_dice)]
+
+    #
+    # Private methods
+    #
+
+    def __compile(self,
+                  key,              # string: name of the template entry
+                  template_value    # dict: {'type': ..., 'value': ...}
+                  ):
+        '''
+        Works out how to make a value from one entry of the template.
+
+        Returns a tuple: (kind, value) where kind is VALUE, DICE, or UNKNOWN.
+        '''
+        if template_value['type'] == 'value':
+            return CreatureFactory.VALUE, template_value['value']
+
+        if template_value['type'] == 'dice':
+            match = CreatureFactory.dice_re.match(
+                    str(template_value['value']))
+            if match is not None:
+                num_dice = int(match.group('dice'))
+                sides = (6 if match.group('sides') is None
+                         else int(match.group('sides')))
+                plus = (0 if match.group('plus') is None
+                        else int(match.group('plus').replace(' ', '')))
+                if num_dice > 0 and sides > 0:
+                    return CreatureFactory.DICE, (num_dice, sides, plus)
+
+            if self.__window_manager is not None:
+                self.__window_manager.error(
+                        ['Template entry "%s" has bad dice: "%s"' %
+                         (key, template_value['value'])])
+
+        return CreatureFactory.UNKNOWN, None
+
+
+class PersonalitySampler(object):
+    '''
+    Picks random personalities (hair, voice, manner, ...) for NPCs from the
+    tables in gm-npc-random-detail.json.  The file is read once (and again
+    only if it changes) and its tables are arranged so that picking traits
+    for a creature doesn't need to look anything up.
+
+    The file looks like this:
+
+        {'traits': {'oneline': {<line>: [[<piece>, ...], ...], ...},
+                    <trait>: [<string> or {'text': <string>,
+                                           <support>: <anything>, ...},
+                              ...],
+                    ...},
+         'support': {<support>: [<string>, ...], ...}}
+
+    Each 'oneline' entry gets one piece from each of its lists (None pieces
+    are skipped).  A trait that's a dict gets one entry from each of the
+    'support' lists that it names.
+    '''
+    DEFAULT_FILENAME = 'gm-npc-random-detail.json'
+
+    __samplers = {}  # filename: (modification time, PersonalitySampler)
+
+    def __init__(self,
+                 npc_detail  # dict: contents of gm-npc-random-detail.json
+                 ):
+        # In the order they're in the file, each table is one of:
+        #   (True, line name, [[piece, ...], ...])
+        #   (False, trait name, [(text, [(support name, [support, ...]),
+        #                                ...]),
+        #                        ...])
+        self.__tables = []
+
+        support = npc_detail.get('support', {})
+        for name, traits in npc_detail.get('traits', {}).items():
+            if name == 'oneline':
+                # These are collections of things that go on a single line
+                for line_name, line_pieces in traits.items():
+                    self.__tables.append((True, line_name, line_pieces))
+            else:
+                choices = []
+                for trait in traits:
+                    if isinstance(trait, dict):
+                        choices.append((trait['text'],
+                                        [(key, support[key]) for key in trait
+                                         if key in support]))
+                    else:
+                        choices.append((trait, []))
+                self.__tables.append((False, name, choices))
+
+    @staticmethod
+    def get(filename=None   # string: file with the trait tables
+            ):
+        '''
+        Returns the PersonalitySampler for the file (reading the file if it
+        hasn't been read or if it's changed) or None if the file can't be
+        read.
+        '''
+        if filename is None:
+            filename = PersonalitySampler.DEFAULT_FILENAME
+        try:
+            stamp = os.stat(filename).st_mtime_ns
+        except OSError:
+            return None
+
+        cached = PersonalitySampler.__samplers.get(filename)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+
+        with ca_json.GmJson(filename) as npc_detail:
+            if (npc_detail.read_data is None or
+                    'traits' not in npc_detail.read_data):
+                return None
+            sampler = PersonalitySampler(npc_detail.read_data)
+
+        PersonalitySampler.__samplers[filename] = (stamp, sampler)
+        return sampler
+
+    def get_notes(self):
+        '''
+        Picks a random personality.
+
+        Returns a list of strings ('<trait>: <description>') suitable for a
+        creature's notes.
+        '''
+        notes = []
+        for is_oneline, name, table in self.__tables:
+            if is_oneline:
+                pieces = []
+                for piece_list in table:
+                    piece = random.choice(piece_list)
+                    if piece is not None:
+                        pieces.append(piece)
+                if len(pieces) == 0:
+                    pieces.append('normal')
+                notes.append('%s: %s' % (name, ', '.join(pieces)))
+                continue
+
+            text, support_lists = random.choice(table)
+            if len(support_lists) > 0:
+                trait_array = [text]
+                for support_name, support_list in support_lists:
+                    trait_array.append('%s: %s' % (support_name,
+                                                   random.choice(support_list)))
+                text = ', '.join(trait_array)
+            notes.append('%s: %s' % (name, text))
+        return notes
@@ -0,0 +1,422 @@
+#! /usr/bin/python
+
+import argparse
+import errno
+import json
+import os
+import selectors
+import socket
+import stat
+import sys
+import threading
+import time
+
+import diff_json
+
+
+class PlayerViewServer(object):
+    '''
+    Sends what the players can see of a fight (the initiative order, who's
+    alive, unconscious, or dead, and the round) to any number of read-only
+    player views (see PlayerViewClient) over a socket on this machine.
+
+    The socket is a TCP port on localhost (if the address is a number) or a
+    Unix socket (if the address is a filename).  Each message is one line
+    of JSON:
+
+        {'type': 'state', 'sequence': <int>, 'state': <the whole state>}
+        {'type': 'patch', 'sequence': <int>, 'patch': <RFC 6902 patch>}
+
+    A new client gets the whole state and, after that, patches (see
+    diff_json.JsonPatch) to the last state it was sent.
+
+    Publishing a state is cheap for the UI thread -- it just hands over the
+    state.  The server's thread sends, at most, one message every
+    |coalesce_seconds| so a burst of GM actions becomes a single patch
+    (from the state before the burst to the state after it).  A client
+    that can't keep up is dropped.
+    '''
+    max_buffered_bytes = 1024 * 1024    # per client
+
+    def __init__(self,
+                 address,               # int: TCP port on localhost (0 picks
+                                        #   one) or string: Unix socket name
+                 coalesce_seconds=0.1   # number: minimum time between
+                                        #   messages
+                 ):
+        self.__address = address
+        self.__coalesce_seconds = coalesce_seconds
+        self.__lock = threading.Lock()
+        self.__pending = None       # newest published state, not yet sent
+        self.__state = None         # last state sent to the clients
+        self.__sequence = 0         # number of the last message sent
+        self.__last_send = 0.0      # time.monotonic() of the last message
+        self.__clients = {}         # socket: bytearray waiting to be sent
+        self.__running = True
+        self.__stats = {'published': 0,     # states handed to |publish|
+                        'sent': 0,          # messages sent (to all clients)
+                        'clients': 0,       # clients connected now
+                        'dropped': 0}       # clients too slow to keep up
+
+        if isinstance(address, str):
+            # Only clear away a socket left behind by an earlier run; never
+            # remove some other file that happens to have the name.
+            try:
+                mode = os.lstat(address).st_mode
+            except FileNotFoundError:
+                mode = None
+            if mode is not None:
+                if not stat.S_ISSOCK(mode):
+                    raise FileExistsError(errno.EEXIST,
+                                          'Exists and is not a socket',
+                                          address)
+                os.unlink(address)
+            self.__listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        else:
+            self.__listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.__listener.setsockopt(socket.SOL_SOCKET,
+                                       socket.SO_REUSEADDR,
+                                       1)
+            address = ('127.0.0.1', address)
+        try:
+            self.__listener.bind(address)
+            self.__listener.listen()
+        except OSError:
+            self.__listener.close()
+            raise
+        self.__listener.setblocking(False)
+
+        # Lets |publish| and |shutdown| wake up the server's thread.
+        self.__wake_reader, self.__wake_writer = socket.socketpair()
+        self.__wake_reader.setblocking(False)
+        self.__wake_writer.setblocking(False)
+
+        self.__selector = selectors.DefaultSelector()
+        self.__selector.register(self.__listener, selectors.EVENT_READ)
+        self.__selector.register(self.__wake_reader, selectors.EVENT_READ)
+
+        self.__thread = threading.Thread(target=self.__serve,
+                                         name='player-view',
+                                         daemon=True)
+        self.__thread.start()
+
+    def get_address(self):
+        '''
+        Returns the address that clients connect to: the TCP port (useful
+        if the server was asked for port 0) or the Unix socket name.
+        '''
+        if isinstance(self.__address, str):
+            return self.__address
+        return self.__listener.getsockname()[1]
+
+    def get_stats(self):
+        '''
+        Returns a copy of the statistics kept about the server (see
+        |__init__|).
+        '''
+        with self.__lock:
+            return dict(self.__stats)
+
+    def publish(self,
+                state   # dict: what the players can see.  It mustn't be
+                        #   changed after it's published.
+                ):
+        '''
+        Hands a new state to the server to be sent to the clients.
+
+        Returns nothing.
+        '''
+        with self.__lock:
+            self.__pending = state
+            self.__stats['published'] += 1
+        self.__wake()
+
+    def shutdown(self):
+        '''
+        Disconnects the clients and stops the server.
+
+        Returns nothing.
+        '''
+        self.__running = False
+        self.__wake()
+        self.__thread.join()
+
+        for client in list(self.__clients.keys()):
+            self.__drop(client)
+        self.__selector.close()
+        self.__listener.close()
+        self.__wake_reader.close()
+        self.__wake_writer.close()
+        if isinstance(self.__address, str) and os.path.exists(self.__address):
+            os.unlink(self.__address)
+
+    #
+    # Private methods
+    #
+
+    def __accept(self):
+        '''
+        Connects a new client and sends it the whole state.
+
+        Returns nothing.
+        '''
+        try:
+            client, ignore = self.__listener.accept()
+        except (BlockingIOError, InterruptedError):
+            return
+        client.setblocking(False)
+        self.__clients[client] = bytearray()
+        self.__selector.register(client, selectors.EVENT_READ)
+        with self.__lock:
+            self.__stats['clients'] = len(self.__clients)
+
+        if self.__state is not None:
+            self.__queue(client, PlayerViewServer.__encode(
+                    {'type': 'state',
+                     'sequence': self.__sequence,
+                     'state': self.__state}))
+
+    def __drop(self,
+               client   # socket
+               ):
+        '''
+        Disconnects a client.
+
+        Returns nothing.
+        '''
+        self.__selector.unregister(client)
+        del self.__clients[client]
+        client.close()
+        with self.__lock:
+            self.__stats['clients'] = len(self.__clients)
+
+    @staticmethod
+    def __encode(message    # dict
+                 ):
+        '''
+        Returns |message| as a line of JSON (in bytes).
+        '''
+        return (json.dumps(message, separators=(',', ':')) + '\n').encode(
+                'utf-8')
+
+    def __flush(self,
+                client  # socket
+                ):
+        '''
+        Sends as much of the client's waiting output as the socket will take.
+
+        Returns nothing.
+        '''
+        output = self.__clients[client]
+        if len(output) > 0:
+            try:
+                sent = client.send(output)
+            except (BlockingIOError, InterruptedError):
+                sent = 0
+            except OSError:
+                self.__drop(client)
+                return
+            del output[:sent]
+        events = selectors.EVENT_READ
+        if len(output) > 0:
+            events |= selectors.EVENT_WRITE
+        self.__selector.modify(client, events)
+
+    def __queue(self,
+                client,     # socket
+                data        # bytes: to be sent to the client
+                ):
+        '''
+        Sends |data| to the client (eventually).
+
+        Returns nothing.
+        '''
+        output = self.__clients[client]
+        if len(output) + len(data) > PlayerViewServer.max_buffered_bytes:
+            with self.__lock:
+                self.__stats['dropped'] += 1
+            self.__drop(client)
+            return
+        output.extend(data)
+        self.__flush(client)
+
+    def __read(self,
+               client   # socket
+               ):
+        '''
+        Throws away anything a client sends (the view is read-only) and
+        notices when the client goes away.
+
+        Returns nothing.
+        '''
+        try:
+            data = client.recv(4096)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            data = b''
+        if len(data) == 0:
+            self.__drop(client)
+
+    def __send_pending(self):
+        '''
+        Sends the newest published state to all of the clients as a patch to
+        the last state that was sent.
+
+        Returns nothing.
+        '''
+        with self.__lock:
+            state = self.__pending
+            self.__pending = None
+        self.__last_send = time.monotonic()
+        if state is None or state == self.__state:
+            return
+
+        self.__sequence += 1
+        if self.__state is None:
+            message = {'type': 'state',
+                       'sequence': self.__sequence,
+                       'state': state}
+        else:
+            message = {'type': 'patch',
+                       'sequence': self.__sequence,
+                       'patch': diff_json.JsonPatch.make(self.__state, state)}
+        self.__state = state
+
+        data = PlayerViewServer.__encode(message)
+        for client in list(self.__clients.keys()):
+            self.__queue(client, data)
+        with self.__lock:
+            self.__stats['sent'] += 1
+
+    def __serve(self):
+        '''
+        The server's thread: connects clients and sends them the states.
+
+        Returns nothing.
+        '''
+        while self.__running:
+            timeout = None
+            with self.__lock:
+                is_pending = self.__pending is not None
+            if is_pending:
+                timeout = (self.__last_send + self.__coalesce_seconds -
+                           time.monotonic())
+                if timeout <= 0:
+                    self.__send_pending()
+                    continue
+
+            for key, events in self.__selector.select(timeout):
+                if key.fileobj is self.__listener:
+                    self.__accept()
+                elif key.fileobj is self.__wake_reader:
+                    try:
+                        while self.__wake_reader.recv(4096):
+                            pass
+                    except (BlockingIOError, InterruptedError):
+                        pass
+                elif key.fileobj in self.__clients:
+                    if events & selectors.EVENT_READ:
+                        self.__read(key.fileobj)
+                    if (key.fileobj in self.__clients and
+                            events & selectors.EVENT_WRITE):
+                        self.__flush(key.fileobj)
+
+    def __wake(self):
+        '''
+        Wakes up the server's thread.
+
+        Returns nothing.
+        '''
+        try:
+            self.__wake_writer.send(b'x')
+        except (BlockingIOError, InterruptedError):
+            pass  # It's already been woken up
+
+
+class PlayerViewClient(object):
+    '''
+    Connects to a PlayerViewServer and keeps a copy of the state it sends.
+    '''
+    def __init__(self,
+                 address,       # int: TCP port on localhost or string: Unix
+                                #   socket name
+                 timeout=None   # number: seconds to wait for a message
+                 ):
+        if isinstance(address, str):
+            self.__socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        else:
+            self.__socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            address = ('127.0.0.1', address)
+        self.__socket.settimeout(timeout)
+        self.__socket.connect(address)
+        self.__file = self.__socket.makefile('r', encoding='utf-8')
+        self.sequence = None    # number of the last message read
+        self.state = None       # dict: the last state the server sent
+
+    def close(self):
+        '''
+        Disconnects from the server.
+
+        Returns nothing.
+        '''
+        self.__file.close()
+        self.__socket.close()
+
+    def read(self):
+        '''
+        Waits for the next message from the server.
+
+        Returns the new state or None if the server has gone away.
+        '''
+        line = self.__file.readline()
+        if len(line) == 0:
+            return None
+        message = json.loads(line)
+        if message['type'] == 'state':
+            self.state = message['state']
+        else:
+            self.state = diff_json.JsonPatch.apply(self.state,
+                                                   message['patch'])
+        self.sequence = message['sequence']
+        return self.state
+
+
+class MyArgumentParser(argparse.ArgumentParser):
+    '''
+    Code to add better error messages to argparse.
+    '''
+    def error(self, message):
+        sys.stderr.write('error: %s\n' % message)
+        self.print_help()
+        sys.exit(2)
+
+
+if __name__ == '__main__':
+    parser = MyArgumentParser(
+            description='Shows the players the fight that the GM is running.')
+    parser.add_argument(
+            'address',
+            help='TCP port on localhost or Unix socket name (the ' +
+                 '"player-view" option in the GM\'s Game File or prefs)')
+    ARGS = parser.parse_args()
+
+    address = int(ARGS.address) if ARGS.address.isdigit() else ARGS.address
+    client = PlayerViewClient(address)
+    while True:
+        state = client.read()
+        if state is None:
+            break
+        sys.stdout.write('\x1b[H\x1b[2J')  # Clear the screen
+        if state['round'] is None:
+            print('No fight')
+        else:
+            print('Round %d' % state['round'])
+            print('')
+            for index, fighter in enumerate(state['fighters']):
+                print('%s %-30s %s' % ('>' if index == state['current']
+                                       else ' ',
+                                       fighter['name'],
+                                       fighter['state']))
+        sys.stdout.flush()
+    client.close()
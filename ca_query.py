@@ -0,0 +1,312 @@
+#! /usr/bin/python
+
+import operator
+
+import ca_fighter
+
+
+class CreatureIndex(object):
+    '''
+    Answers questions about the creatures in the World (the PCs, the NPCs,
+    and the monsters in each fight) without looking through all of them.
+
+    For each creature, the index keeps its state, the names of the things
+    it's carrying (including the things in its containers), the names of
+    its spells, and whether it has any timers.  Those are also kept the
+    other way around (e.g., item name -> creatures carrying that item) so a
+    question only looks at the creatures that can answer it.
+
+    The index is kept up to date a little at a time:
+
+      * a creature is indexed again after it's changed (see |mark_changed|
+        which should be called whenever a Fighter's |mark_changed| is), and
+      * before each question, every entry in each group is checked (one
+        pointer comparison per creature) for creatures that have been
+        added, removed, or replaced by another with the same name.
+    '''
+    comparisons = {'<': operator.lt,
+                   '<=': operator.le,
+                   '==': operator.eq,
+                   '!=': operator.ne,
+                   '>=': operator.ge,
+                   '>': operator.gt}
+
+    state_numbers = dict(ca_fighter.Fighter.conscious_map)
+    state_numbers['injured'] = ca_fighter.Fighter.INJURED
+
+    def __init__(self,
+                 get_groups,    # function: returns {group name: {creature
+                                #   name: entry in the Game File, ...}, ...}
+                 get_details    # function(name, group): returns the
+                                #   creature's rawdata (following redirects)
+                                #   or None
+                 ):
+        self.__get_groups = get_groups
+        self.__get_details = get_details
+
+        self.__groups = {}      # group: {name: entry in the Game File}
+                                #   (a copy of the group, Venue and all)
+        self.__creatures = {}   # (group, name): {'rawdata': dict,
+                                #                 'state': int,
+                                #                 'items': frozenset,
+                                #                 'spells': frozenset,
+                                #                 'timers': bool}
+        self.__keys_by_rawdata = {}  # id(rawdata): set of (group, name)
+        self.__changed = set()  # id(rawdata) of creatures to index again
+
+        # The index turned around
+        self.__by_state = {}    # state number: set of (group, name)
+        self.__by_item = {}     # item name: set of (group, name)
+        self.__by_spell = {}    # spell name: set of (group, name)
+        self.__with_timers = set()  # (group, name)
+
+        self.__stats = {'queries': 0,
+                        'indexed': 0}   # number of times a creature was
+                                        #   (re)indexed
+
+    def find(self,
+             groups=None,       # list of strings: the creature is in one of
+                                #   these groups ('PCs', 'NPCs', or a fight)
+             states=None,       # list of strings: the creature is in one of
+                                #   these states ('alive', 'injured',
+                                #   'unconscious', 'dead', 'Absent',
+                                #   'fight')
+             attributes=None,   # list of (attribute, comparison, value):
+                                #   the creature's current attribute
+                                #   compares with the value.  The
+                                #   comparison is '<', '<=', '==', '!=',
+                                #   '>=', or '>'
+             item=None,         # string: the creature has an item with this
+                                #   name (maybe in a container)
+             spell=None,        # string: the creature knows this spell
+             has_timers=None    # bool: the creature does (True) or doesn't
+                                #   (False) have timers
+             ):
+        '''
+        Finds the creatures that match all of the things asked for (things
+        that are None don't matter).  The room (the Venue) of a fight isn't
+        a creature.
+
+        Returns a list of (group, name) of the matching creatures, the PCs
+        first, then the NPCs, then each fight's monsters.  Each group is
+        sorted by name.
+        '''
+        self.__stats['queries'] += 1
+        self.__refresh()
+
+        candidates = []  # list of sets, each a restriction of the answer
+        if groups is not None:
+            candidates.append({(group, name)
+                               for group in groups
+                               for name in self.__groups.get(group, {})
+                               if (group, name) in self.__creatures})
+        if states is not None:
+            found = set()
+            for state in states:
+                found.update(self.__by_state.get(
+                        CreatureIndex.state_numbers.get(state), ()))
+            candidates.append(found)
+        if item is not None:
+            candidates.append(self.__by_item.get(item, set()))
+        if spell is not None:
+            candidates.append(self.__by_spell.get(spell, set()))
+        if has_timers:
+            candidates.append(self.__with_timers)
+
+        if len(candidates) == 0:
+            result = set(self.__creatures.keys())
+        else:
+            candidates.sort(key=len)
+            result = set(candidates[0])
+            for candidate in candidates[1:]:
+                result &= candidate
+
+        if has_timers is not None and not has_timers:
+            result -= self.__with_timers
+
+        if attributes is not None:
+            result = {key for key in result
+                      if self.__has_attributes(self.__creatures[key]['rawdata'],
+                                               attributes)}
+
+        group_order = {group: index
+                       for index, group in enumerate(self.__groups.keys())}
+        return sorted(result, key=lambda key: (group_order[key[0]], key[1]))
+
+    def get_stats(self):
+        '''
+        Returns a copy of the statistics kept about the index: the number of
+        questions asked and the number of times a creature was indexed.
+        '''
+        return dict(self.__stats)
+
+    def mark_changed(self,
+                     rawdata    # dict: a creature's data that's changed
+                     ):
+        '''
+        Tells the index that a creature's data has changed so that it'll be
+        indexed again before the next question.  Call this from a
+        ThingsInFight change listener.
+
+        Returns nothing.
+        '''
+        # Something the index doesn't know about (a creature that's just
+        # been added, say) is found by |__refresh|.
+        if id(rawdata) in self.__keys_by_rawdata:
+            self.__changed.add(id(rawdata))
+
+    #
+    # Private methods
+    #
+
+    def __add(self,
+              key   # (group, name)
+              ):
+        '''
+        Indexes one creature.
+
+        Returns nothing.
+        '''
+        group, name = key
+        rawdata = self.__get_details(name, group)
+        if rawdata is None or not isinstance(rawdata, dict):
+            return
+
+        creature = {
+            'rawdata': rawdata,
+            'state': (ca_fighter.Fighter.get_fighter_state(rawdata)
+                      if 'state' in rawdata and 'current' in rawdata
+                      else None),
+            'items': frozenset(CreatureIndex.__get_item_names(
+                    rawdata.get('stuff', []))),
+            'spells': frozenset(spell['name']
+                                for spell in rawdata.get('spells', [])
+                                if isinstance(spell, dict) and
+                                'name' in spell),
+            'timers': len(rawdata.get('timers', [])) > 0,
+        }
+        self.__creatures[key] = creature
+        self.__keys_by_rawdata.setdefault(id(rawdata), set()).add(key)
+
+        self.__by_state.setdefault(creature['state'], set()).add(key)
+        for item_name in creature['items']:
+            self.__by_item.setdefault(item_name, set()).add(key)
+        for spell_name in creature['spells']:
+            self.__by_spell.setdefault(spell_name, set()).add(key)
+        if creature['timers']:
+            self.__with_timers.add(key)
+        self.__stats['indexed'] += 1
+
+    @staticmethod
+    def __discard(index,    # dict: value: set of (group, name)
+                  value,    # key into |index|
+                  key       # (group, name) to take out
+                  ):
+        '''
+        Takes a creature out of one of the turned-around indexes.
+
+        Returns nothing.
+        '''
+        keys = index.get(value)
+        if keys is None:
+            return
+        keys.discard(key)
+        if len(keys) == 0:
+            del index[value]
+
+    @staticmethod
+    def __get_item_names(stuff  # list of item dicts
+                         ):
+        '''
+        Returns a list of the names of the items in |stuff| and in all of
+        the containers in |stuff|.
+        '''
+        names = []
+        containers = [stuff]
+        while len(containers) > 0:
+            for item in containers.pop():
+                if 'name' in item:
+                    names.append(item['name'])
+                if 'stuff' in item:
+                    containers.append(item['stuff'])
+        return names
+
+    @staticmethod
+    def __has_attributes(rawdata,   # dict: a creature's data
+                         attributes # list of (attribute, comparison, value)
+                         ):
+        '''
+        Returns True if all of the creature's current attributes compare
+        correctly with the values, False otherwise.
+        '''
+        current = rawdata.get('current', {})
+        for attribute, comparison, value in attributes:
+            if attribute not in current:
+                return False
+            if not CreatureIndex.comparisons[comparison](current[attribute],
+                                                         value):
+                return False
+        return True
+
+    def __refresh(self):
+        '''
+        Brings the index up to date: indexes creatures that have been added
+        or changed and forgets those that have been removed.
+
+        Returns nothing.
+        '''
+        groups = self.__get_groups()
+
+        for group in list(self.__groups.keys()):
+            if group not in groups:
+                for name in self.__groups.pop(group):
+                    self.__remove((group, name))
+
+        for group, entries in groups.items():
+            known = self.__groups.get(group, {})
+            for name in known:
+                if name not in entries or entries[name] is not known[name]:
+                    # Anything that pointed at the old data (through a
+                    # redirect) is indexed again, too.
+                    creature = self.__creatures.get((group, name))
+                    if creature is not None:
+                        self.__changed.add(id(creature['rawdata']))
+                    self.__remove((group, name))
+            for name, entry in entries.items():
+                if name == ca_fighter.Venue.name:
+                    continue
+                if name not in known or entry is not known[name]:
+                    self.__add((group, name))
+            self.__groups[group] = dict(entries)
+
+        changed = self.__changed
+        self.__changed = set()
+        for rawdata_id in changed:
+            for key in list(self.__keys_by_rawdata.get(rawdata_id, ())):
+                self.__remove(key)
+                self.__add(key)
+
+    def __remove(self,
+                 key    # (group, name)
+                 ):
+        '''
+        Takes one creature out of the index.
+
+        Returns nothing.
+        '''
+        creature = self.__creatures.pop(key, None)
+        if creature is None:
+            return
+
+        keys = self.__keys_by_rawdata.get(id(creature['rawdata']))
+        if keys is not None:
+            keys.discard(key)
+            if len(keys) == 0:
+                del self.__keys_by_rawdata[id(creature['rawdata'])]
+
+        self.__discard(self.__by_state, creature['state'], key)
+        for item_name in creature['items']:
+            self.__discard(self.__by_item, item_name, key)
+        for spell_name in creature['spells']:
+            self.__discard(self.__by_spell, spell_name, key)
+        self.__with_timers.discard(key)
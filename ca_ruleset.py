@@ -3,6 +3,8 @@
 import copy
 import curses
 import datetime
+import hashlib
+import json
 import pprint
 import random
 
@@ -51,6 +53,10 @@ class Ruleset(object):
         self.options = None
         self.active_actions = []
 
+        # Number of problems found (errors reported or questions asked) by
+        # |check_creature_consistent|.  The caller resets this.
+        self.consistency_problems = 0
+
         self._timing_file = None
         self._char_being_timed = None
 
@@ -116,8 +122,22 @@ class Ruleset(object):
         #PP = pprint.PrettyPrinter(indent=3, width=150)
         #PP.pprint(action)
 
-        handled = self._perform_action(fighter, action, fight_handler, logit)
-        self._record_action(fighter, action, fight_handler, handled, logit)
+        # Everything the action changes can be undone (see ca_undo).
+        undo_stack = (None if fight_handler is None else
+                      fight_handler.get_undo_stack())
+        if undo_stack is not None:
+            undo_stack.begin()
+        try:
+            handled = self._perform_action(fighter, action, fight_handler,
+                                           logit)
+            self._record_action(fighter, action, fight_handler, handled,
+                                logit)
+            fighter.mark_changed()
+        finally:
+            if undo_stack is not None:
+                undo_stack.end('%s: %s' % (
+                    fighter.name,
+                    action.get('action-name', action.get('comment'))))
 
     def do_save_on_exit(self):
         '''
@@ -454,6 +474,52 @@ class Ruleset(object):
 
         return  # No need to return action menu since it was a parameter
 
+    def get_consistency_hash(self,
+                             creature   # dict from Game File
+                             ):
+        '''
+        Builds a hash of the parts of a creature that
+        |check_creature_consistent| looks at.  If the hash hasn't changed
+        since the creature passed the check, it'll pass again.
+
+        Returns: the hash as a string
+        '''
+        sections = self._get_consistency_sections(creature)
+        string = json.dumps(sections, sort_keys=True)
+        return hashlib.sha1(string.encode('utf-8')).hexdigest()
+
+    def get_consistency_problems(self,
+                                 name,     # string: creature's name
+                                 creature  # dict from Game File
+                                 ):
+        '''
+        Finds the problems that |check_creature_consistent| complains about
+        without fixing them, asking the user anything, or using the window
+        manager so that it can be run away from the UI (see
+        ca_validation.ValidationService).  Building the Fighter may add
+        missing sections to |creature| so hand this a copy of any data that
+        someone else might be using.
+
+        Returns: list of problems, each of which is a list of single-line
+        strings (like the ones handed to GmWindowManager.error).
+        '''
+        problems = []
+
+        # Don't need to check if the room is consistent.
+        if name == ca_fighter.Venue.name:
+            return problems
+
+        fighter = ca_fighter.Fighter(name,
+                                     'dummy group',  # unused
+                                     creature,
+                                     self,
+                                     None)
+        problems.extend(self.__get_armor_weapons_problems(fighter,
+                                                          is_armor=True))
+        problems.extend(self.__get_armor_weapons_problems(fighter,
+                                                          is_armor=False))
+        return problems
+
     def get_import_creature_file_extension(self):
         return None # No restriction on filename
 
@@ -842,6 +908,17 @@ class Ruleset(object):
         fighter.rawdata['current']['hp'] += action['adj']
         return Ruleset.HANDLED_OK
 
+    def _consistency_error(self,
+                           strings  # array of single-line strings
+                           ):
+        '''
+        Reports a problem found while checking a creature's consistency.
+
+        Returns nothing.
+        '''
+        self.consistency_problems += 1
+        self._window_manager.error(strings)
+
     def __close_container(self,
                         fighter,          # Fighter object
                         action,           # {'action-name': 'close-container',
@@ -899,7 +976,7 @@ class Ruleset(object):
 
         for index, item in zip(index_list, item_list):
             if item is None:
-                self._window_manager.error([
+                self._consistency_error([
                     'Creature "%s"' % fighter.name,
                     '  is using a weird %s "<None>". Fixing.' % item_string])
                 self.do_action(fighter,
@@ -911,7 +988,7 @@ class Ruleset(object):
             elif ((is_armor and 'armor' not in item['type']) or
                     (not is_armor and
                         not ca_equipment.Weapon.is_weapon(item))):
-                self._window_manager.error([
+                self._consistency_error([
                     ('Creature "%s"' % fighter.name),
                     ('  is using a weird %s "%s". Fixing.' %
                         (item_string, item['name']))
@@ -934,7 +1011,7 @@ class Ruleset(object):
 
         for index, item in zip(preferred_index_list, preferred_item_list):
             if item is None:
-                self._window_manager.error([
+                self._consistency_error([
                     'Creature "%s"' % fighter.name,
                     '  is preferring a weird %s "<None>". Fixing.' %
                     item_string])
@@ -943,7 +1020,7 @@ class Ruleset(object):
             elif ((is_armor and 'armor' not in item['type']) or
                     (not is_armor and
                         not ca_equipment.Weapon.is_weapon(item))):
-                self._window_manager.error([
+                self._consistency_error([
                     ('Creature "%s"' % fighter.name),
                     ('  is preferring a weird %s "%s". Fixing.' %
                         (item_string, item['name']))
@@ -972,7 +1049,7 @@ class Ruleset(object):
             elif owned_item_count == 1:
                 fighter.rawdata[preferred_index] = [item_index]
             else: # owns more than one piece of armor
-                self._window_manager.error([
+                self._consistency_error([
                     'Creature "%s" has no preferred %s' %
                     (fighter.name, item_string)])
 
@@ -1020,6 +1097,7 @@ class Ruleset(object):
                             ('quit', Ruleset.STOP_CHECKING)))
                 title = 'Stop using %s\'s non-preferred %s?' % (fighter.name,
                                                                  item_string)
+                self.consistency_problems += 1
                 item_index, ignore = self._window_manager.menu(title,
                                                                item_list_menu)
                 if item_index is None:
@@ -1089,6 +1167,7 @@ class Ruleset(object):
                         (('quit checking ALL creatures (1 time)'),
                             ('quit', Ruleset.STOP_CHECKING)))
 
+                self.consistency_problems += 1
                 preferred_item_index, ignore = self._window_manager.menu(
                         'Use %s\'s preferred %s?' % (fighter.name,
                                                      item_string),
@@ -1114,8 +1193,8 @@ class Ruleset(object):
         if result == Ruleset.KEEP_CHECKING_CONSISTENCY and not is_armor:
             for weapon in fighter.rawdata['stuff']:
                 missing_ammo = self._get_missing_ammo_names(fighter, weapon)
-                if len(missing_ammo) > 1:
-                    self._window_manager.error([
+                if len(missing_ammo) > 0:
+                    self._consistency_error([
                         '"%s"' % fighter.name,
                         '  is carrying a weapon (%s) with no ammo (%s).' % (
                             weapon['name'], missing_ammo[0])])
@@ -1234,18 +1313,13 @@ class Ruleset(object):
                                                             width,
                                                             title)
 
-            # Send the action for the second part
-
-            # Do a deepcopy for the second part to copy the comment --
-            # that's what gets displayed for the history command.
-
-            new_action = copy.deepcopy(action)
-            new_action['part'] = 2
-
-            if 'comment' in new_action:
-                new_action['comment'] = '%s -- ' % action['comment']
-            new_action['comment'] += comment_string
+            # Send the action for the second part.  It carries the comment
+            # since that's what gets displayed for the history command.
 
+            comment = ('' if 'comment' not in action else
+                       '%s -- ' % action['comment'])
+            new_action = self._make_part_2_action(
+                    action, {'comment': comment + comment_string})
             self.do_action(fighter, new_action, fight_handler)
 
             return Ruleset.DONT_LOG
@@ -1541,6 +1615,22 @@ class Ruleset(object):
         return Ruleset.HANDLED_OK
 
 
+    def _get_consistency_sections(self,
+                                  creature   # dict from Game File
+                                  ):
+        '''
+        Returns: dict containing the parts of |creature| on which
+        |check_creature_consistent| depends.
+        '''
+        sections = {'keys': sorted(creature.keys())}
+        for key in ['stuff',
+                    'armor-index',
+                    'weapon-index',
+                    'preferred-armor-index',
+                    'preferred-weapon-index']:
+            sections[key] = creature.get(key)
+        return sections
+
     def _get_missing_ammo_names(self,
                                 fighter,   # Fighter object
                                 weapon     # dict: item in Fighter's equipment
@@ -1574,6 +1664,71 @@ class Ruleset(object):
         return missing_ammo
 
 
+    def __get_armor_weapons_problems(self,
+                                     fighter,      # Fighter object
+                                     is_armor=True # If False, check weapons
+                                     ):
+        '''
+        The read-only version of |__configure_armor_weapons|.
+
+        Returns: list of problems (see |get_consistency_problems|).
+        '''
+        problems = []
+        if is_armor:
+            index_list = fighter.get_current_armor_indexes()
+            preferred_index = 'preferred-armor-index'
+            item_string = 'armor'
+        else:
+            index_list = fighter.get_current_weapon_indexes()
+            preferred_index = 'preferred-weapon-index'
+            item_string = 'weapon'
+
+        def is_right_kind(item):
+            if is_armor:
+                return 'armor' in item['type']
+            return ca_equipment.Weapon.is_weapon(item)
+
+        for item_index in index_list:
+            item = fighter.equipment.get_item_by_index(item_index)
+            if item is None or not is_right_kind(item):
+                problems.append([
+                    'Creature "%s"' % fighter.name,
+                    '  is using a weird %s "%s".' % (
+                        item_string,
+                        '<None>' if item is None else item['name'])])
+
+        preferred_index_list = (fighter.rawdata[preferred_index]
+                                if preferred_index in fighter.rawdata else [])
+        for item_index in preferred_index_list:
+            item = fighter.equipment.get_item_by_index(item_index)
+            if item is None or not is_right_kind(item):
+                problems.append([
+                    'Creature "%s"' % fighter.name,
+                    '  is preferring a weird %s "%s".' % (
+                        item_string,
+                        '<None>' if item is None else item['name'])])
+
+        if len(preferred_index_list) == 0:
+            owned_item_count = 0
+            for item in fighter.rawdata['stuff']:
+                if ((is_armor and ca_equipment.Equipment.is_armor(item)) or
+                        (not is_armor and ca_equipment.Weapon.is_weapon(item))):
+                    owned_item_count += 1
+            if owned_item_count > 1:
+                problems.append([
+                    'Creature "%s" has no preferred %s' % (fighter.name,
+                                                           item_string)])
+
+        if not is_armor:
+            for weapon in fighter.rawdata['stuff']:
+                missing_ammo = self._get_missing_ammo_names(fighter, weapon)
+                if len(missing_ammo) > 0:
+                    problems.append([
+                        '"%s"' % fighter.name,
+                        '  is carrying a weapon (%s) with no ammo (%s).' % (
+                            weapon['name'], missing_ammo[0])])
+        return problems
+
     def __give_equipment(self,
                          fighter,          # Fighter object
                          action,           # {'action-name': 'end-turn',
@@ -1689,6 +1844,26 @@ class Ruleset(object):
         fighter.holster_weapon_by_index(action['weapon-index'])
         return Ruleset.HANDLED_OK
 
+    def _make_part_2_action(self,
+                            action,         # dict: part 1 of the action
+                            changes=None    # dict: what's different in part 2
+                            ):
+        '''
+        Builds the 2nd part of a 2-part action: a new dict with everything
+        from part 1 plus |changes| and 'part': 2.  Only the values that can
+        be modified (dicts and lists) are deep-copied; the strings and
+        numbers are shared with part 1.  |changes| isn't copied.
+
+        Returns: the part 2 action (a dict).
+        '''
+        part_2 = {key: (copy.deepcopy(value)
+                        if isinstance(value, (dict, list)) else value)
+                  for key, value in action.items()}
+        if changes is not None:
+            part_2.update(changes)
+        part_2['part'] = 2
+        return part_2
+
     def __move_to_container(
             self,
             fighter,          # Fighter object
@@ -1789,10 +1964,12 @@ class Ruleset(object):
             'open-container':       {'doit': self.__open_container},
             'pick-opponent':        {'doit': self.__pick_opponent},
             'previous-turn':        {'doit': self.__previous_turn},
+            'redo':                 {'doit': self.__redo},
             'reload':               {'doit': self.__do_reload},
             'set-consciousness':    {'doit': self.__set_consciousness},
             'set-timer':            {'doit': self.__set_timer},
             'start-turn':           {'doit': self.__start_turn},
+            'undo':                 {'doit': self.__undo},
             'use-item':             {'doit': self.__use_item},
             'user-defined':         {'doit': self.__do_custom_action},
             'hold-init':            {'doit': self.__hold_init},
@@ -1895,6 +2072,28 @@ class Ruleset(object):
 
         return
 
+    def __redo(self,
+               ignored_fighter,  # Fighter object - ignored
+               action,           # {'action-name': 'redo',
+                                 #  'comment': <string> # optional
+               fight_handler,    # FightHandler object
+               ):
+        '''
+        Action handler for Ruleset.
+
+        Redoes the last action that was undone (see |__undo|).
+
+        Returns: DONT_LOG since the action is put in the history here (it's
+        not to be added to the fighter's actions for the turn).
+        '''
+        undo_stack = (None if fight_handler is None else
+                      fight_handler.get_undo_stack())
+        if undo_stack is None or undo_stack.redo() is None:
+            self._window_manager.error(['There is nothing to redo'])
+            return Ruleset.DONT_LOG
+        fight_handler.add_to_history(action)
+        return Ruleset.DONT_LOG
+
     def __set_consciousness(self,
                             fighter,          # Fighter object
                             action,           # {'action-name':
@@ -2006,6 +2205,31 @@ class Ruleset(object):
 
         return Ruleset.HANDLED_OK
 
+    def __undo(self,
+               ignored_fighter,  # Fighter object - ignored
+               action,           # {'action-name': 'undo',
+                                 #  'comment': <string> # optional
+               fight_handler,    # FightHandler object
+               ):
+        '''
+        Action handler for Ruleset.
+
+        Puts the fight back the way it was before the last action (see
+        ca_undo.UndoStack).  This is in the history (so that it's replayed
+        with the rest of the fight) but the action it undoes stays there,
+        too.
+
+        Returns: DONT_LOG since the action is put in the history here (it's
+        not to be added to the fighter's actions for the turn).
+        '''
+        undo_stack = (None if fight_handler is None else
+                      fight_handler.get_undo_stack())
+        if undo_stack is None or undo_stack.undo() is None:
+            self._window_manager.error(['There is nothing to undo'])
+            return Ruleset.DONT_LOG
+        fight_handler.add_to_history(action)
+        return Ruleset.DONT_LOG
+
     def __use_item(self,
                    fighter,          # Fighter object
                    action,           # {'action-name': 'use-item',
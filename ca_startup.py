@@ -0,0 +1,197 @@
+#! /usr/bin/python
+
+import builtins
+import contextlib
+import sys
+import time
+
+
+class StartupProfile(object):
+    '''
+    Keeps track of how long each module takes to import and how long each
+    part of the program takes to get going (see |timing|) so that we can
+    tell what makes the program slow to start.  Nothing is recorded unless
+    the profile has been started.
+
+    Import times include the time to import everything the module imports
+    (like 'python -X importtime' calls 'cumulative').
+    '''
+    def __init__(self):
+        self.__entries = []         # {'kind': 'import' | 'init',
+                                    #  'name': <string>,
+                                    #  'depth': <int>,
+                                    #  'seconds': <float>}
+        self.__depth = 0            # how deeply nested the current entry is
+        self.__start_time = None    # time.perf_counter() at |start|
+        self.__stop_time = None     # time.perf_counter() at |stop|
+        self.__original_import = None
+
+    def get_report_lines(self):
+        '''
+        Returns a list of strings that describe the profile, one line per
+        import or initialization step, indented by how deeply it's nested.
+        '''
+        lines = ['%8.1f ms  total' % (self.get_total_seconds() * 1000.0)]
+        for entry in self.__entries:
+            seconds = entry['seconds']
+            lines.append('%8s ms  %s%s %s' % (
+                    '?' if seconds is None else '%.1f' % (seconds * 1000.0),
+                    '  ' * entry['depth'],
+                    entry['kind'],
+                    entry['name']))
+        return lines
+
+    def get_total_seconds(self):
+        '''
+        Returns the number of seconds the profile has been (or was) running.
+        '''
+        if self.__start_time is None:
+            return 0.0
+        stop_time = (time.perf_counter() if self.__stop_time is None else
+                     self.__stop_time)
+        return stop_time - self.__start_time
+
+    def is_running(self):
+        '''
+        Returns True if the profile is recording, False otherwise.
+        '''
+        return self.__start_time is not None and self.__stop_time is None
+
+    def start(self):
+        '''
+        Starts recording.  Has to be called before the modules of interest
+        are imported.
+
+        Returns nothing.
+        '''
+        if self.is_running():
+            return
+        self.__entries = []
+        self.__depth = 0
+        self.__start_time = time.perf_counter()
+        self.__stop_time = None
+        self.__original_import = builtins.__import__
+        builtins.__import__ = self.__import
+
+    def stop(self):
+        '''
+        Stops recording (what's been recorded is kept).
+
+        Returns nothing.
+        '''
+        if not self.is_running():
+            return
+        builtins.__import__ = self.__original_import
+        self.__original_import = None
+        self.__stop_time = time.perf_counter()
+
+    @contextlib.contextmanager
+    def timing(self,
+               name     # string: what's being timed
+               ):
+        '''
+        Context manager that records how long its body takes as a step in
+        the program's initialization.  Does nothing if the profile isn't
+        running.
+        '''
+        if not self.is_running():
+            yield
+            return
+        entry = self.__begin('init', name)
+        try:
+            yield
+        finally:
+            self.__end(entry)
+
+    def to_dict(self):
+        '''
+        Returns the profile in a form that can be written as JSON.
+        '''
+        return {'total_seconds': self.get_total_seconds(),
+                'entries': [dict(entry) for entry in self.__entries]}
+
+    #
+    # Private methods
+    #
+
+    def __begin(self,
+                kind,   # string: 'import' or 'init'
+                name    # string: module or initialization step
+                ):
+        '''
+        Adds an entry to the profile.  The entry goes in before anything
+        nested inside of it.
+
+        Returns: the (unfinished) entry.
+        '''
+        entry = {'kind': kind,
+                 'name': name,
+                 'depth': self.__depth,
+                 'seconds': None,
+                 'start': time.perf_counter()}
+        self.__entries.append(entry)
+        self.__depth += 1
+        return entry
+
+    def __end(self,
+              entry     # dict: from |__begin|
+              ):
+        '''
+        Finishes an entry.
+
+        Returns nothing.
+        '''
+        self.__depth -= 1
+        entry['seconds'] = time.perf_counter() - entry.pop('start')
+
+    def __import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        '''
+        Stands in for builtins.__import__ while the profile is running.
+        Only times the first (i.e., the real) import of a module.
+        '''
+        if level != 0 or name in sys.modules:
+            return self.__original_import(name, globals, locals, fromlist,
+                                          level)
+        entry = self.__begin('import', name)
+        try:
+            return self.__original_import(name, globals, locals, fromlist,
+                                          level)
+        finally:
+            self.__end(entry)
+
+
+class LazyModule(object):
+    '''
+    Stands in for a module that's not needed every time the program runs
+    (like the GURPS Character Sheet importer).  The module is imported the
+    first time one of its attributes is used.
+    '''
+    def __init__(self,
+                 name   # string: name of the module
+                 ):
+        self.__name = name
+        self.__module = None
+
+    def __getattr__(self, attribute):
+        return getattr(self.get_module(), attribute)
+
+    def get_module(self):
+        '''
+        Imports the module if that hasn't already been done.
+
+        Returns the module.
+        '''
+        if self.__module is None:
+            __import__(self.__name)
+            self.__module = sys.modules[self.__name]
+        return self.__module
+
+    def is_loaded(self):
+        '''
+        Returns True if the module has been imported (by anybody).
+        '''
+        return self.__module is not None or self.__name in sys.modules
+
+
+# There's only one startup
+profile = StartupProfile()
@@ -2,6 +2,8 @@
 
 import copy
 import curses
+import math
+
 import ca_debug
 
 # TODO (eventually):
@@ -29,8 +31,10 @@ class Timer(object):
         self.rawdata = rawdata  # This needs to actually be from the Game File
         self.__complete_me()
 
-    def decrement(self):
-        self.rawdata['rounds'] -= 1
+    def decrement(self,
+                  rounds=1  # number of rounds that have passed
+                  ):
+        self.rawdata['rounds'] -= rounds
 
     def fire(self,
              owner,          # ThingsInFight object to receive timer action
@@ -315,7 +319,8 @@ class TimersWidget(object):
         '''
         title = 'Enter the Announcement'
         height = 1
-        width = (curses.COLS - 4) - Timer.len_timer_leader
+        lines, cols = self.__window_manager.getmaxyx()
+        width = (cols - 4) - Timer.len_timer_leader
         announcement = self.__window_manager.input_box(height, width, title)
         if announcement is not None and len(announcement) <= 0:
             announcement = None
@@ -338,7 +343,8 @@ class TimersWidget(object):
         '''
         title = 'Enter the Continuous Message'
         height = 1
-        width = (curses.COLS - 4) - Timer.len_timer_leader
+        lines, cols = self.__window_manager.getmaxyx()
+        width = (cols - 4) - Timer.len_timer_leader
         string = self.__window_manager.input_box(height, width, title)
         if string is not None and len(string) <= 0:
             string = None
@@ -382,11 +388,175 @@ class TimersWidget(object):
     #    return True
 
 
+class TimerWheel(object):
+    '''
+    Hierarchical timer wheel that schedules things by the round (the 'tick')
+    on which they expire.  Adding, removing, and advancing the wheel by one
+    round are all O(1) (well, advancing is O(number of things that expire)).
+
+    Things that expire within the next SLOTS rounds live in the near wheel:
+    slot (tick % SLOTS).  Everything farther out is parked in the far wheel
+    by revolution (tick // SLOTS) and cascades into the near wheel when the
+    near wheel comes around to that revolution.
+    '''
+    SLOTS = 64
+
+    def __init__(self):
+        self.__now = 0
+        self.__near = [[] for i in range(TimerWheel.SLOTS)]
+        self.__far = {} # revolution: [thing, thing, ...]
+        self.__ticks = {} # id(thing): tick on which |thing| expires
+        self.__expired = [] # things whose tick has come (oldest first)
+
+    def add(self,
+            thing,  # Anything.  It's kept until it's removed.
+            rounds  # number: rounds until |thing| expires
+            ):
+        '''
+        Schedules |thing| to expire after |rounds| more calls to |advance|.
+        Something with 2.9 rounds expires on the same round as something
+        with 3 rounds; something with 0 (or fewer) rounds is already expired.
+
+        Returns nothing.
+        '''
+        tick = self.__now + max(0, int(math.ceil(rounds)))
+        self.__ticks[id(thing)] = tick
+        if tick <= self.__now:
+            self.__expired.append(thing)
+        elif tick - self.__now < TimerWheel.SLOTS:
+            self.__near[tick % TimerWheel.SLOTS].append(thing)
+        else:
+            revolution = tick // TimerWheel.SLOTS
+            if revolution not in self.__far:
+                self.__far[revolution] = []
+            self.__far[revolution].append(thing)
+
+    def advance(self,
+                rounds=1    # int: number of rounds to move forward
+                ):
+        '''
+        Moves the wheel forward by |rounds| rounds.  Skipping ahead is cheap
+        when there's nothing on the wheel.
+
+        Returns nothing.
+        '''
+        if len(self.__ticks) == 0:
+            self.__now += rounds
+            self.__far = {} # only things that have been removed
+            return
+
+        for i in range(rounds):
+            self.__now += 1
+            if self.__now % TimerWheel.SLOTS == 0:
+                # Cascade this revolution's things from the far wheel.
+                revolution = self.__now // TimerWheel.SLOTS
+                if revolution in self.__far:
+                    for thing in self.__far.pop(revolution):
+                        if id(thing) in self.__ticks:
+                            tick = self.__ticks[id(thing)]
+                            self.__near[tick % TimerWheel.SLOTS].append(thing)
+
+            slot = self.__now % TimerWheel.SLOTS
+            if len(self.__near[slot]) > 0:
+                for thing in self.__near[slot]:
+                    if self.__ticks.get(id(thing)) == self.__now:
+                        self.__expired.append(thing)
+                self.__near[slot] = []
+
+    def clear(self):
+        ''' Removes everything from the wheel.  '''
+        self.__near = [[] for i in range(TimerWheel.SLOTS)]
+        self.__far = {}
+        self.__ticks = {}
+        self.__expired = []
+
+    def get_expired(self):
+        '''
+        Returns the list of things that have expired (and haven't yet been
+        removed).  Don't modify the list.
+        '''
+        return self.__expired
+
+    def remove(self,
+               thing    # something that was added to the wheel
+               ):
+        '''
+        Removes |thing| from the wheel.  Things that haven't expired are just
+        forgotten (the wheel skips them when their slot comes around) so this
+        is O(1) for them.
+
+        Returns nothing.
+        '''
+        tick = self.__ticks.pop(id(thing), None)
+        if tick is not None and tick <= self.__now:
+            self.__expired = [x for x in self.__expired if x is not thing]
+
+
+class TimerClock(object):
+    '''
+    The fight-wide count of the rounds that have gone by for the timers of
+    each creature.  Timers that use a clock (see |Timers.set_clock|) don't
+    touch their timers as the rounds go by: the timer wheel decides when a
+    timer expires and the clock just counts.  The rounds are subtracted from
+    the timers' 'rounds' (see |Timers.update_rounds|) only when somebody
+    looks at the timers or when the Game File is about to be written (see
+    |update_all|).  None of this is kept in the Game File.
+    '''
+    def __init__(self):
+        self.__elapsed = {}  # Timers object: rounds not yet subtracted
+
+    def add_rounds(self,
+                   timers,  # Timers object
+                   rounds   # int: number of rounds that have passed
+                   ):
+        '''
+        Counts rounds that have passed for |timers|.
+
+        Returns nothing.
+        '''
+        self.__elapsed[timers] = self.__elapsed.get(timers, 0) + rounds
+
+    def pop_rounds(self,
+                   timers   # Timers object
+                   ):
+        '''
+        Forgets the rounds counted for |timers|.
+
+        Returns the number of rounds that were counted.
+        '''
+        return self.__elapsed.pop(timers, 0)
+
+    def update_all(self):
+        '''
+        Subtracts the rounds that have been counted from all of the timers
+        (so the Game File data is up to date).
+
+        Returns nothing.
+        '''
+        for timers in list(self.__elapsed.keys()):
+            timers.update_rounds()
+
+
 class Timers(object):
     '''
     Keeps a list of timers.  There are two parallel lists: 'data' keeps the
     actual data (it's a pointer to the spot in the Game File where the ultimate
     data is stored) while 'obj' keeps Timer objects.
+
+    The timers are also scheduled on a TimerWheel so that finding the timers
+    that have expired doesn't require looking at every timer, and indexed so
+    that |is_busy| and |found_timer_string| don't have to look at every timer,
+    either.
+
+    The wheel is what decides when a timer expires so, with a TimerClock,
+    counting down the rounds doesn't touch the timers at all.  The 'rounds'
+    in the timers' data are brought up to date, all at once, when somebody
+    looks at them (the timers are displayed, a timer fires, or a timer is
+    added).  Without a clock, the timers are counted down as the rounds go
+    by.  Anything else that reads the timers' data straight out of the Game
+    File (to write it or to copy it for another thread, say) has to bring
+    the rounds up to date first (see TimerClock.update_all and
+    World.update_timer_rounds).
     '''
     def __init__(self,
                  timer_details,  # List from Game File containing timers
@@ -404,10 +574,15 @@ class Timers(object):
                              'obj': []}
 
         self.__owner = owner
+        self.__wheel = TimerWheel()
+        self.__clock = None     # TimerClock object (see |set_clock|)
+        self.__busy_count = 0   # number of timers marking the owner as busy
+        self.__strings = {}     # timer 'string': number of timers with it
 
         for timer_data in timer_details:
             timer_obj = Timer(timer_data)
             self.__timers['obj'].append(timer_obj)
+            self.__index(timer_obj)
 
         self.__window_manager = window_manager
 
@@ -415,12 +590,16 @@ class Timers(object):
             timer   # Timer object
             ):
         '''
-        Adds a timer to this list's timers.
+        Adds a timer to this list's timers.  NOTE: mark the timer busy (see
+        |Timer.mark_owner_as_busy|) _before_ adding it.
 
         Returns the timer right back, again.
         '''
+        self.update_rounds()  # The new timer's rounds are from right now
         self.__timers['data'].append(timer.rawdata)
         self.__timers['obj'].append(timer)
+        self.__index(timer)
+        self.__owner.mark_changed()
         return timer
 
     def clear_all(self):
@@ -431,28 +610,48 @@ class Timers(object):
         while len(self.__timers['data']) > 0:
             self.__timers['data'].pop()
         self.__timers['obj'] = []
+        self.__wheel.clear()
+        if self.__clock is not None:
+            self.__clock.pop_rounds(self)
+        self.__busy_count = 0
+        self.__strings = {}
 
         while len(self.__just_fired['data']) > 0:
             self.__just_fired['data'].pop()
         self.__just_fired['obj'] = []
+        self.__owner.mark_changed()
 
-    def decrement_all(self):
-        ''' Decrements all timers. '''
-        for timer_obj in self.__timers['obj']:
-            timer_obj.decrement()
+    def decrement_all(self,
+                      rounds=1  # int: number of rounds that have passed
+                      ):
+        '''
+        Counts down all timers by |rounds|.  The timer wheel decides which
+        timers have expired.  With a clock, the rounds are just counted and
+        the timers' 'rounds' are brought up to date by |update_rounds|.
+
+        Returns nothing.
+        '''
+        self.__wheel.advance(rounds)
+        if len(self.__timers['obj']) == 0:
+            return
+        if self.__clock is None:
+            for timer_obj in self.__timers['obj']:
+                timer_obj.decrement(rounds)
+        else:
+            self.__clock.add_rounds(self, rounds)
 
     def found_timer_string(self,
                            string
                            ):
         '''Returns 'True' if a current timer has string matching parameter.'''
-        for timer_obj in self.__timers['obj']:
-            if ('string' in timer_obj.rawdata and
-                    timer_obj.rawdata['string' ] == string):
-                return True
-        return False
+        return Timers.__string_key(string) in self.__strings
 
     def get_all(self):
-        ''' Returns a complete list of this list's Timer objects.  '''
+        '''
+        Returns a complete list of this list's Timer objects (with their
+        'rounds' up to date).
+        '''
+        self.update_rounds()
         return self.__timers['obj']
 
     def get_just_fired(self):
@@ -461,10 +660,7 @@ class Timers(object):
 
     def is_busy(self):
         '''Returns 'True' if a current timer has the owner marked as busy.'''
-        for timer_obj in self.__timers['obj']:
-            if timer_obj.rawdata['busy']:
-                return True
-        return False
+        return self.__busy_count > 0
 
     def fire_expired_timers(self,
                             when # FIRE_ROUND_START or FIRE_ROUND_END
@@ -477,15 +673,20 @@ class Timers(object):
         Returns nothing.
         '''
         self.show_all() # TODO (now): remove
-        fire_and_remove_these = []
-        for index, timer in enumerate(self.__timers['obj']):
-            if timer.rawdata['rounds'] <= 0:
-                if timer.rawdata['fire_when'] == when:
-                    fire_and_remove_these.insert(0, index)  # largest indexes last
-
-        for index in fire_and_remove_these:
-            self.__fire_timer(self.__timers['obj'][index])
-            self.remove_timer_by_index(index, when)
+        fire_these = [timer for timer in self.__wheel.get_expired()
+                      if timer.rawdata['fire_when'] == when]
+
+        if len(fire_these) > 0:
+            self.update_rounds()
+            # Fire them in the same order as always: largest index first.
+            firing = set([id(timer) for timer in fire_these])
+            fire_these = [timer for timer in self.__timers['obj']
+                          if id(timer) in firing]
+            fire_these.reverse()
+            for timer in fire_these:
+                self.__fire_timer(timer)
+            self.__remove_timers(fire_these, when)
+            self.__owner.mark_changed()
 
         # Remove all of the timers that were fired at the beginning of the
         # round.  We were saving them in case they were spells or something
@@ -495,9 +696,36 @@ class Timers(object):
                 self.__just_fired['data'].pop()
                 self.__just_fired['obj'].pop()
 
+    def rebuild(self):
+        '''
+        Throws away the Timer objects, the timer wheel, and the indexes and
+        builds them again from the timers' data.  Use this when the data has
+        been changed out from under this object (by undoing an action, for
+        example -- see ca_undo.UndoStack).  The data's 'rounds' must already
+        be up to date (see |update_rounds|).
+
+        Returns nothing.
+        '''
+        if self.__clock is not None:
+            self.__clock.pop_rounds(self)
+        self.__timers['obj'] = []
+        self.__wheel.clear()
+        self.__busy_count = 0
+        self.__strings = {}
+        for timer_data in self.__timers['data']:
+            timer_obj = Timer(timer_data)
+            self.__timers['obj'].append(timer_obj)
+            self.__index(timer_obj)
+
+        while len(self.__just_fired['data']) > 0:
+            self.__just_fired['data'].pop()
+        self.__just_fired['obj'] = []
+
     def remove_timer_by_index(self,
-                              index,  # Index of the timer to be removed
-                              when    # FIRE_ROUND_START or FIRE_ROUND_END
+                              index,    # Index of the timer to be removed
+                              when=None # FIRE_ROUND_START, FIRE_ROUND_END,
+                                        #   or None if the timer's just being
+                                        #   canceled
                               ):
         '''
         Removes a timer from the timer list.
@@ -506,6 +734,8 @@ class Timers(object):
         '''
         timer_data = self.__timers['data'].pop(index)
         timer_obj = self.__timers['obj'].pop(index)
+        self.__unindex(timer_obj)
+        self.__owner.mark_changed()
 
         # Save any timer deleted earlier this round in case the user would
         # want to access it.  We'll delete them all at the end of the round.
@@ -513,6 +743,33 @@ class Timers(object):
             self.__just_fired['data'].append(timer_data)
             self.__just_fired['obj'].append(timer_obj)
 
+    def set_clock(self,
+                  clock     # TimerClock object
+                  ):
+        '''
+        Has |clock| count the rounds for these timers rather than counting
+        each timer down as the rounds go by.
+
+        Returns nothing.
+        '''
+        self.update_rounds()
+        self.__clock = clock
+
+    def update_rounds(self):
+        '''
+        Subtracts the rounds that the clock has counted (see TimerClock) from
+        each of the timers.
+
+        Returns nothing.
+        '''
+        if self.__clock is None:
+            return
+        elapsed = self.__clock.pop_rounds(self)
+        if elapsed == 0:
+            return
+        for timer_obj in self.__timers['obj']:
+            timer_obj.decrement(elapsed)
+
     def show_all(self):
         ''' Displays all timers.  '''
         debug = ca_debug.Debug(quiet=True)
@@ -541,3 +798,71 @@ class Timers(object):
         new_timer = timer.fire(self.__owner, self.__window_manager)
         if new_timer is not None:
             self.add(Timer(new_timer))
+
+    def __index(self,
+                timer   # Timer object
+                ):
+        '''
+        Puts |timer| on the timer wheel and adds it to the busy count and the
+        string index.
+        '''
+        self.__wheel.add(timer, timer.rawdata['rounds'])
+        if timer.rawdata['busy']:
+            self.__busy_count += 1
+        if 'string' in timer.rawdata:
+            key = Timers.__string_key(timer.rawdata['string'])
+            self.__strings[key] = self.__strings.get(key, 0) + 1
+
+    def __remove_timers(self,
+                        timers, # list of Timer objects in the order they
+                                #   should be added to |__just_fired|
+                        when    # FIRE_ROUND_START or FIRE_ROUND_END
+                        ):
+        '''
+        Removes a bunch of timers from the timer list in a single pass.
+
+        Returns nothing.
+        '''
+        removing = set([id(timer) for timer in timers])
+        keep_data = []
+        keep_obj = []
+        for timer_data, timer_obj in zip(self.__timers['data'],
+                                         self.__timers['obj']):
+            if id(timer_obj) not in removing:
+                keep_data.append(timer_data)
+                keep_obj.append(timer_obj)
+
+        # Modify the data list in place since it belongs to the Game File.
+        self.__timers['data'][:] = keep_data
+        self.__timers['obj'] = keep_obj
+
+        for timer in timers:
+            self.__unindex(timer)
+
+            # Save any timer deleted earlier this round in case the user
+            # would want to access it.  We'll delete them all at the end of
+            # the round.
+            if when == Timer.FIRE_ROUND_START:
+                self.__just_fired['data'].append(timer.rawdata)
+                self.__just_fired['obj'].append(timer)
+
+    @staticmethod
+    def __string_key(string  # string or list of strings from a timer
+                     ):
+        return tuple(string) if isinstance(string, list) else string
+
+    def __unindex(self,
+                  timer   # Timer object
+                  ):
+        '''
+        Undoes |__index|.
+        '''
+        self.__wheel.remove(timer)
+        if timer.rawdata['busy']:
+            self.__busy_count -= 1
+        if 'string' in timer.rawdata:
+            key = Timers.__string_key(timer.rawdata['string'])
+            if key in self.__strings:
+                self.__strings[key] -= 1
+                if self.__strings[key] <= 0:
+                    del self.__strings[key]
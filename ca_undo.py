@@ -0,0 +1,285 @@
+#! /usr/bin/python
+
+import copy
+
+
+class UndoStack(object):
+    '''
+    Undo and redo for the actions in a fight (see Ruleset.do_action).
+
+    The stack keeps a private copy (the 'shadow') of the data it watches.
+    When an action finishes, the watched data is compared with the shadow
+    and only the pieces that differ are kept: for each one, where it is and
+    its value before and after the action.  Undoing the action puts back the
+    'before' values and redoing it puts back the 'after' values.
+
+    Recording an action costs time in proportion to the size of the fight:
+    every watched root is compared with its shadow at the start and at the
+    end of each action.  The comparison skips anything that's the same
+    (dict and list equality are fast) so it only walks down into the parts
+    that changed.  Dicts and lists are changed in place rather than replaced
+    so that anything that refers to them (like a Fighter's Equipment) still
+    sees the right data.
+
+    Changes made between actions (by the GM editing a fighter, say) aren't
+    recorded.  The recorded changes may not fit the data after that (an
+    item could have moved in a list, say) so both stacks are emptied.
+    '''
+    class Missing(object):
+        ''' Marks a dict entry that doesn't exist. '''
+        def __repr__(self):
+            return '<missing>'
+
+    MISSING = Missing()
+
+    def __init__(self,
+                 get_roots,         # function: returns a dict of
+                                    #   {root key: dict} of the data to watch
+                 ignore_keys=(),    # keys to skip at the top of each root
+                 limit=100,         # int: maximum number of actions to keep
+                 after_apply=None   # function: called with the set of root
+                                    #   keys that an undo or redo changed so
+                                    #   that anything built from that data
+                                    #   can be rebuilt
+                 ):
+        self.__get_roots = get_roots
+        self.__after_apply = after_apply
+        self.__ignore_keys = set(ignore_keys)
+        self.__limit = limit
+        self.__shadow = {}  # root key: copy of the root (without the
+                            #   ignored keys)
+        self.__undo = []    # [(label, [change, ...]), ...] oldest first
+        self.__redo = []    # same as |__undo|, the next to redo is last
+        self.__depth = 0    # how many actions deep we are (actions can do
+                            #   other actions)
+
+        self.__sync()
+
+    def begin(self):
+        '''
+        Marks the beginning of an action.  Actions that happen inside of
+        another action are part of the outer one.
+
+        Returns nothing.
+        '''
+        if self.__depth == 0:
+            self.__sync_outside_action()
+        self.__depth += 1
+
+    def can_redo(self):
+        ''' Returns True if there's an undone action to redo.  '''
+        return len(self.__redo) > 0
+
+    def can_undo(self):
+        ''' Returns True if there's an action to undo.  '''
+        return len(self.__undo) > 0
+
+    def end(self,
+            label   # string: describes the action (for the user)
+            ):
+        '''
+        Marks the end of an action and, at the end of the outermost action,
+        records what it changed.  An action that changes something can't be
+        redone after a new action.
+
+        Returns nothing.
+        '''
+        self.__depth -= 1
+        if self.__depth > 0:
+            return
+        changes = self.__sync()
+        if len(changes) == 0:
+            return
+        self.__undo.append((label, changes))
+        if len(self.__undo) > self.__limit:
+            del self.__undo[0]
+        self.__redo = []
+
+    def get_labels(self):
+        '''
+        Returns a tuple: (list of the labels of the actions that can be
+        undone, list of the labels of the actions that can be redone).  The
+        next one to be undone (or redone) is last in each list.
+        '''
+        return ([label for label, changes in self.__undo],
+                [label for label, changes in self.__redo])
+
+    def redo(self):
+        '''
+        Redoes the last undone action.
+
+        Returns the label of the action or None if there was nothing to
+        redo.
+        '''
+        self.__sync_outside_action()
+        if len(self.__redo) == 0:
+            return None
+        label, changes = self.__redo.pop()
+        for change in changes:
+            self.__apply(change, after=True)
+        self.__undo.append((label, changes))
+        self.__call_after_apply(changes)
+        return label
+
+    def undo(self):
+        '''
+        Undoes the last action.
+
+        Returns the label of the action or None if there was nothing to
+        undo.
+        '''
+        self.__sync_outside_action()
+        if len(self.__undo) == 0:
+            return None
+        label, changes = self.__undo.pop()
+        for change in reversed(changes):
+            self.__apply(change, after=False)
+        self.__redo.append((label, changes))
+        self.__call_after_apply(changes)
+        return label
+
+    #
+    # Private methods
+    #
+
+    def __apply(self,
+                change,     # tuple: (root key, path, key, before, after)
+                after       # bool: True to put back |after|, False for
+                            #   |before|
+                ):
+        '''
+        Puts one changed piece of the data (and its shadow) back to its
+        value before or after the action.
+
+        Returns nothing.
+        '''
+        root_key, path, key, before, after_value = change
+        value = after_value if after else before
+        roots = self.__get_roots()
+        if root_key not in roots:
+            return  # The creature's gone
+        for container in (roots[root_key], self.__shadow[root_key]):
+            for step in path:
+                container = container[step]
+            if value is UndoStack.MISSING:
+                del container[key]
+            else:
+                container[key] = copy.deepcopy(value)
+
+    def __call_after_apply(self,
+                           changes  # list: the changes that were just put
+                                    #   back (see |__apply|)
+                           ):
+        '''
+        Tells the |after_apply| function (see the constructor) which roots
+        were changed by an undo or redo.
+
+        Returns nothing.
+        '''
+        if self.__after_apply is None:
+            return
+        self.__after_apply(set([change[0] for change in changes]))
+
+    def __diff(self,
+               root_key,    # key of the root being compared
+               path,        # tuple: keys from the root to |old| and |new|
+               old,         # dict or list from the shadow
+               new,         # matching dict or list from the watched data
+               changes      # list: changes are added here
+               ):
+        '''
+        Finds what's different between |new| and |old|, changing |old| to
+        match |new| as it goes.
+
+        Returns nothing.
+        '''
+        if isinstance(old, dict):
+            for key in list(old.keys()):
+                if path == () and key in self.__ignore_keys:
+                    continue
+                if key not in new:
+                    changes.append((root_key, path, key, old.pop(key),
+                                    UndoStack.MISSING))
+                else:
+                    self.__diff_value(root_key, path, key, old, new, changes)
+            for key in new:
+                if path == () and key in self.__ignore_keys:
+                    continue
+                if key not in old:
+                    old[key] = copy.deepcopy(new[key])
+                    changes.append((root_key, path, key, UndoStack.MISSING,
+                                    copy.deepcopy(new[key])))
+            return
+
+        common = min(len(old), len(new))
+        for index in range(common):
+            self.__diff_value(root_key, path, index, old, new, changes)
+        if len(old) != len(new):
+            tail = slice(common, None)
+            before = old[tail]
+            old[tail] = copy.deepcopy(new[tail])
+            changes.append((root_key, path, tail, before,
+                            copy.deepcopy(new[tail])))
+
+    def __diff_value(self,
+                     root_key,  # key of the root being compared
+                     path,      # tuple: keys from the root to the containers
+                     key,       # dict key or list index
+                     old,       # dict or list: container from the shadow
+                     new,       # dict or list: container being watched
+                     changes    # list: changes are added here
+                     ):
+        '''
+        Compares one entry of a dict or list with its shadow (see |__diff|).
+
+        Returns nothing.
+        '''
+        old_value = old[key]
+        new_value = new[key]
+        if type(old_value) is type(new_value) and old_value == new_value:
+            return
+        if ((isinstance(old_value, dict) and isinstance(new_value, dict)) or
+                (isinstance(old_value, list) and
+                 isinstance(new_value, list))):
+            self.__diff(root_key, path + (key,), old_value, new_value,
+                        changes)
+            return
+        old[key] = copy.deepcopy(new_value)
+        changes.append((root_key, path, key, old_value,
+                        copy.deepcopy(new_value)))
+
+    def __sync(self):
+        '''
+        Brings the shadow up to date with the watched data.
+
+        Returns the list of changes: (root key, path, key, before, after).
+        '''
+        changes = []
+        roots = self.__get_roots()
+        for root_key in list(self.__shadow.keys()):
+            if root_key not in roots:
+                del self.__shadow[root_key]
+        for root_key, root in roots.items():
+            if root_key not in self.__shadow:
+                self.__shadow[root_key] = {
+                        key: copy.deepcopy(value)
+                        for key, value in root.items()
+                        if key not in self.__ignore_keys}
+                continue
+            shadow = self.__shadow[root_key]
+            if len(shadow) == len(root) and shadow == root:
+                continue  # Nothing changed (and nothing's ignored)
+            self.__diff(root_key, (), shadow, root, changes)
+        return changes
+
+    def __sync_outside_action(self):
+        '''
+        Brings the shadow up to date with changes made outside of an action.
+        If there were any, the recorded actions are forgotten (see the class
+        description).
+
+        Returns nothing.
+        '''
+        if len(self.__sync()) > 0:
+            self.__undo = []
+            self.__redo = []
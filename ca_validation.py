@@ -0,0 +1,207 @@
+#! /usr/bin/python
+
+import concurrent.futures
+import pickle
+import queue
+import threading
+
+import ca_fighter
+import ca_npc
+
+
+class ValidationResult(object):
+    '''
+    The problems found with one creature (see
+    Ruleset.get_consistency_problems).
+    '''
+    def __init__(self,
+                 group,     # string: 'PCs', 'NPCs', 'templates: <name>', or
+                            #   a monster group
+                 name,      # string: creature's name
+                 problems   # list of problems, each of which is a list of
+                            #   single-line strings
+                 ):
+        self.group = group
+        self.name = name
+        self.problems = problems
+
+
+class ValidationService(object):
+    '''
+    Checks the creatures in the Game File for consistency in a pool of
+    worker threads so that nobody has to wait for it.  A ValidationResult
+    for each creature is posted to a queue that the UI empties whenever it
+    wants.
+
+    The creatures are pickled when they're submitted and each worker
+    unpickles its own copy, so the workers never see the UI changing the
+    data out from under them.  Pickling is a lot quicker than copying and
+    |check_world| pickles each group just once.
+
+    This only uses the read-only, curses-free part of the ruleset
+    (Ruleset.get_consistency_problems).  Each worker thread builds its own
+    Ruleset so the workers don't share the UI's ruleset or its caches (the
+    sections of gurps_info.json are shared but ca_json.GmJsonCache guards
+    them).  Fixing the problems is still up to
+    Ruleset.check_creature_consistent on the UI thread.
+    '''
+    def __init__(self,
+                 ruleset,           # Ruleset object
+                 max_workers=None   # int: size of the worker pool (None lets
+                                    #   concurrent.futures decide)
+                 ):
+        self.__ruleset = ruleset
+        self.__worker = threading.local()   # 'ruleset': the worker thread's
+                                            #   own Ruleset object
+        self.__results = queue.Queue()  # ValidationResult objects
+        self.__executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=max_workers,
+                thread_name_prefix='validation')
+        self.__lock = threading.Lock()
+        self.__pending = 0  # creatures submitted but not yet checked
+
+    def check_creature(self,
+                       group,       # string: see ValidationResult
+                       name,        # string: creature's name
+                       creature     # dict from the Game File
+                       ):
+        '''
+        Queues a copy of |creature| to be checked.  The 'rounds' of the
+        creature's timers need to be up to date (see
+        World.update_timer_rounds).
+
+        Returns nothing.
+        '''
+        self.__submit([(group, name, creature, False)])
+
+    def check_world(self,
+                    world   # World object
+                    ):
+        '''
+        Queues every PC, NPC, template, and monster in every fight to be
+        checked.
+
+        Returns: the number of creatures queued.
+        '''
+        world.update_timer_rounds()  # The timers' data is copied, below
+        count = 0
+        for group in ['PCs', 'NPCs']:
+            creatures = world.get_creature_details_list(group)
+            if creatures is None:
+                continue
+            count += self.__submit([(group, name, creature, False)
+                                    for name, creature in creatures.items()])
+
+        if 'templates' in world.rawdata:
+            templates = world.rawdata['templates']
+            for template_group, template_list in templates.items():
+                count += self.__submit(
+                        [('templates: %s' % template_group, name, template,
+                          True)
+                         for name, template in template_list.items()])
+
+        for group in world.get_fights():
+            creatures = world.get_creature_details_list(group)
+            if creatures is None:
+                continue
+            count += self.__submit([(group, name, creature, False)
+                                    for name, creature in creatures.items()
+                                    if name != ca_fighter.Venue.name])
+
+        return count
+
+    def get_results(self,
+                    only_problems=True  # bool: skip creatures that are OK
+                    ):
+        '''
+        Empties the result queue without waiting.
+
+        Returns: list of ValidationResult objects.
+        '''
+        results = []
+        while True:
+            try:
+                result = self.__results.get_nowait()
+            except queue.Empty:
+                break
+            if not only_problems or len(result.problems) > 0:
+                results.append(result)
+        return results
+
+    def is_done(self):
+        '''
+        Returns True if every creature that was submitted has been checked.
+        '''
+        with self.__lock:
+            return self.__pending == 0
+
+    def shutdown(self,
+                 wait=True  # bool: wait for the queued checks to finish
+                 ):
+        '''
+        Stops the worker pool.  Checks that haven't started are dropped if
+        |wait| is False.
+
+        Returns nothing.
+        '''
+        self.__executor.shutdown(wait=wait, cancel_futures=not wait)
+
+    #
+    # Private methods
+    #
+
+    def __check(self,
+                snapshot    # bytes: pickled list of (group, name, creature
+                            #   or template, bool: is it a template)
+                ):
+        '''
+        Runs in a worker thread.  Checks the creatures in a snapshot and
+        posts a result for each.
+
+        Returns nothing.
+        '''
+        ruleset = self.__get_worker_ruleset()
+        for group, name, creature, is_template in pickle.loads(snapshot):
+            try:
+                if is_template:
+                    # Build a creature the way PersonnelHandler does when
+                    # the user makes one from the template.
+                    factory = ca_npc.CreatureFactory(ruleset, creature)
+                    creature = factory.make_creatures(1)[0]
+                problems = ruleset.get_consistency_problems(name, creature)
+            except Exception as e:
+                problems = [['Creature "%s"' % name,
+                             '  could not be checked: %r' % e]]
+            self.__results.put(ValidationResult(group, name, problems))
+            with self.__lock:
+                self.__pending -= 1
+
+    def __get_worker_ruleset(self):
+        '''
+        Returns the worker thread's own Ruleset, building it the first time
+        the thread needs it.
+        '''
+        ruleset = getattr(self.__worker, 'ruleset', None)
+        if ruleset is None:
+            ruleset = type(self.__ruleset)(None)
+            ruleset.set_options(self.__ruleset.options)
+            self.__worker.ruleset = ruleset
+        return ruleset
+
+    def __submit(self,
+                 entries    # list of (group, name, creature or template,
+                            #   bool: is it a template)
+                 ):
+        '''
+        Pickles the creatures (the only time the UI thread touches them) and
+        queues them to be checked, together, by one worker.
+
+        Returns: the number of creatures queued.
+        '''
+        if len(entries) == 0:
+            return 0
+        snapshot = pickle.dumps(entries, pickle.HIGHEST_PROTOCOL)
+        with self.__lock:
+            self.__pending += len(entries)
+        self.__executor.submit(self.__check, snapshot)
+        return len(entries)
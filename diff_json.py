@@ -1,11 +1,13 @@
 #! /usr/bin/python
 import argparse
+import copy
 import json
 import pprint
 import sys
 import traceback
 
 import ca_debug
+import ca_json
 
 
 class GmJson(object):
@@ -123,6 +125,9 @@ class DiffJson(object):
                   rhs,
                   path  # string describing stack of containers that got us here
                   ):
+        if type(lhs) is type(rhs) and lhs == rhs:
+            return True  # Skips identical dicts and lists all at once
+
         debug = ca_debug.Debug(screen=True)
         if isinstance(lhs, dict):
             if not isinstance(rhs, dict):
@@ -228,6 +233,195 @@ class DiffJson(object):
                 return True
 
 
+class JsonPatch(object):
+    '''
+    Makes and applies RFC 6902 (JSON Patch) patches: lists of operations
+    like these that, applied in order, turn one JSON object into another.
+
+        {'op': 'add', 'path': '/PCs/Moe/notes/-', 'value': 'new note'}
+        {'op': 'remove', 'path': '/fights/horsemen'}
+        {'op': 'replace', 'path': '/PCs/Moe/current/hp', 'value': 3}
+
+    Paths are RFC 6901 JSON Pointers ('/' between keys with '~' written as
+    '~0' and '/' written as '~1').
+
+    Only the parts that differ are walked: identical dicts and lists are
+    skipped with a single comparison (which runs in C and stops at the
+    first difference) so a patch between two big Game Files that differ
+    in a few places is quick to make.  Lists are matched up from the front
+    and the back so that adding or removing a few entries (in the middle of
+    a long history, say) makes a patch of just those entries.
+
+    Since the comparison is Python's, values that Python thinks are equal
+    (1, 1.0, and True) inside dicts and lists are treated as the same.
+    '''
+    @staticmethod
+    def apply(data,     # dict, list, or value: JSON object to be patched
+              patch     # list of dict: operations (see |make|)
+              ):
+        '''
+        Applies |patch| to |data|.  Dicts and lists in |data| are changed in
+        place.
+
+        Returns the patched JSON object (which is |data| unless the patch
+        replaces the whole thing).
+        '''
+        for operation in patch:
+            op = operation['op']
+            keys = JsonPatch.__split_path(operation['path'])
+            value = copy.deepcopy(operation.get('value'))
+
+            if len(keys) == 0:
+                if op not in ('add', 'replace'):
+                    raise ValueError('Can\'t "%s" the whole JSON object' % op)
+                data = value
+                continue
+
+            container = data
+            for key in keys[:-1]:
+                container = container[JsonPatch.__index(container, key)]
+            key = keys[-1]
+
+            if op == 'add':
+                if isinstance(container, list):
+                    if key == '-':
+                        container.append(value)
+                    else:
+                        container.insert(JsonPatch.__index(container, key),
+                                         value)
+                else:
+                    container[key] = value
+            elif op == 'remove':
+                del container[JsonPatch.__index(container, key)]
+            elif op == 'replace':
+                index = JsonPatch.__index(container, key)
+                if isinstance(container, dict) and index not in container:
+                    raise KeyError(operation['path'])
+                container[index] = value
+            else:
+                raise ValueError('Unknown JSON patch op "%s"' % op)
+
+        return data
+
+    @staticmethod
+    def make(lhs,   # dict, list, or value: JSON object before
+             rhs    # dict, list, or value: JSON object after
+             ):
+        '''
+        Finds the differences between two JSON objects.
+
+        Returns a list of operations that turns |lhs| into |rhs| (see
+        |apply|).  The values in the patch are shared with |rhs|.
+        '''
+        patch = []
+        JsonPatch.__diff('', lhs, rhs, patch)
+        return patch
+
+    #
+    # Private methods
+    #
+
+    @staticmethod
+    def __diff(path,    # string: JSON Pointer to |lhs| and |rhs|
+               lhs,     # dict, list, or value: before
+               rhs,     # dict, list, or value: after
+               patch    # list: operations are added here
+               ):
+        '''
+        Adds the operations that turn |lhs| into |rhs| to |patch|.
+
+        Returns nothing.
+        '''
+        if type(lhs) is type(rhs) and lhs == rhs:
+            return
+
+        if isinstance(lhs, dict) and isinstance(rhs, dict):
+            for key in lhs:
+                if key not in rhs:
+                    patch.append({'op': 'remove',
+                                  'path': JsonPatch.__join(path, key)})
+            for key, value in rhs.items():
+                if key in lhs:
+                    JsonPatch.__diff(JsonPatch.__join(path, key),
+                                     lhs[key],
+                                     value,
+                                     patch)
+                else:
+                    patch.append({'op': 'add',
+                                  'path': JsonPatch.__join(path, key),
+                                  'value': value})
+            return
+
+        if isinstance(lhs, list) and isinstance(rhs, list):
+            # Skip the matching entries at the front and the back.
+            shortest = min(len(lhs), len(rhs))
+            front = 0
+            while (front < shortest and type(lhs[front]) is type(rhs[front])
+                   and lhs[front] == rhs[front]):
+                front += 1
+            back = 0
+            while (back < shortest - front and
+                   type(lhs[-1 - back]) is type(rhs[-1 - back]) and
+                   lhs[-1 - back] == rhs[-1 - back]):
+                back += 1
+
+            lhs_end = len(lhs) - back
+            rhs_end = len(rhs) - back
+            common = min(lhs_end, rhs_end) - front
+            for offset in range(common):
+                index = front + offset
+                JsonPatch.__diff(JsonPatch.__join(path, index),
+                                 lhs[index],
+                                 rhs[index],
+                                 patch)
+
+            index = front + common
+            for ignore in range(lhs_end - index):
+                patch.append({'op': 'remove',
+                              'path': JsonPatch.__join(path, index)})
+            for rhs_index in range(index, rhs_end):
+                patch.append({'op': 'add',
+                              'path': JsonPatch.__join(
+                                    path, '-' if back == 0 else rhs_index),
+                              'value': rhs[rhs_index]})
+            return
+
+        patch.append({'op': 'replace', 'path': path, 'value': rhs})
+
+    @staticmethod
+    def __index(container,  # dict or list
+                key         # string: one piece of a JSON Pointer
+                ):
+        '''
+        Returns the key (for a dict) or the int index (for a list) named by
+        one piece of a JSON Pointer.
+        '''
+        return int(key) if isinstance(container, list) else key
+
+    @staticmethod
+    def __join(path,    # string: JSON Pointer
+               key      # string or int: dict key or list index to add
+               ):
+        '''
+        Returns the JSON Pointer |path| with |key| added to the end.
+        '''
+        return '%s/%s' % (path,
+                          str(key).replace('~', '~0').replace('/', '~1'))
+
+    @staticmethod
+    def __split_path(path   # string: JSON Pointer
+                     ):
+        '''
+        Returns the list of (unescaped, string) keys in a JSON Pointer.
+        '''
+        if path == '':
+            return []
+        if not path.startswith('/'):
+            raise ValueError('Bad JSON Pointer "%s"' % path)
+        return [key.replace('~1', '/').replace('~0', '~')
+                for key in path[1:].split('/')]
+
+
 class MyArgumentParser(argparse.ArgumentParser):
     def error(self, message):
         sys.stderr.write('error: %s\n' % message)
@@ -239,21 +433,53 @@ if __name__ == '__main__':
     parser = MyArgumentParser()
     parser.add_argument(
             'filename', nargs=2,
-             help='Input JSON file containing characters and monsters')
+             help='Input JSON file containing characters and monsters ' +
+                  '(with --apply: the input file and the output file)')
     parser.add_argument('-v', '--verbose', help='verbose', action='store_true',
                         default=False)
+    parser.add_argument(
+            '-p', '--patch',
+            help='Print the differences as an RFC 6902 JSON patch',
+            action='store_true',
+            default=False)
+    parser.add_argument(
+            '-a', '--apply',
+            help='Apply a JSON patch (from --patch) to the first file and ' +
+                 'write the result to the second',
+            metavar='PATCH',
+            default=None)
 
     ARGS = parser.parse_args()
 
+    if ARGS.apply is not None:
+        patch = ca_json.GmJson(ARGS.apply)
+        original = ca_json.GmJson(ARGS.filename[0])
+        if patch.open_read_close() and original.open_read_close():
+            result = JsonPatch.apply(original.read_data, patch.read_data)
+            ca_json.GmJson(ARGS.filename[1]).open_write_close(result)
+        sys.exit(0)
+
+    # The legacy GmJson (above) converts every string to bytes which takes
+    # a lot of time and memory for a big file.  ca_json doesn't.
+    file1 = ca_json.GmJson(ARGS.filename[0])
+    file2 = ca_json.GmJson(ARGS.filename[1])
+    if not file1.open_read_close() or not file2.open_read_close():
+        sys.exit(1)
+
+    if ARGS.patch:
+        json.dump(JsonPatch.make(file1.read_data, file2.read_data),
+                  sys.stdout,
+                  indent=2)
+        print('')
+        sys.exit(0)
+
     print('LHS: %s' % ARGS.filename[0])
     print('RHS: %s' % ARGS.filename[1])
     print('')
 
-    with GmJson(ARGS.filename[0]) as file1:
-        with GmJson(ARGS.filename[1]) as file2:
-            diff_json = DiffJson(ARGS.filename[0],
-                                 ARGS.filename[1],
-                                 ARGS.verbose)
+    diff_json = DiffJson(ARGS.filename[0],
+                         ARGS.filename[1],
+                         ARGS.verbose)
 
-            if diff_json.are_equal(file1.read_data, file2.read_data, ''):
-                print('files are equal')
+    if diff_json.are_equal(file1.read_data, file2.read_data, ''):
+        print('files are equal')
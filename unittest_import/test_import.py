@@ -1,7 +1,10 @@
 #! /usr/bin/python
 import curses
 
+import json
+import os
 import pprint
+import tempfile
 import traceback
 import unittest
 
@@ -2231,3 +2234,65 @@ class GmTestCaseImport(GmTestCaseCommon):
                 self.debug.header2('EXPECTED')
                 self.debug.pprint(GmTestCaseImport.good_data[test_case])
                 assert(0) # just to raise the exception
+
+    def test_skill_graph_defaults(self):
+        class Char(object):
+            def __init__(self):
+                self.char = {'permanent': {'st': 10, 'dx': 12, 'iq': 10,
+                                           'ht': 10, 'per': 10, 'wi': 10}}
+                self.stuff = [
+                    {'name': 'scope',
+                     'bonus': [{'type': 'skill',
+                                'amount': 1,
+                                'name': 'Guns.*'}]}]
+
+        skills_gcs = [
+            # Unbought and GCS didn't calculate the default: should default
+            # to the better of DX-4 (8) and Guns (Rifle)-2 (16-2=14).
+            {'type': 'skill', 'name': 'Guns', 'specialization': 'Pistol',
+             'difficulty': 'dx/e',
+             'defaults': [{'type': 'dx', 'modifier': -4},
+                          {'type': 'skill', 'name': 'Guns',
+                           'specialization': 'Rifle', 'modifier': -2}]},
+            # Bought: DX(12) + 8 points (+3) + scope (+1) = 16
+            {'type': 'skill', 'name': 'Guns', 'specialization': 'Rifle',
+             'difficulty': 'dx/e', 'points': 8,
+             'defaults': [{'type': 'dx', 'modifier': -4},
+                          {'type': 'skill', 'name': 'Guns',
+                           'specialization': 'Pistol', 'modifier': -2}]},
+            # Technique values are relative to the default skill
+            {'type': 'technique', 'name': 'Off-Hand Weapon Training',
+             'difficulty': 'h', 'points': 2,
+             'default': {'type': 'skill', 'name': 'Guns',
+                         'specialization': 'Rifle', 'modifier': -4}},
+        ]
+
+        skills = ca_gcs_import.SkillsCalcs(self._window_manager)
+        graph = ca_gcs_import.SkillGraph(self._window_manager,
+                                         skills,
+                                         Char(),
+                                         skills_gcs)
+        levels = graph.evaluate()
+        assert levels[1] == 16
+        assert levels[0] == 14
+        assert levels[2] == -3
+
+        # A library of skills describes techniques with the same value
+        skills_gcs.append({'type': 'skill', 'name': 'Broadsword',
+                           'difficulty': 'dx/a',
+                           'defaults': [{'type': 'dx', 'modifier': -5}]})
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, 'library.skl')
+            with open(filename, 'w') as f:
+                json.dump({'skills': skills_gcs}, f)
+            from_gcs = ca_gcs_import.FromGcs(self._window_manager,
+                                             self._ruleset,
+                                             filename)
+            skills, techniques = from_gcs.build_skill_descriptions()
+        assert sorted(skills.keys()) == ['Broadsword', 'Guns (Pistol)',
+                                         'Guns (Rifle)']
+        assert skills['Broadsword'] == {'ask': 'number', 'attr': 'dx',
+                                        'diff': 'A', 'default': -5}
+        assert techniques == [{'name': 'Off-Hand Weapon Training',
+                               'default': 'Guns (Rifle)',
+                               'value': levels[2]}]
@@ -168,6 +168,11 @@ class MockFightHandler(object):
     def clear_opponents(self):
         self.__opponents = {}  # group: {name: object, name: object}
 
+    def get_display_name(self,
+                         fighter    # Fighter object
+                         ):
+        return fighter.name
+
     def get_fighter_object(self,
                            name,
                            group):
@@ -188,6 +193,15 @@ class MockFightHandler(object):
     def get_round(self):
         return 1 # Don't really need this for anything but timing
 
+    def get_undo_stack(self):
+        return None
+
+    def is_fighter_holding_init(self,
+                                name,   # string
+                                group   # string
+                                ):
+        return False
+
     def modify_index(self, adjustment):
         pass
 
@@ -306,7 +320,12 @@ class MockFightGmWindow(MockGmWindow):
                       opponent,
                       fighters,
                       index,
-                      new_round):
+                      new_round,
+                      changed=None):
+        pass
+
+    def scroll_summary(self,
+                       adj):
         pass
 
     def round_ribbon(self,
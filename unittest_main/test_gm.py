@@ -3,15 +3,32 @@
 import argparse
 import copy
 import curses
+import errno
+import json
+import os
 import random
+import tempfile
+import time
 import unittest
 
+import benchmark
 import ca   # combat accountant
+import ca_autosave
 import ca_debug
 import ca_fighter
+import ca_gui
 import ca_gurps_ruleset
+import ca_history
+import ca_json
+import ca_npc
+import ca_player_view
+import ca_query
 import ca_ruleset
+import ca_startup
 import ca_timers
+import ca_undo
+import ca_validation
+import diff_json
 
 from .test_common import GmTestCaseCommon
 from .test_common import MockFightHandler
@@ -750,6 +767,217 @@ class GmTestCase(GmTestCaseCommon):
         # assert 0 timers -- yup, 0.9 timer is now gone
         assert len(fighter.rawdata['timers']) == 0
 
+    def test_timer_wheel(self):
+        '''
+        Timers that outlive a revolution of the timer wheel, the busy count,
+        and the string index.
+        '''
+        fighter = ca_fighter.Fighter(
+                'Tank',
+                'group',
+                copy.deepcopy(self._tank_fighter),
+                self._ruleset,
+                self._window_manager)
+
+        long_rounds = ca_timers.TimerWheel.SLOTS * 2 + 5
+        timer_obj = ca_timers.Timer(None)
+        timer_obj.from_pieces({'parent-name': fighter.name,
+                               'rounds': long_rounds,
+                               'string': 'long'})
+        fighter.timers.add(timer_obj)
+
+        timer_obj = ca_timers.Timer(None)
+        timer_obj.from_pieces({'parent-name': fighter.name,
+                               'rounds': 2,
+                               'string': 'busy'})
+        timer_obj.mark_owner_as_busy()
+        fighter.timers.add(timer_obj)
+
+        assert fighter.timers.is_busy()
+        assert fighter.timers.found_timer_string('long')
+        assert fighter.timers.found_timer_string('busy')
+
+        for i in range(long_rounds):
+            fighter.timers.fire_expired_timers(ca_timers.Timer.FIRE_ROUND_END)
+            fighter.timers.decrement_all()
+            if i == 2:
+                assert not fighter.timers.is_busy()
+                assert not fighter.timers.found_timer_string('busy')
+            assert fighter.timers.found_timer_string('long')
+            assert len(fighter.rawdata['timers']) == (1 if i >= 2 else 2)
+
+        assert fighter.timers.get_all()[0].rawdata['rounds'] == 0
+        fighter.timers.fire_expired_timers(ca_timers.Timer.FIRE_ROUND_END)
+        assert len(fighter.rawdata['timers']) == 0
+        assert not fighter.timers.found_timer_string('long')
+
+    def test_change_notification(self):
+        '''
+        Actions, timers, and equipment changes tell the listeners that the
+        fighter changed (so the fight screen knows what to redraw).
+        '''
+        mock_fight_handler = MockFightHandler()
+        fighter = ca_fighter.Fighter(
+                'Priest',
+                'group',
+                copy.deepcopy(self._vodou_priest_fighter),
+                self._ruleset,
+                self._window_manager)
+
+        changed = []
+        fighter.add_change_listener(changed.append)
+        fighter.add_change_listener(changed.append)  # Only registered once
+
+        count = fighter.get_change_count()
+        self._ruleset.do_action(fighter,
+                                {'action-name': 'don-armor',
+                                 'armor-index': self._vodou_armor_index},
+                                mock_fight_handler)
+        assert fighter.get_change_count() > count
+        assert len(changed) > 0
+        assert changed[0] is fighter
+
+        fighter.remove_change_listener(changed.append)
+        heard = len(changed)
+
+        timer_obj = ca_timers.Timer(None)
+        timer_obj.from_pieces({'parent-name': fighter.name,
+                               'rounds': 1,
+                               'string': 'changes'})
+        count = fighter.get_change_count()
+        fighter.timers.add(timer_obj)
+        assert fighter.get_change_count() == count + 1
+
+        fighter.timers.decrement_all()
+        assert fighter.get_change_count() == count + 1
+        fighter.timers.fire_expired_timers(ca_timers.Timer.FIRE_ROUND_END)
+        assert fighter.get_change_count() == count + 2
+
+        fighter.toggle_absent()
+        assert fighter.get_change_count() == count + 3
+        assert len(changed) == heard    # Nobody's listening, anymore
+
+        # Changing the equipment directly (not through an action) counts,
+        # too.
+        count = fighter.get_change_count()
+        fighter.doff_armor_by_index(self._vodou_armor_index)
+        assert fighter.get_change_count() > count
+        count = fighter.get_change_count()
+        fighter.don_armor_by_index(self._vodou_armor_index)
+        assert fighter.get_change_count() > count
+
+    def test_history_records(self):
+        '''
+        The fight history keeps compact records that read like the actions
+        they came from and survive a round trip through the Game File.
+        '''
+        history = ca_history.History(['--- Round 1 ---'])
+        history.append({'action-name': 'attack',
+                        'fighter': {'name': 'Moe', 'group': 'PCs'},
+                        'comment': '(Moe) did (Attack) maneuver'})
+        history.append({'action-name': 'attack',
+                        'fighter': {'name': 'Moe', 'group': 'PCs'}})
+
+        assert len(history) == 3
+        assert history[0]['comment'] == '--- Round 1 ---'
+        assert 'action-name' not in history[0]
+        assert history[1]['action-name'] == 'attack'
+        assert history[1]['fighter'] == {'name': 'Moe', 'group': 'PCs'}
+        assert history[1].fighter is history[2].fighter     # Shared
+        assert history[2].get('comment') is None
+
+        # A changed copy shares what didn't change
+        record = history[1].replace({'comment': 'changed'})
+        assert record['comment'] == 'changed'
+        assert history[1]['comment'] == '(Moe) did (Attack) maneuver'
+        assert record.fighter is history[1].fighter
+
+        # Round trip through JSON
+        data = json.loads(json.dumps({'history': history},
+                                     cls=ca_json.BytesEncoder))
+        assert data['history'] == history.to_actions()
+        again = ca_history.History(data['history'])
+        assert again.to_actions() == history.to_actions()
+        assert again.to_actions()[1] == {
+                'action-name': 'attack',
+                'fighter': {'name': 'Moe', 'group': 'PCs'},
+                'comment': '(Moe) did (Attack) maneuver'}
+
+    def test_part_2_action(self):
+        '''
+        The 2nd part of a 2-part action is a plain dict that doesn't share
+        anything modifiable with the 1st part.
+        '''
+        complete_spell = {'name': 'Agonize', 'cost': 8}
+        action = {'action-name': 'cast-spell',
+                  'spell-index': 0,
+                  'opponent': {'name': 'Moe', 'group': 'PCs'},
+                  'comment': '(Priest) cast (Agonize)'}
+        part_2 = self._ruleset._make_part_2_action(
+                action, {'complete spell': complete_spell})
+
+        assert type(part_2) is dict
+        assert part_2['part'] == 2
+        assert part_2['comment'] == '(Priest) cast (Agonize)'
+        assert part_2['complete spell'] is complete_spell
+        assert part_2['opponent'] == action['opponent']
+        assert part_2['opponent'] is not action['opponent']
+        part_2['comment'] = 'changed'
+        part_2['opponent']['name'] = 'Larry'
+        assert action['comment'] == '(Priest) cast (Agonize)'
+        assert action['opponent']['name'] == 'Moe'
+        assert 'part' not in action
+
+        history = ca_history.History()
+        history.append(part_2)
+        assert history[0]['complete spell'] is complete_spell
+        assert history[0]['comment'] == 'changed'
+        assert history[0]['spell-index'] == 0
+
+    def test_lazy_timer_rounds(self):
+        '''
+        With a TimerClock, timers' rounds are only brought up to date when
+        they're looked at and nothing extra is put in the Game File.
+        '''
+        fighter = ca_fighter.Fighter(
+                'Tank',
+                'group',
+                copy.deepcopy(self._tank_fighter),
+                self._ruleset,
+                self._window_manager)
+        clock = ca_timers.TimerClock()
+        fighter.timers.set_clock(clock)
+
+        timer_obj = ca_timers.Timer(None)
+        timer_obj.from_pieces({'parent-name': fighter.name,
+                               'rounds': 10,
+                               'string': 'lazy'})
+        fighter.timers.add(timer_obj)
+        before = copy.deepcopy(fighter.rawdata)
+
+        fighter.timers.decrement_all()
+        fighter.timers.decrement_all(3)
+        assert fighter.rawdata == before
+
+        # Writing the Game File brings the timers up to date.
+        clock.update_all()
+        assert fighter.rawdata['timers'][0]['rounds'] == 6
+
+        # Looking at the timers brings them up to date, too.
+        fighter.timers.decrement_all(2)
+        assert fighter.rawdata['timers'][0]['rounds'] == 6
+        assert fighter.timers.get_all()[0].rawdata['rounds'] == 4
+
+        # Counting more rounds doesn't touch them.
+        fighter.timers.decrement_all()
+        assert fighter.rawdata['timers'][0]['rounds'] == 4
+
+        # Skipping ahead fires the timer.
+        fighter.timers.decrement_all(3)
+        fighter.timers.fire_expired_timers(ca_timers.Timer.FIRE_ROUND_END)
+        assert len(fighter.rawdata['timers']) == 0
+        assert clock.pop_rounds(fighter.timers) == 0
+
     def test_save(self):
         '''
         Basic test
@@ -882,6 +1110,105 @@ class GmTestCase(GmTestCaseCommon):
         assert not self._is_in_dead_monsters(world_data, "Dima's Crew")
         assert not world_data.read_data['current-fight']['saved']
 
+    def test_consistency_cache(self):
+        '''
+        Creatures that haven't changed since they passed the consistency
+        check aren't checked again.
+        '''
+        world_dict = copy.deepcopy(self.base_world_dict)
+        world_dict['consistency-cache'] = {'PCs': {'Gone': 'abc'},
+                                           'Old': 'abc'}
+        world_data = WorldData(world_dict)
+        world = ca.World('internal source file',
+                         world_data,
+                         self._ruleset,
+                         MockProgram(),
+                         self._window_manager,
+                         save_snapshot=False)
+
+        # Creatures that aren't in the Game File are forgotten.
+        cache = world_data.read_data['consistency-cache']
+        assert cache == {}
+
+        creature = self._ruleset.make_empty_creature()
+        result = world.check_creature_consistent('Clean', 'PCs', creature)
+        assert result == ca_ruleset.Ruleset.KEEP_CHECKING_CONSISTENCY
+        first_hash = cache['PCs']['Clean']
+        assert first_hash == self._ruleset.get_consistency_hash(creature)
+
+        # Unchanged: the check is skipped (so the count isn't reset).
+        self._ruleset.consistency_problems = 99
+        result = world.check_creature_consistent('Clean', 'PCs', creature)
+        assert result == ca_ruleset.Ruleset.KEEP_CHECKING_CONSISTENCY
+        assert self._ruleset.consistency_problems == 99
+
+        # The same name in another group is a different creature.
+        self._ruleset.consistency_problems = 99
+        result = world.check_creature_consistent('Clean', 'NPCs', creature)
+        assert self._ruleset.consistency_problems == 0
+        assert cache['NPCs']['Clean'] == first_hash
+
+        # Changed: the check is run again.
+        creature['stuff'].append({'name': 'rope',
+                                  'type': {'misc': 1},
+                                  'count': 1,
+                                  'notes': '',
+                                  'owners': None})
+        result = world.check_creature_consistent('Clean', 'PCs', creature)
+        assert self._ruleset.consistency_problems == 0
+        assert cache['PCs']['Clean'] != first_hash
+        assert cache['PCs']['Clean'] == self._ruleset.get_consistency_hash(
+                creature)
+
+    def test_validation_service(self):
+        '''
+        Background validation checks everybody without the window manager.
+        '''
+        world_data = WorldData(copy.deepcopy(self.base_world_dict))
+        world = ca.World('internal source file',
+                         world_data,
+                         self._ruleset,
+                         MockProgram(),
+                         self._window_manager,
+                         save_snapshot=False)
+
+        # The timers' rounds are brought up to date before the creatures
+        # are copied for the workers
+        priest = world.get_creature('Vodou Priest', 'PCs')
+        timer_obj = ca_timers.Timer(None)
+        timer_obj.from_pieces({'parent-name': priest.name,
+                               'rounds': 5,
+                               'string': 'chanting'})
+        priest.timers.add(timer_obj)
+        priest.timers.decrement_all(3)
+
+        validation = ca_validation.ValidationService(self._ruleset,
+                                                     max_workers=4)
+        count = validation.check_world(world)
+        assert priest.rawdata['timers'][-1]['rounds'] == 2
+
+        creature = copy.deepcopy(self._thief_fighter)
+        creature['spells'] = [{'name': 'No Such Spell', 'skill': 12}]
+        validation.check_creature('test', 'Bad Thief', creature)
+        validation.shutdown()
+
+        assert validation.is_done()
+        results = validation.get_results(only_problems=False)
+        assert len(results) == count + 1
+        assert validation.get_results() == []  # Already emptied
+
+        problems = {(result.group, result.name): result.problems
+                    for result in results}
+        assert problems[('PCs', 'Vodou Priest')] == []
+        assert problems[("Dima's Crew", 'Tank Fighter')] == [
+                ['Creature "Tank Fighter" has no preferred weapon']]
+        assert (['Creature "Bad Thief"',
+                 '  has spell "No Such Spell" that is not in ruleset'] in
+                problems[('test', 'Bad Thief')])
+
+        # The checks were done on copies.
+        assert 'spells' not in self._thief_fighter
+
     def test_add_remove_equipment(self):
         '''
         Basic test
@@ -2038,6 +2365,689 @@ class GmTestCase(GmTestCaseCommon):
         container = fighter.equipment.get_container([0, 0])
         assert len(container) == 3
 
+    def test_startup_profile(self):
+        profile = ca_startup.StartupProfile()
+        with profile.timing('not running'):
+            pass
+        assert len(profile.to_dict()['entries']) == 0
+
+        lazy_module = ca_startup.LazyModule('colorsys')
+        profile.start()
+        with profile.timing('outer'):
+            with profile.timing('inner'):
+                pass
+            assert lazy_module.rgb_to_hsv(1.0, 0.0, 0.0)[0] == 0.0
+        profile.stop()
+        assert lazy_module.is_loaded()
+        assert not profile.is_running()
+
+        entries = profile.to_dict()['entries']
+        assert entries[0]['name'] == 'outer'
+        assert entries[0]['depth'] == 0
+        assert entries[1]['name'] == 'inner'
+        assert entries[1]['depth'] == 1
+        assert all(entry['seconds'] is not None for entry in entries)
+        assert len(profile.get_report_lines()) == len(entries) + 1
+
+    def test_game_file_generator(self):
+        settings = {'pcs': 2, 'npcs': 3, 'fights': 2, 'monsters': 4,
+                    'items': 3, 'depth': 2, 'timers': 1, 'history': 20}
+        generator = benchmark.GameFileGenerator(self._ruleset, **settings)
+        game_file = generator.make_game_file()
+
+        # The same settings always make the same Game File
+        assert game_file == generator.make_game_file()
+        other = benchmark.GameFileGenerator(self._ruleset, seed=1, **settings)
+        assert game_file != other.make_game_file()
+
+        assert len(game_file['PCs']) == 2
+        assert len(game_file['NPCs']) == 3
+        assert len(game_file['fights']) == 2
+        assert len(game_file['fights']['Fight 1']['monsters']) == 4
+        assert len(game_file['PCs']['PC 1']['timers']) == 1
+        assert len(game_file['current-fight']['history']) == 20
+
+        # Containers nest |depth| deep with |items| things in each
+        stuff = game_file['NPCs']['NPC 1']['stuff']
+        for depth in range(2):
+            assert len(stuff) == 3
+            assert 'container' in stuff[0]['type']
+            stuff = stuff[0]['stuff']
+        assert len(stuff) == 3
+        assert all('container' not in item['type'] for item in stuff)
+
+        world = ca.World('internal_source_file',
+                         WorldData(game_file),
+                         self._ruleset,
+                         MockProgram(),
+                         self._window_manager,
+                         save_snapshot=False)
+        assert len(world.rawdata['current-fight']['history']) == 20
+
+    def test_scripted_window_manager(self):
+        window_manager = ca_gui.ScriptedWindowManager()
+
+        # Queued responses are used in order, then the policy takes over
+        choices = [('one', 1), ('two', 2), ('three', {'doit': lambda x: x,
+                                                      'param': 3})]
+        window_manager.set_menu_response('Pick', 2)
+        window_manager.set_menu_response('Pick', choices[2][1])
+        assert window_manager.menu('Pick', choices) == (2, 1)
+        assert window_manager.menu('Pick', choices) == (3, 2)
+        assert window_manager.menu('Pick', choices) == (None, None)
+        assert window_manager.menu('Only', [('single', 'x')]) == ('x', 0)
+
+        window_manager.set_input_box_response('Number', '12')
+        window_manager.set_input_box_response('Number', 'bogus')
+        assert window_manager.input_box_number(1, 10, 'Number') == 12
+        assert window_manager.input_box_number(1, 10, 'Number') is None
+        assert window_manager.errors == [['Invalid value for a number']]
+        assert window_manager.input_box(1, 10, 'Name') == ''
+
+        window_manager.display_window('Info', [[{'text': 'a', 'mode': 0},
+                                                {'text': 'b', 'mode': 0}]])
+        displays = window_manager.get_transcript(['display'])
+        assert displays == [{'kind': 'display',
+                             'title': 'Info',
+                             'lines': ['ab']}]
+        menus = window_manager.get_transcript(['menu'])
+        assert menus[0]['choices'] == ['one', 'two', 'three']
+
+        first = ca_gui.ScriptedWindowManager(
+                ca_gui.ScriptedWindowManager.first_choice_policy)
+        assert first.menu('Pick', choices) == (1, 0)
+
+        # Run a real fight with it
+        ruleset = ca_gurps_ruleset.GurpsRuleset(window_manager)
+        world = ca.World('internal source file',
+                         WorldData(self.init_world_dict),
+                         ruleset,
+                         MockProgram(),
+                         window_manager,
+                         save_snapshot=False)
+        window_manager.set_menu_response(
+                "Use Pestilence's preferred armor?",
+                ('quit', ca_ruleset.Ruleset.STOP_CHECKING))
+        fight_handler = ca.FightHandler(window_manager,
+                                        world,
+                                        'horsemen',
+                                        None,
+                                        save_snapshot=False)
+        first_fighter = fight_handler.get_current_fighter()
+        ruleset.do_action(first_fighter,
+                          {'action-name': 'defend'},
+                          fight_handler)
+        fight_handler._choices[ord(' ')]['func']()
+        assert fight_handler.get_current_fighter() is not first_fighter
+
+    def test_autosave(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, 'game.json')
+            autosave_filename = os.path.join(directory, 'game.autosave.json')
+            assert (ca_autosave.AutosaveService.get_autosave_filename(
+                    filename) == autosave_filename)
+            with open(filename, 'w') as f:
+                json.dump({'PCs': {}}, f)
+            autosave = ca_autosave.AutosaveService(filename, 0)
+            data = {'PCs': {'Moe': {'current': {'hp': 10}}}}
+
+            assert autosave.is_due()
+            assert autosave.save_now(data)
+            autosave.wait()
+            with open(autosave_filename) as f:
+                assert json.load(f) == data
+            with open(filename) as f:
+                assert json.load(f) == {'PCs': {}}  # Game File's untouched
+
+            # Nothing's written unless the data has changed
+            assert not autosave.save_now(data)
+            data['PCs']['Moe']['current']['hp'] = 3
+            autosave.tick(data)
+            autosave.wait()
+            with open(autosave_filename) as f:
+                assert json.load(f)['PCs']['Moe']['current']['hp'] == 3
+
+            stats = autosave.get_stats()
+            assert stats['saves'] == 2
+            assert stats['unchanged'] == 1
+            assert stats['error'] is None
+            assert not os.path.exists('%s.tmp' % autosave_filename)
+            autosave.shutdown()
+
+            # An autosave left behind can be recovered...
+            assert ca_autosave.AutosaveService.is_recoverable(filename)
+            ca_autosave.AutosaveService.recover(filename)
+            assert not ca_autosave.AutosaveService.is_recoverable(filename)
+            with open(filename) as f:
+                assert json.load(f) == data
+            with open('%s.bak' % filename) as f:
+                assert json.load(f) == {'PCs': {}}
+
+            # ...or discarded
+            with open(autosave_filename, 'w') as f:
+                json.dump({'PCs': {}}, f)
+            ca_autosave.AutosaveService.discard(filename)
+            assert not os.path.exists(autosave_filename)
+            ca_autosave.AutosaveService.discard(filename)   # Not there: OK
+
+            # The World only autosaves if it's saving on exit
+            world_data = ca_json.GmJson(filename)
+            world_data.read_data = copy.deepcopy(self.init_world_dict)
+            world = ca.World(filename,
+                             world_data,
+                             self._ruleset,
+                             MockProgram(),
+                             self._window_manager,
+                             save_snapshot=False)
+            world.start_autosave(0)
+            assert world.get_autosave_stats() is None
+            world.start_autosave(0.0001)
+            world.autosave()
+            assert world.get_autosave_stats() is None
+            world.do_save_on_exit()
+            time.sleep(0.001)
+            world.autosave()
+            world.stop_autosave()
+            with open(autosave_filename) as f:
+                assert 'horsemen' in json.load(f)['fights']
+
+            # Not saving on exit throws away the autosave and saving on exit,
+            # again, starts it again
+            world.start_autosave(0.0001)
+            time.sleep(0.001)
+            world.autosave()
+            world.dont_save_on_exit()
+            assert world.get_autosave_stats() is None
+            assert not os.path.exists(autosave_filename)
+            assert not ca_autosave.AutosaveService.is_recoverable(filename)
+            world.do_save_on_exit()
+            time.sleep(0.001)
+            world.autosave()
+            world.stop_autosave()
+            assert os.path.exists(autosave_filename)
+
+    def test_creature_factory(self):
+        template = {
+            'permanent': {
+                'st': {'type': 'value', 'value': 12},
+                'hp': {'type': 'dice', 'value': '3d+2'},
+                'iq': {'type': 'dice', 'value': '1d10'},
+                'dx': {'type': 'dice', 'value': 'bogus'},
+            },
+            'stuff': {'type': 'value', 'value': [{'name': 'rock'}]},
+        }
+        self._window_manager.expect_error(
+                ['Template entry "dx" has bad dice: "bogus"'])
+        factory = ca_npc.CreatureFactory(self._ruleset,
+                                         template,
+                                         self._window_manager)
+        assert (self._window_manager.error_state ==
+                MockWindowManager.FOUND_EXPECTED_ERROR)
+
+        creatures = factory.make_creatures(50)
+        assert len(creatures) == 50
+        for creature in creatures:
+            assert creature['permanent']['st'] == 12
+            assert 5 <= creature['permanent']['hp'] <= 20
+            assert creature['current']['hp'] == creature['permanent']['hp']
+            assert 1 <= creature['permanent']['iq'] <= 10
+            assert creature['permanent']['dx'] is None
+            assert creature['stuff'] == [{'name': 'rock'}]
+        # Each creature gets its own copy of the template's values
+        assert creatures[0]['stuff'] is not creatures[1]['stuff']
+        assert creatures[0]['stuff'] is not template['stuff']['value']
+
+        # No dice or dice with no sides are bad dice, too
+        for bad_dice in ('0d', '1d0'):
+            self._window_manager.expect_error(
+                    ['Template entry "hp" has bad dice: "%s"' % bad_dice])
+            factory = ca_npc.CreatureFactory(
+                    self._ruleset,
+                    {'permanent': {'hp': {'type': 'dice',
+                                          'value': bad_dice}}},
+                    self._window_manager)
+            assert (self._window_manager.error_state ==
+                    MockWindowManager.FOUND_EXPECTED_ERROR)
+            assert factory.make_creatures(2)[0]['permanent']['hp'] is None
+
+        rolls = ca_npc.CreatureFactory.roll_dice(2, 6, -1, 100)
+        assert len(rolls) == 100
+        assert all(1 <= roll <= 11 for roll in rolls)
+
+        sampler = ca_npc.PersonalitySampler(
+                {'traits': {'hair': ['Bald'],
+                            'oneline': {'voice': [['quiet'], [None]]},
+                            'job': [{'text': 'cook', 'place': True}]},
+                 'support': {'place': ['the docks']}})
+        assert sampler.get_notes() == ['hair: Bald',
+                                       'voice: quiet',
+                                       'job: cook, place: the docks']
+
+    def test_bug_report(self):
+        with tempfile.TemporaryDirectory() as directory:
+            startup = copy.deepcopy(self.init_world_dict)
+            fight = copy.deepcopy(self.init_world_dict)
+            fight['PCs']['Moe']['current']['hp'] = 1
+            fight['current-fight']['history'].append({'comment': 'ouch'})
+            files = {}
+            for name, data in (('game', startup), ('fight', fight)):
+                files[name] = os.path.join(directory, '%s.json' % name)
+                with open(files[name], 'w') as f:
+                    json.dump(data, f)
+
+            program = ca.Program(files['game'])
+            program.add_snapshot('fight', files['fight'])
+            cwd = os.getcwd()
+            os.chdir(directory)
+            try:
+                report_filename = program.make_bug_report(
+                        [{'comment': 'ouch'}], 'It broke', None, 'test')
+            finally:
+                os.chdir(cwd)
+
+            folder = os.path.join(directory,
+                                  os.path.splitext(report_filename)[0])
+            with open(os.path.join(folder, report_filename)) as f:
+                report = json.load(f)
+            assert report['report'] == 'It broke'
+            assert report['base-snapshot'] == 'startup'
+            assert report['snapshots']['startup'] == 'game.json'
+            assert report['snapshots']['fight'].endswith(
+                    ca.Program.patch_extension)
+
+            # The snapshots can be rebuilt for replay
+            rebuilt = ca.Program.get_bug_report_snapshot(folder,
+                                                         report,
+                                                         'fight')
+            with open(rebuilt) as f:
+                assert json.load(f) == fight
+            assert ca.Program.get_bug_report_snapshot(
+                    folder, report, 'startup') == os.path.join(folder,
+                                                               'game.json')
+
+    def test_player_view(self):
+        # Rapid states are sent as one patch
+
+        server = ca_player_view.PlayerViewServer(0, coalesce_seconds=0.2)
+        client = ca_player_view.PlayerViewClient(server.get_address(),
+                                                 timeout=5)
+        server.publish({'round': 0, 'current': 0, 'fighters': []})
+        assert client.read() == {'round': 0, 'current': 0, 'fighters': []}
+        for round_number in range(1, 10):
+            server.publish({'round': round_number,
+                            'current': 0,
+                            'fighters': []})
+        state = client.read()
+        while state['round'] != 9:
+            state = client.read()
+        stats = server.get_stats()
+        assert stats['published'] == 10
+        assert stats['sent'] < 10
+        assert stats['clients'] == 1
+
+        # A late client gets the whole state
+        late_client = ca_player_view.PlayerViewClient(server.get_address(),
+                                                      timeout=5)
+        assert late_client.read()['round'] == 9
+        late_client.close()
+        server.shutdown()
+        assert client.read() is None
+        client.close()
+
+        # In a fight
+
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as directory:
+            world_dict = copy.deepcopy(self.init_world_dict)
+            world_dict['dead-monsters'] = []  # The fight ends
+            world_data = WorldData(world_dict)
+            world = ca.World('internal source file',
+                             world_data,
+                             self._ruleset,
+                             MockProgram(),
+                             self._window_manager,
+                             save_snapshot=False)
+            address = os.path.join(directory, 'player-view')
+            world.start_player_view(address)
+            client = ca_player_view.PlayerViewClient(address, timeout=5)
+
+            self._window_manager.set_menu_response(
+                    "Use Pestilence's preferred armor?",
+                    ('quit', ca_ruleset.Ruleset.STOP_CHECKING))
+            fight_handler = ca.FightHandler(self._window_manager,
+                                            world,
+                                            'horsemen',
+                                            None,  # Playback history
+                                            save_snapshot=False)
+            self._window_manager.set_char_response(ord('q'))
+            self._window_manager.set_menu_response('Leaving Fight', False)
+            fight_handler.handle_user_input_until_done()
+
+            state = client.read()
+            names = [fighter['name'] for fighter in state['fighters']]
+            assert '2 - Pestilence' in names
+            assert state['fighters'][state['current']]['state'] == 'alive'
+            while state['round'] is not None:
+                state = client.read()
+            assert state['fighters'] == []
+
+            client.close()
+            world.stop_player_view()
+            assert world.get_player_view() is None
+            assert not os.path.exists(address)
+
+            # A file that isn't a socket isn't removed to make room
+            with open(address, 'w') as f:
+                f.write('precious')
+            self._window_manager.expect_error(
+                    ['Could not start the player view at "%s":' % address,
+                     "[Errno %d] Exists and is not a socket: '%s'" %
+                     (errno.EEXIST, address)])
+            world.start_player_view(address, self._window_manager)
+            assert (self._window_manager.error_state ==
+                    MockWindowManager.FOUND_EXPECTED_ERROR)
+            assert world.get_player_view() is None
+            with open(address) as f:
+                assert f.read() == 'precious'
+
+            # A port written as a string is a port, not a socket file
+            os.chdir(directory)
+            try:
+                world.start_player_view('0')
+            finally:
+                os.chdir(cwd)
+            assert isinstance(world.get_player_view().get_address(), int)
+            assert os.listdir(directory) == ['player-view']
+            world.stop_player_view()
+
+    def test_find_creatures(self):
+        world = ca.World('internal source file',
+                         WorldData(self.init_world_dict),
+                         self._ruleset,
+                         MockProgram(),
+                         self._window_manager,
+                         save_snapshot=False)
+
+        everyone = world.find_creatures()
+        assert everyone[:3] == [('PCs', 'Jack'), ('PCs', 'Manny'),
+                                ('PCs', 'Moe')]
+        assert ('horsemen', 'Pestilence') in everyone
+        assert world.find_creatures(groups=['horsemen']) == [
+                ('horsemen', 'Famine'), ('horsemen', 'Pestilence')]
+        assert world.find_creatures(item='Gem') == []
+
+        # Changes are found after the creature is marked as changed
+        moe = world.get_creature('Moe', 'PCs')
+        moe.rawdata['stuff'].append({'name': 'Bag', 'stuff': [{'name': 'Gem'}]})
+        moe.rawdata['current']['hp'] = -3
+        moe.rawdata['state'] = 'unconscious'
+        moe.mark_changed()
+        assert world.find_creatures(item='Gem') == [('PCs', 'Moe')]
+        assert world.find_creatures(states=['unconscious']) == [('PCs', 'Moe')]
+        assert world.find_creatures(attributes=[('hp', '<', 0)]) == [
+                ('PCs', 'Moe')]
+        assert world.find_creatures(states=['unconscious', 'alive'],
+                                    attributes=[('hp', '>=', 0)],
+                                    item='Gem') == []
+
+        # Creatures (and fights) that are added or removed are found, too
+        harpo = copy.deepcopy(world.rawdata['NPCs']['Zeppo'])
+        harpo['spells'] = [{'name': 'Light', 'skill': 12}]
+        harpo['timers'] = [{'rounds': 1, 'string': 'honk'}]
+        world.rawdata['NPCs']['Harpo'] = harpo
+        del world.rawdata['fights']['horsemen']
+        assert world.find_creatures(spell='Light') == [('NPCs', 'Harpo')]
+        assert world.find_creatures(has_timers=True) == [('NPCs', 'Harpo')]
+        assert ('NPCs', 'Harpo') not in world.find_creatures(has_timers=False)
+        assert world.find_creatures(groups=['horsemen']) == []
+
+        # The index, by itself
+        fight = {ca_fighter.Venue.name: {'stuff': []},
+                 'Orc': {'stuff': [{'name': 'Axe'}]}}
+        index = ca_query.CreatureIndex(
+                lambda: {'orcs': fight},
+                lambda name, group: fight.get(name))
+        assert index.find(item='Axe') == [('orcs', 'Orc')]
+        indexed = index.get_stats()['indexed']
+        assert index.find(groups=['orcs']) == [('orcs', 'Orc')]
+        assert index.get_stats()['indexed'] == indexed  # Nothing new
+
+        # A creature replaced by another with the same name is found without
+        # being marked as changed, even through a redirect
+        groups = {'orcs': fight,
+                  'boss': {'Orc': {'redirect': 'orcs'}}}
+        index = ca_query.CreatureIndex(
+                lambda: groups,
+                lambda name, group: fight.get(name))  # 'boss' redirects
+        assert index.find(item='Axe') == [('orcs', 'Orc'), ('boss', 'Orc')]
+        fight['Orc'] = {'stuff': [{'name': 'Club'}],
+                        'state': 'dead',
+                        'current': {'hp': -50},
+                        'permanent': {'hp': 10}}
+        assert index.find(states=['dead']) == [('orcs', 'Orc'),
+                                               ('boss', 'Orc')]
+        assert index.find(item='Club') == [('orcs', 'Orc'), ('boss', 'Orc')]
+        assert index.find(item='Axe') == []
+
+    def test_menu_filter(self):
+        menu_filter = ca_gui.MenuFilter(['Bow', 'Arrows', 'Rapier', 'Sword',
+                                         'Broadsword', 'Shield'])
+        assert menu_filter.find('') == [0, 1, 2, 3, 4, 5]
+
+        # Entries that start with the text come first and case doesn't matter
+        assert menu_filter.find('s') == [3, 5, 1, 4]
+        assert menu_filter.find('sW') == [3, 4]
+        assert menu_filter.find('swo') == [3, 4]
+        assert menu_filter.find('swx') == []
+
+        # Backing up finds the earlier answers again
+        assert menu_filter.find('sw') == [3, 4]
+        assert menu_filter.find('r') == [2, 1, 3, 4]
+        assert menu_filter.find('ro') == [1, 4]
+
+        # A big store narrows down in a few characters
+        strings = ['Item %04d' % index for index in range(5000)]
+        strings.append('Vorpal Sword')
+        menu_filter = ca_gui.MenuFilter(strings)
+        assert len(menu_filter.find('item')) == 5000
+        assert len(menu_filter.find('item 12')) == 100
+        assert menu_filter.find('vorp') == [5000]
+        assert menu_filter.find('word') == [5000]
+
+    def test_json_patch(self):
+        lhs = copy.deepcopy(self.init_world_dict)
+        rhs = copy.deepcopy(self.init_world_dict)
+        assert diff_json.JsonPatch.make(lhs, rhs) == []
+
+        rhs['PCs']['Moe']['current']['hp'] = 1
+        del rhs['fights']['horsemen']
+        rhs['current-fight']['history'].append({'comment': 'new'})
+        rhs['current-fight']['fighters'].insert(0, {'group': 'PCs',
+                                                    'name': 'Moe'})
+        rhs['a/b~c'] = True
+        patch = diff_json.JsonPatch.make(lhs, rhs)
+        assert {'op': 'replace',
+                'path': '/PCs/Moe/current/hp',
+                'value': 1} in patch
+        assert {'op': 'remove', 'path': '/fights/horsemen'} in patch
+        assert {'op': 'add',
+                'path': '/current-fight/history/-',
+                'value': {'comment': 'new'}} in patch
+        assert {'op': 'add', 'path': '/a~1b~0c', 'value': True} in patch
+
+        # The patch survives being written as JSON
+        patch = json.loads(json.dumps(patch))
+        assert diff_json.JsonPatch.apply(lhs, patch) == rhs
+
+        # Lists that shrink (from the middle) and types that change
+        assert diff_json.JsonPatch.make([1, 2, 3, 4], [1, 4]) == [
+                {'op': 'remove', 'path': '/1'},
+                {'op': 'remove', 'path': '/1'}]
+        assert diff_json.JsonPatch.make({'a': {}}, {'a': []}) == [
+                {'op': 'replace', 'path': '/a', 'value': []}]
+        assert diff_json.JsonPatch.apply([1], [{'op': 'replace',
+                                                'path': '',
+                                                'value': 'x'}]) == 'x'
+
+    def test_undo_redo(self):
+        # The stack, by itself
+
+        data = {'hp': 10, 'armor': ['shield'], 'history': []}
+        stack = ca_undo.UndoStack(lambda: {'me': data},
+                                  ignore_keys=['history'])
+        assert not stack.can_undo()
+        assert stack.undo() is None
+
+        stack.begin()
+        data['hp'] = 7
+        data['armor'].append('helmet')
+        data['history'].append('hit')
+        data['shield'] = True
+        stack.end('hit')
+
+        armor = data['armor']
+        assert stack.undo() == 'hit'
+        assert data == {'hp': 10, 'armor': ['shield'], 'history': ['hit']}
+        assert data['armor'] is armor  # changed in place
+        assert stack.can_redo()
+        assert stack.redo() == 'hit'
+        assert data['hp'] == 7
+        assert data['armor'] == ['shield', 'helmet']
+        assert data['shield']
+
+        # Nothing changed, nothing recorded
+        stack.begin()
+        stack.end('nothing')
+        assert stack.get_labels() == (['hit'], [])
+
+        # A new action means the undone one can't be redone
+        stack.undo()
+        stack.begin()
+        data['hp'] = 9
+        stack.end('heal')
+        assert not stack.can_redo()
+        assert stack.get_labels() == (['heal'], [])
+
+        # A change made outside of an action means the recorded actions
+        # can't be trusted anymore
+        data = {'stuff': ['rope', 'sword']}
+        stack = ca_undo.UndoStack(lambda: {'me': data})
+        stack.begin()
+        data['stuff'][1] = 'broken sword'
+        stack.end('break')
+        del data['stuff'][0]
+        assert stack.undo() is None
+        assert data == {'stuff': ['broken sword']}
+        assert stack.get_labels() == ([], [])
+
+        # In a fight
+
+        world_data = WorldData(self.init_world_dict)
+        world = ca.World('internal source file',
+                         world_data,
+                         self._ruleset,
+                         MockProgram(),
+                         self._window_manager,
+                         save_snapshot=False)
+        self._window_manager.set_menu_response(
+                "Use Pestilence's preferred armor?",
+                ('quit', ca_ruleset.Ruleset.STOP_CHECKING))
+        fight_handler = ca.FightHandler(self._window_manager,
+                                        world,
+                                        'horsemen',
+                                        None,  # Playback history
+                                        save_snapshot=False)
+        fighter = fight_handler.get_current_fighter()
+        hp = fighter.rawdata['current']['hp']
+
+        self._ruleset.do_action(fighter,
+                                {'action-name': 'adjust-hp',
+                                 'adj': -3,
+                                 'quiet': True},
+                                fight_handler)
+        assert fighter.rawdata['current']['hp'] == hp - 3
+
+        self._ruleset.do_action(fighter,
+                                {'action-name': 'undo'},
+                                fight_handler)
+        assert fighter.rawdata['current']['hp'] == hp
+        history = world_data.read_data['current-fight']['history']
+        assert history[-1]['action-name'] == 'undo'
+
+        self._ruleset.do_action(fighter,
+                                {'action-name': 'redo'},
+                                fight_handler)
+        assert fighter.rawdata['current']['hp'] == hp - 3
+
+        # Nothing left to redo
+        self._ruleset.do_action(fighter,
+                                {'action-name': 'redo'},
+                                fight_handler)
+        assert fighter.rawdata['current']['hp'] == hp - 3
+
+        # Timers counting down (and being looked at between actions) don't
+        # look like changes made outside of an action
+        timer_obj = ca_timers.Timer(None)
+        timer_obj.from_pieces({'parent-name': fighter.name,
+                               'rounds': 5,
+                               'string': 'waiting'})
+        self._ruleset.do_action(fighter,
+                                {'action-name': 'set-timer',
+                                 'timer': timer_obj.rawdata},
+                                fight_handler)
+        for turn in range(3):
+            self._ruleset.do_action(fight_handler.get_current_fighter(),
+                                    {'action-name': 'defend'},
+                                    fight_handler)
+            fight_handler._choices[ord(' ')]['func']()
+            for other in fight_handler.get_fighters():
+                ignore, thing = fight_handler.get_fighter_object(
+                        other['name'], other['group'])
+                thing.timers.get_all()
+        assert fight_handler.get_undo_stack().can_undo()
+        self._ruleset.do_action(fighter,
+                                {'action-name': 'undo'},
+                                fight_handler)
+        assert fight_handler.get_undo_stack().can_redo()
+
+        # Undoing a timer gets rid of the Timer object, too (so it doesn't
+        # keep the fighter busy or fire), and redoing it brings it back
+        timer_obj = ca_timers.Timer(None)
+        timer_obj.from_pieces({'parent-name': fighter.name,
+                               'rounds': 0,
+                               'string': 'going down',
+                               'actions': {'state': 'unconscious'}})
+        timer_obj.mark_owner_as_busy()
+        state = fighter.rawdata['state']
+        count = len(fighter.rawdata['timers'])
+        self._ruleset.do_action(fighter,
+                                {'action-name': 'set-timer',
+                                 'timer': timer_obj.rawdata},
+                                fight_handler)
+        assert fighter.timers.is_busy()
+        assert fighter.timers.found_timer_string('going down')
+
+        self._ruleset.do_action(fighter,
+                                {'action-name': 'undo'},
+                                fight_handler)
+        assert not fighter.timers.is_busy()
+        assert not fighter.timers.found_timer_string('going down')
+        assert len(fighter.timers.get_all()) == count
+        fighter.timers.fire_expired_timers(ca_timers.Timer.FIRE_ROUND_END)
+        assert fighter.rawdata['state'] == state
+        assert len(fighter.rawdata['timers']) == count
+
+        self._ruleset.do_action(fighter,
+                                {'action-name': 'redo'},
+                                fight_handler)
+        assert fighter.timers.is_busy()
+        assert len(fighter.timers.get_all()) == count + 1
+        assert fighter.timers.get_all()[-1].rawdata is fighter.rawdata[
+                'timers'][-1]
+        fighter.timers.fire_expired_timers(ca_timers.Timer.FIRE_ROUND_END)
+        assert fighter.rawdata['state'] == 'unconscious'
+        assert not fighter.timers.is_busy()
+
 
 class MyArgumentParser(argparse.ArgumentParser):
     '''
@@ -1,13 +1,19 @@
 #! /usr/bin/python
 
 import copy
+import json
+import os
 import random
+import stat
+import tempfile
 import unittest
 
 import ca
+import ca_damage
 import ca_debug
 import ca_fighter
 import ca_gurps_ruleset
+import ca_json
 import ca_ruleset
 
 from .test_common import GmTestCaseCommon
@@ -2168,3 +2174,233 @@ class GmTestCaseGurps(GmTestCaseCommon):
             for fighter, expected_value in zip(fighters, expected):
                 assert fighter['name'] == expected_value['name']
                 assert fighter['group'] == expected_value['group']
+
+    def test_initiatives(self):
+        '''
+        GURPS-specific test: Combat Reflexes helps the whole group.
+        '''
+        tank = ca_fighter.Fighter('Tank',
+                                  'PCs',
+                                  copy.deepcopy(self._tank_fighter),
+                                  self._ruleset,
+                                  self._window_manager)
+        thief = ca_fighter.Fighter('Thief',
+                                   'PCs',
+                                   copy.deepcopy(self._thief_fighter),
+                                   self._ruleset,
+                                   self._window_manager)
+        other_thief = ca_fighter.Fighter('Thief',
+                                         'bad guys',
+                                         copy.deepcopy(self._thief_fighter),
+                                         self._ruleset,
+                                         self._window_manager)
+        fighters = [tank, thief, other_thief]
+
+        random.seed(9001)  # 1 3 3 ...
+        init = self._ruleset.initiatives(fighters)
+        assert init[('Tank', 'PCs')] == (6.75, 12, 1)
+        assert init[('Thief', 'PCs')] == (6.75, 12, 3)
+        assert init[('Thief', 'bad guys')] == (5.75, 12, 3)
+
+        # Only some of the fighters get initiative but the whole fight
+        # counts for the group bonus.
+        init = self._ruleset.initiatives([thief], fighters)
+        assert list(init.keys()) == [('Thief', 'PCs')]
+        assert init[('Thief', 'PCs')][0] == 6.75
+        assert self._ruleset.initiative(thief, [thief])[0] == 5.75
+
+    def test_description_short_key(self):
+        '''
+        The key for the summary line changes when the summary line does.
+        '''
+        fight_handler = MockFightHandler()
+        tank = ca_fighter.Fighter('Tank',
+                                  'PCs',
+                                  copy.deepcopy(self._tank_fighter),
+                                  self._ruleset,
+                                  self._window_manager)
+        key = tank.get_description_short_key(fight_handler)
+        description = tank.get_description_short(fight_handler)
+        assert tank.get_description_short_key(fight_handler) == key
+
+        tank.rawdata['current']['hp'] -= 3
+        tank.mark_changed()
+        assert tank.get_description_short_key(fight_handler) != key
+        assert tank.get_description_short(fight_handler) != description
+
+        key = tank.get_description_short_key(fight_handler)
+        tank.rawdata['stunned'] = True
+        tank.mark_changed()
+        assert tank.get_description_short_key(fight_handler) != key
+
+        venue = ca_fighter.Venue('group',
+                                 {'stuff': [], 'notes': [], 'timers': []},
+                                 self._ruleset,
+                                 self._window_manager)
+        key = venue.get_description_short_key(fight_handler)
+        venue.rawdata['notes'].append('A note')
+        assert venue.get_description_short_key(fight_handler) != key
+
+    def test_damage_expressions(self):
+        damage = ca_damage.Damage.parse('1d+4')
+        assert damage.num_dice == 1
+        assert damage.plus == 4
+        assert not damage.is_st_based()
+        assert damage is ca_damage.Damage.parse('1d+4') # interned
+
+        damage = ca_damage.Damage.parse('sw-2', damage_type='cut')
+        assert damage.is_st_based()
+        assert damage.st == 'sw'
+        assert damage.plus == -2
+        assert damage.to_native() == {'st': 'sw', 'plus': -2, 'type': 'cut'}
+
+        damage = ca_damage.Damage.parse('3d(2) burn')
+        assert damage.num_dice == 3
+        assert damage.armor_divisor == 2
+        assert damage.type == 'burn'
+
+        assert ca_damage.Damage.parse('-2').plus == -2
+        assert ca_damage.Damage.parse('bogus 1d') is None
+        assert ca_damage.Damage.parse('') is None
+        assert ca_damage.Damage.parse('d') is None
+        assert ca_damage.Damage.parse('cut') is None
+
+        native = {'dice': {'num_dice': 2, 'plus': -1, 'type': 'pi'}}
+        damage = ca_damage.Damage.from_native(native)
+        assert damage.dice_string() == '2d-1'
+        assert damage.to_native() == native
+        assert damage is ca_damage.Damage.get(num_dice=2, plus=-1,
+                                              damage_type='pi')
+
+    def test_melee_damage(self):
+        damage = ca_gurps_ruleset.GurpsRuleset.get_melee_damage(10, 'sw')
+        assert damage.dice_string() == '1d+0'
+        assert damage is ca_gurps_ruleset.GurpsRuleset.get_melee_damage(10,
+                                                                        'sw')
+
+        # The table, past ST 25
+        damage = ca_gurps_ruleset.GurpsRuleset.get_melee_damage(27, 'thr')
+        assert damage.dice_string() == '3d-1'
+        damage = ca_gurps_ruleset.GurpsRuleset.get_melee_damage(52, 'sw')
+        assert damage.dice_string() == '8d-1'
+        damage = ca_gurps_ruleset.GurpsRuleset.get_melee_damage(100, 'sw')
+        assert damage.dice_string() == '13d+0'
+
+        # Extrapolated: a die per 10 ST past 100
+        damage = ca_gurps_ruleset.GurpsRuleset.get_melee_damage(125, 'thr')
+        assert damage.dice_string() == '13d+0'
+
+        posture_mods = self._ruleset.get_posture_mods('crawling')
+        assert posture_mods['defense'] == -3
+        assert self._ruleset.get_posture_mods('flying') is None
+
+    def test_spell_index(self):
+        spells = {
+            'Itch': {'casting time': 1, 'range': 'regular', 'save': ['ht'],
+                     'notes': 'M35, itches'},
+            'Lightning': {'casting time': 3, 'range': 'missile', 'save': [],
+                          'notes': 'M196'},
+            'Sleep': {'casting time': 3, 'range': 'regular', 'save': ['ht'],
+                      'notes': 'M135'},
+        }
+        spell_index = ca_gurps_ruleset.SpellIndex(spells)
+        assert spell_index.is_for(spells)
+        assert spell_index.get_names() == ['Itch', 'Lightning', 'Sleep']
+        assert spell_index.get_names(spell_range='regular',
+                                     save='ht') == ['Itch', 'Sleep']
+        assert spell_index.get_names(casting_time=3,
+                                     spell_range='missile') == ['Lightning']
+        assert spell_index.get_names(notes_prefix='M35') == ['Itch']
+        assert spell_index.battle_castable == {'Itch'}
+
+        # The index notices new spells
+        spells['Awaken'] = {'casting time': 1, 'range': 'area', 'save': [],
+                            'notes': 'M90'}
+        assert spell_index.get('Awaken') is spells['Awaken']
+        assert 'Awaken' in spell_index.battle_castable
+
+        # ...and changed spells, once it's told about them
+        stamp = spell_index.get_stamp()
+        spells['Itch']['range'] = 'melee'
+        assert spell_index.get_stamp() == stamp
+        spell_index.mark_changed()
+        assert spell_index.get_stamp() != stamp
+        assert 'Itch' not in spell_index.battle_castable
+        assert spell_index.get_names(spell_range='melee') == ['Itch']
+
+        # The merged spells are kept until the creature's spells change
+        priest = copy.deepcopy(self._vodou_priest_fighter)
+        complete_spells = self._ruleset.get_complete_spells(priest)
+        assert len(complete_spells) == len(priest['spells'])
+        assert complete_spells[0]['name'] == priest['spells'][0]['name']
+        assert complete_spells[0]['skill'] == priest['spells'][0]['skill']
+        assert 'casting time' in complete_spells[0]
+        assert self._ruleset.get_complete_spells(priest) is complete_spells
+
+        priest['spells'][0]['skill'] += 1
+        new_complete_spells = self._ruleset.get_complete_spells(priest)
+        assert new_complete_spells is not complete_spells
+        assert (new_complete_spells[0]['skill'] ==
+                priest['spells'][0]['skill'])
+
+        priest['spells'].append({'name': 'No Such Spell', 'skill': 10})
+        assert self._ruleset.get_complete_spells(priest)[-1] is None
+
+        # Only so many are kept
+        complete_spells = self._ruleset.get_complete_spells(priest)
+        assert self._ruleset.get_complete_spells(priest) is complete_spells
+        skill = priest['spells'][0]['skill']
+        for other in range(ca_gurps_ruleset.GurpsRuleset.MAX_COMPLETE_SPELLS):
+            priest['spells'][0]['skill'] = skill + 1 + other
+            self._ruleset.get_complete_spells(priest)
+        priest['spells'][0]['skill'] = skill
+        assert (self._ruleset.get_complete_spells(priest) is not
+                complete_spells)
+
+    def test_gurps_info_cache(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, 'info.json')
+            with open(filename, 'w') as f:
+                json.dump({'spells': {'Itch': {'cost': 2}},
+                           'abilities': {'skills': {}}}, f)
+
+            info = ca_json.GmJsonCache(filename)
+            assert info.found_file
+            assert info.get_section_names() == ['spells', 'abilities']
+            assert info.get_section('spells') == {'Itch': {'cost': 2}}
+            cache_filename = os.path.join(directory, '.info.json.cache')
+            assert os.path.exists(cache_filename)
+            assert stat.S_IMODE(os.stat(cache_filename).st_mode) == 0o600
+
+            # A cache that somebody else could have written isn't used
+            os.chmod(cache_filename, 0o666)
+            info = ca_json.GmJsonCache(filename)
+            assert info.get_section('spells') == {'Itch': {'cost': 2}}
+            assert stat.S_IMODE(os.stat(cache_filename).st_mode) == 0o600
+
+            # Sections come from the cache, now, and only when asked for
+            os.utime(filename) # Touched but not changed
+            info = ca_json.GmJsonCache(filename)
+            assert info.get_section('abilities') == {'skills': {}}
+            assert info.get_section('bogus') is None
+
+            # Nothing's written unless something changed
+            stamp = os.stat(filename).st_mtime_ns
+            assert not info.write()
+            assert os.stat(filename).st_mtime_ns == stamp
+
+            info.get_section('spells')['Sleep'] = {'cost': 4}
+            info.mark_modified('spells')
+            assert info.write()
+            info = ca_json.GmJsonCache(filename)
+            assert info.get_section('spells')['Sleep'] == {'cost': 4}
+
+            # Changes to the file are noticed
+            with open(filename, 'w') as f:
+                json.dump({'spells': {}, 'abilities': {}}, f)
+            info.refresh()
+            assert info.get_section('spells') == {}
+
+            info.get_section('spells')['Itch'] = {'cost': 2}
+            info.revert()
+            assert info.get_section('spells') == {}